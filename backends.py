@@ -0,0 +1,212 @@
+import os
+import queue
+import random
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_POOL_SIZE = 4
+NUMBERED_LINE = re.compile(r"^(\d+)\.\s+(.+)$", re.MULTILINE)
+
+
+class BackendError(Exception):
+    # status follows HTTP conventions so callers can tell quota errors (429)
+    # and server hiccups (5xx) from bad requests
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class MissingApiKey(BackendError):
+    pass
+
+
+class Backend:
+    # A model that can answer a prompt. contents is a prompt string or a list
+    # mixing strings and {"mime_type", "data"} image parts.
+    name = "backend"
+
+    def generate(self, contents):
+        raise NotImplementedError
+
+    def stream(self, contents):
+        # Yields the answer in chunks; backends that can't stream send it whole
+        yield self.generate(contents)
+
+    def warm_up(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class GeminiBackend(Backend):
+    # Long-lived GenerativeModel instances handed out from a pool, so no request
+    # pays for building a model. The SDK is slow to import, so it and the pool
+    # are set up on first use; warm_up does that (and opens the connection)
+    # ahead of the first real request.
+    def __init__(self, model=DEFAULT_MODEL, api_key=None, pool_size=DEFAULT_POOL_SIZE):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise MissingApiKey("API key not found. Please create a .env file with GEMINI_API_KEY.")
+        self.name = model
+        self.pool_size = pool_size
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def _ensure_pool(self):
+        with self.pool_lock:
+            if self.pool is None:
+                import google.generativeai as gmai
+                gmai.configure(api_key=self.api_key)
+                pool = queue.Queue()
+                for _ in range(self.pool_size):
+                    pool.put(gmai.GenerativeModel(self.name))
+                self.pool = pool
+        return self.pool
+
+    @contextmanager
+    def lease(self):
+        pool = self.pool or self._ensure_pool()
+        model = pool.get()
+        try:
+            yield model
+        finally:
+            pool.put(model)
+
+    def generate(self, contents):
+        with self.lease() as model:
+            response = model.generate_content(contents)
+            return response.text if response and hasattr(response, "text") else None
+
+    def stream(self, contents):
+        with self.lease() as model:
+            for chunk in model.generate_content(contents, stream=True):
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+
+    def warm_up(self):
+        try:
+            with self.lease() as model:
+                model.count_tokens("warm up")
+        except Exception:
+            # Offline or a bad key: the first real request reports it properly
+            pass
+
+
+class StubBackend(Backend):
+    # Offline stand-in with deterministic answers. Latency, injected errors and
+    # chunked streaming are configurable so performance work can be measured
+    # without the network. A slow_rate share of calls take slow_latency instead
+    # (a long tail), and calls beyond max_concurrent are refused with a 429 like
+    # an exhausted quota. Extraction requests answer with image_problems.
+    name = "stub"
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500,
+                 chunks=8, chunk_delay=0.0, image_problems=None, seed=0,
+                 slow_rate=0.0, slow_latency=0.0, max_concurrent=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.max_concurrent = max_concurrent
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.image_problems = image_problems or ["2x + 3 = 11"]
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def generate(self, contents):
+        with self.call():
+            return self.answer(contents)
+
+    def stream(self, contents):
+        with self.call():
+            text = self.answer(contents)
+            size = max(1, -(-len(text) // self.chunks))
+            for start in range(0, len(text), size):
+                if start and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                yield text[start:start + size]
+
+    @contextmanager
+    def call(self):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.slow_rate and self.random.random() < self.slow_rate:
+                delay = self.slow_latency
+            status = None
+            if self.max_concurrent and self.in_flight > self.max_concurrent:
+                status, delay = 429, 0.0
+            elif self.error_rate and self.random.random() < self.error_rate:
+                status = self.error_status
+            if status:
+                self.errors += 1
+        try:
+            if delay:
+                time.sleep(delay)
+            if status:
+                raise BackendError(f"Stub backend error {status}", status)
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def answer(self, contents):
+        if isinstance(contents, list):
+            prompts = [part for part in contents if isinstance(part, str)]
+            if prompts:
+                return "\n".join(f"{i}. {problem}" for i, problem in enumerate(self.image_problems, 1))
+            return self.image_problems[0]
+        numbered = NUMBERED_LINE.findall(contents)
+        if len(numbered) > 1:
+            return "\n\n".join(f"### Problem {number}\n{self.solution(problem)}" for number, problem in numbered)
+        return self.solution(contents.strip().split("\n")[-1])
+
+    def solution(self, problem):
+        answer = zlib.crc32(problem.encode("utf-8")) % 100
+        return (f"**Step 1:** Read the problem: {problem}\n"
+                f"**Step 2:** Work through it\n"
+                f"**Final Answer:** {answer}")
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+_current = None
+_current_lock = threading.Lock()
+
+
+def create_backend(kind=None):
+    # MATHSOLVER_BACKEND picks the implementation; Gemini unless told otherwise
+    kind = kind or os.getenv("MATHSOLVER_BACKEND", "gemini")
+    if kind not in BACKENDS:
+        raise BackendError(f"Unknown backend {kind!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[kind]()
+
+
+def set_backend(backend):
+    global _current
+    _current = backend
+    return backend
+
+
+def get_backend():
+    # The backend every solve and extraction goes through, created on first use
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                _current = create_backend()
+    return _current
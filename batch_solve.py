@@ -0,0 +1,193 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+import backends
+import upstream
+from core import SolverCore, is_valid_problem
+from image_pipeline import IMAGE_EXTENSIONS
+from metrics import percentile
+
+
+class InputError(Exception):
+    pass
+
+
+def read_problems(path, column="problem"):
+    # Yields (id, problem, is_image). Ids are stable across runs so a batch can resume.
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield name, os.path.join(path, name), True
+        return
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if extension == ".jsonl":
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    record = json.loads(line)
+                    if column not in record:
+                        raise InputError(f"{path}, line {number}: no '{column}' field (use --column)")
+                    yield str(record.get("id", number)), record[column], False
+        elif extension == ".csv":
+            reader = csv.DictReader(f)
+            if column not in (reader.fieldnames or []):
+                raise InputError(f"{path}: no '{column}' column (use --column); "
+                                 f"columns are {', '.join(reader.fieldnames or [])}")
+            for number, row in enumerate(reader, 1):
+                yield str(row.get("id") or number), row[column], False
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield str(number), line.strip(), False
+
+
+def completed_ids(output_path):
+    # The output file doubles as the checkpoint: every id with a successful record is done
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+class BatchSolver:
+    def __init__(self, core):
+        self.core = core
+
+    def solve(self, item_id, problem, is_image):
+        start = time.perf_counter()
+        record = {"id": item_id, "problem": problem}
+        try:
+            if is_image:
+                record["image"] = problem
+                problem = self.core.extract(problem).text
+                record["problem"] = problem
+                if not problem:
+                    raise ValueError("Unable to extract text from the image")
+            answer = self.answer(problem)
+            record["answer"] = answer.text
+            record["source"] = answer.source
+            record["html"] = answer.html()
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return record
+
+    def answer(self, problem):
+        # Worksheets have no small talk, so intent replies are skipped
+        if not is_valid_problem(problem):
+            raise ValueError("Not a valid math problem")
+        return self.core.answer_locally(problem) or self.core.solve_model(problem)
+
+
+class Progress:
+    def __init__(self, total, interval, stream=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.latencies = []
+        self.done = 0
+        self.failed = 0
+
+    def record(self, record):
+        self.done += 1
+        self.failed += 1 if record.get("error") else 0
+        self.latencies.append(record["latency_ms"])
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        print(
+            f"{self.done}/{self.total} done, {self.failed} failed, {rate:.2f} problems/s, "
+            f"p50 {percentile(self.latencies, 50):.0f} ms, p95 {percentile(self.latencies, 95):.0f} ms",
+            file=self.stream, flush=True
+        )
+
+
+def run_batch(items, output_path, batch_solver, concurrency=8, progress=None):
+    # At most `concurrency` problems are in flight; results are written in
+    # completion order and flushed so an interrupted run loses nothing finished.
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+
+        def drain():
+            done, still_pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if progress:
+                    progress.record(record)
+            return still_pending
+
+        for item in items:
+            pending.add(pool.submit(batch_solver.solve, *item))
+            if len(pending) >= concurrency:
+                pending = drain()
+        while pending:
+            pending = drain()
+    if progress:
+        progress.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a worksheet of math problems without the GUI.")
+    parser.add_argument("input", help="text file (one problem per line), .csv, .jsonl, or a directory of images")
+    parser.add_argument("-o", "--output", default="solutions.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="maximum problems in flight")
+    parser.add_argument("--column", default="problem", help="CSV column / JSONL field holding the problem")
+    parser.add_argument("--no-resume", action="store_true", help="solve everything even if already in the output; new results are still appended")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk solution cache")
+    parser.add_argument("--backend", choices=sorted(backends.BACKENDS),
+                        help="model backend (default: $MATHSOLVER_BACKEND or gemini)")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    try:
+        backends.set_backend(upstream.guard(backends.create_backend(args.backend)))
+    except backends.BackendError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    done = set() if args.no_resume else completed_ids(args.output)
+    try:
+        items = [item for item in read_problems(args.input, args.column) if item[0] not in done]
+    except InputError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if done:
+        print(f"Resuming: {len(done)} already solved, {len(items)} to go", file=sys.stderr)
+
+    core = SolverCore() if args.no_cache else SolverCore.open()
+    progress = Progress(len(items), args.progress_interval)
+    try:
+        run_batch(items, args.output, BatchSolver(core), args.concurrency, progress)
+    finally:
+        core.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# Measures solution cache lookup latency for hot (in-memory) and cold (SQLite) hits.
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solution_cache import HOT_ENTRIES, SolutionCache
+
+ENTRIES = 10000
+LOOKUPS = 5000
+BUDGET_MS = 1.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_lookups(cache, keys):
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        assert cache.get(key) is not None
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SolutionCache(os.path.join(tmp, "bench.sqlite3"), model="bench", prompt_version=1)
+        keys = []
+        for i in range(ENTRIES):
+            problem = f"{i}x + {i % 97} = {i * 3}"
+            key = cache.key_for(problem)
+            cache.put(key, problem, f"**Step 1:** ...\nFinal answer: {i}" * 20)
+            keys.append(key)
+        cache.close()
+
+        # Reopen so the first lookups of each key come from disk
+        cache = SolutionCache(os.path.join(tmp, "bench.sqlite3"), model="bench", prompt_version=1)
+        rng = random.Random(0)
+        cold = time_lookups(cache, rng.sample(keys, LOOKUPS))
+        hot_keys = keys[:HOT_ENTRIES // 2]
+        time_lookups(cache, hot_keys)
+        hot = time_lookups(cache, [rng.choice(hot_keys) for _ in range(LOOKUPS)])
+        cache.close()
+
+    ok = True
+    for name, samples in (("cold (sqlite)", cold), ("hot (memory)", hot)):
+        p50, p99 = percentile(samples, 50), percentile(samples, 99)
+        print(f"{name:14s} p50 {p50 * 1000:8.1f} us  p99 {p99 * 1000:8.1f} us")
+        ok = ok and p99 < BUDGET_MS
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
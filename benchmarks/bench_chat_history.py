@@ -0,0 +1,88 @@
+# Measures append and scroll cost of the chat history as it grows to 10k
+# messages. Pass --legacy to run the same workload against a plain QTextEdit.
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QTextEdit
+
+from chat_view import ChatMessage, ChatModel, ChatView
+
+TOTAL = 10000
+CHECKPOINTS = (1000, 5000, 10000)
+WINDOW = 200
+
+SOLUTION = "<b>🤖 AI:</b><br>" + "<br>".join(
+    f"<b>Step {i}:</b> Subtract 3 from both sides of the equation to isolate the x term" for i in range(1, 9)
+) + "<br><b>Final Answer:</b> x = 4"
+
+
+class ListTarget:
+    def __init__(self):
+        self.model = ChatModel()
+        self.view = ChatView(self.model)
+
+    def append(self, i):
+        sender = "User" if i % 2 == 0 else "AI"
+        html = f"<b>🧑‍💻 You:</b> {i}x + 3 = 11" if sender == "User" else SOLUTION
+        self.model.append(ChatMessage(sender, html))
+        self.view.scrollToBottom()
+
+    def scroll(self):
+        bar = self.view.verticalScrollBar()
+        bar.setValue(bar.maximum() // 2)
+
+    def close(self):
+        self.model.close()
+
+
+class LegacyTarget:
+    def __init__(self):
+        self.view = QTextEdit()
+        self.view.setReadOnly(True)
+
+    def append(self, i):
+        html = f"<b>🧑‍💻 You:</b> {i}x + 3 = 11" if i % 2 == 0 else SOLUTION
+        self.view.append(html)
+        bar = self.view.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+    def scroll(self):
+        bar = self.view.verticalScrollBar()
+        bar.setValue(bar.maximum() // 2)
+
+    def close(self):
+        pass
+
+
+def main():
+    app = QApplication(sys.argv)
+    target = LegacyTarget() if "--legacy" in sys.argv else ListTarget()
+    target.view.resize(900, 600)
+    target.view.show()
+    app.processEvents()
+
+    append_ms = []
+    for i in range(1, TOTAL + 1):
+        start = time.perf_counter()
+        target.append(i)
+        app.processEvents()
+        append_ms.append((time.perf_counter() - start) * 1000)
+        if i in CHECKPOINTS:
+            start = time.perf_counter()
+            for _ in range(20):
+                target.scroll()
+                target.view.viewport().repaint()
+            scroll_ms = (time.perf_counter() - start) * 1000 / 20
+            recent = sorted(append_ms[-WINDOW:])
+            print(f"{i:>6} messages: append p50 {recent[len(recent) // 2]:6.2f} ms, "
+                  f"p95 {recent[int(len(recent) * 0.95)]:6.2f} ms, scroll+repaint {scroll_ms:6.2f} ms")
+    target.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# Prompt size of follow-up questions as a session grows, with the budgeted
+# conversation window versus replaying the whole chat, plus the time taken
+# to build each prompt. Every third question is a follow-up; answers come
+# from the stub backend's deterministic solutions (a realistic length is
+# padded on), so nothing touches the network.
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backends import StubBackend
+from conversation import CONVERSATION_PROMPT, Conversation
+from metrics import percentile
+from solver import estimate_tokens
+
+TURNS = 300
+REPORT_AT = (3, 15, 30, 60, 150, 300)
+FOLLOW_UPS = ("now explain step 2", "what if x = 5", "why is that the answer", "do the same for cos(x)")
+WORKING = "\n".join(f"**Step {n}:** " + "carry the working one line further " * 3 for n in range(3, 9))
+
+
+def main():
+    stub = StubBackend()
+    conversation = Conversation()
+    history = ""
+    rows = []
+    build_us = []
+    for turn in range(1, TURNS + 1):
+        if turn % 3 == 0:
+            problem = FOLLOW_UPS[turn // 3 % len(FOLLOW_UPS)]
+            start = time.perf_counter()
+            prompt, tokens = conversation.prompt(problem)
+            build_us.append((time.perf_counter() - start) * 1e6)
+            replay = estimate_tokens(CONVERSATION_PROMPT.format(context=history, problem=problem))
+            if turn in REPORT_AT:
+                rows.append((turn, tokens, replay))
+        else:
+            problem = f"Integrate x^{turn} * sin({turn}x) dx"
+        answer = stub.solution(problem) + "\n" + WORKING
+        conversation.add(problem, answer)
+        history += f"Student: {problem}\nTutor: {answer}\n"
+    print(f"budget {conversation.budget} tokens, one follow-up every third question")
+    print(f"{'turn':>6}{'window tokens':>15}{'full replay':>13}")
+    for turn, tokens, replay in rows:
+        print(f"{turn:>6}{tokens:>15}{replay:>13}")
+    print(f"prompt build p50 {percentile(build_us, 50):.0f} µs  p95 {percentile(build_us, 95):.0f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+# Reports how much of a typical problem mix the local solver handles and how fast.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_solver
+
+PROBLEMS = [
+    "12 * 7 + 3",
+    "What is 3/4 + 5/6?",
+    "calculate (2 + 3)^2 - 4",
+    "1.5 * 4 - 0.25",
+    "20% of 150",
+    "what is 15 percent of 80",
+    "2x + 3 = 11",
+    "solve 3(x - 2) = 12",
+    "5y - 7 = 2y + 8",
+    "x^2 - 5x + 6 = 0",
+    "x² + 2x = 8",
+    "2x^2 + 3x - 7 = 0",
+    "Find the derivative of x^3 + 2x",
+    "Integrate sin(x) from 0 to pi",
+    "A train travels 120 km in 2 hours. What is its speed?",
+    "Solve the system x + y = 10, x - y = 2",
+    "x^3 - 8 = 0",
+    "What is the area of a circle with radius 5?",
+    "log(100) + sqrt(16)",
+    "Simplify (x + 1)(x - 1)",
+]
+ROUNDS = 200
+
+
+def main():
+    samples = []
+    for _ in range(ROUNDS):
+        for problem in PROBLEMS:
+            start = time.perf_counter()
+            fast_solver.try_solve(problem)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    stats = fast_solver.stats
+    print(f"problems: {len(PROBLEMS)}, coverage: {stats.coverage():.0%} of API calls removed")
+    print(f"by class: {dict((k, v // ROUNDS) for k, v in stats.by_kind.items())}")
+    print(f"latency p50 {samples[len(samples) // 2] * 1000:.1f} us, "
+          f"p99 {samples[int(len(samples) * 0.99)] * 1000:.1f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Reports upload size before/after preprocessing and the cost of the
+# preprocessing itself on a synthetic phone photo of a worksheet, plus the
+# latency of a repeat upload served from the content-hash cache.
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+import solver
+from image_pipeline import content_hash, format_bytes, preprocess_image
+from solution_cache import SolutionCache
+
+RUNS = 5
+
+
+def synthetic_photo(width=4032, height=3024):
+    rng = random.Random(0)
+    image = Image.new("RGB", (width, height), (236, 232, 224))
+    draw = ImageDraw.Draw(image)
+    # Uneven lighting and paper texture, like a phone photo
+    for _ in range(4000):
+        x, y = rng.randrange(width), rng.randrange(height)
+        shade = rng.randint(205, 245)
+        draw.ellipse([x, y, x + 40, y + 40], fill=(shade, shade - 4, shade - 10))
+    for row in range(12):
+        y = 900 + row * 110
+        draw.text((1100, y), f"{row + 1}) {row + 2}x + {row * 3} = {row * 7 + 5}", fill=(30, 30, 40))
+    out = BytesIO()
+    image.save(out, "JPEG", quality=92)
+    return out.getvalue()
+
+
+def main():
+    raw = synthetic_photo()
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        data, mime = preprocess_image(raw)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"raw upload:          {format_bytes(len(raw))}")
+    print(f"preprocessed upload: {format_bytes(len(data))} ({mime}), "
+          f"{len(data) / len(raw):.1%} of the original")
+    print(f"preprocessing time:  {min(timings):.0f} ms (best of {RUNS})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "worksheet.jpg")
+        with open(path, "wb") as f:
+            f.write(raw)
+        cache = SolutionCache(os.path.join(tmp, "images.sqlite3"), model="bench", prompt_version="image")
+        cache.put(cache.key_for(content_hash(raw)), "worksheet.jpg", "2x + 0 = 5")
+        extraction = solver.extract_image(path, cache)
+        cache.close()
+    print(f"repeat upload:       {extraction.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
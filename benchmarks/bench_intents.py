@@ -0,0 +1,64 @@
+# Shows intent matching time staying flat as the intent set grows, compared
+# with the old per-key substring scan.
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import IntentMatcher
+
+SIZES = [30, 1000, 10000, 50000]
+INPUTS = [
+    "Solve 2x + 3 = 11 and show every step within the answer",
+    "thank you so much, that was really helpful",
+    "What is the derivative of x^3 + 2x^2 - 5x + 7 with respect to x?",
+    "hello there",
+]
+REPEATS = 200
+
+
+def random_intents(count, rng):
+    intents = []
+    for i in range(count):
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(rng.randint(1, 3))]
+        intents.append({"patterns": [" ".join(words)], "response": f"reply {i}"})
+    intents.append({"patterns": ["thank you"], "response": "thanks"})
+    return intents
+
+
+def linear_scan(responses, text):
+    text = text.lower()
+    for key in responses:
+        if key in text:
+            return responses[key]
+    return None
+
+
+def time_per_call(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for text in INPUTS:
+            fn(text)
+    return (time.perf_counter() - start) / (REPEATS * len(INPUTS)) * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'intents':>8} {'automaton us':>13} {'linear scan us':>15} {'build ms':>9}")
+    for size in SIZES:
+        intents = random_intents(size, rng)
+        start = time.perf_counter()
+        matcher = IntentMatcher(intents=intents)
+        build_ms = (time.perf_counter() - start) * 1000
+        flat = {intent["patterns"][0]: intent["response"] for intent in intents}
+        automaton_us = time_per_call(matcher.match)
+        scan_us = time_per_call(lambda text: linear_scan(flat, text))
+        print(f"{size:>8} {automaton_us:>13.1f} {scan_us:>15.1f} {build_ms:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
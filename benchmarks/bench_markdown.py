@@ -0,0 +1,85 @@
+# Rendering throughput on long model answers: the old four-pass regex
+# markdown_to_html (one shot, and re-run on the whole text after every chunk
+# as a non-incremental stream would) against the single-pass renderer, one
+# shot and fed in streaming-sized chunks. Also counts lines the old version mangles.
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_render import MarkdownRenderer, markdown_to_html
+
+TARGET_BYTES = 64 * 1024
+CHUNK = 40
+RUNS = 5
+
+
+def legacy_markdown_to_html(text):
+    text = re.sub(r"\\boxed\{(.*?)\}", r"\1", text)
+    text = re.sub(r"\*\*(.*?)\*\*", r"<b>\1</b>", text)
+    text = re.sub(r"\*(.*?)\*", r"<i>\1</i>", text)
+    text = re.sub(r"\n", r"<br>", text)
+    return text
+
+
+def long_answer():
+    blocks = []
+    step = 1
+    while sum(map(len, blocks)) < TARGET_BYTES:
+        blocks.append(
+            f"### Part {step}\n"
+            f"**Step {step}:** Expand the product 3 * x * (x + {step}) = 3x^2 + {3 * step}x\n"
+            f"- Since x > {step} and x < {step + 10}, both factors are *positive*\n"
+            f"- Check: 2 * {step} * 4 = {8 * step} & the bound holds\n"
+            f"Use `f(x) = x**2 + {step}` to evaluate at x = {step}\n"
+            f"**Final Answer:** \\boxed{{\\frac{{{step}}}{{2}}}}\n"
+        )
+        step += 1
+    return "".join(blocks)
+
+
+def best_of(fn, *args, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def chunked(text):
+    renderer = MarkdownRenderer()
+    out = [renderer.feed(text[i:i + CHUNK]) for i in range(0, len(text), CHUNK)]
+    out.append(renderer.flush())
+    return "".join(out)
+
+
+def legacy_rerendered(text):
+    for end in range(CHUNK, len(text) + CHUNK, CHUNK):
+        legacy_markdown_to_html(text[:end])
+
+
+def main():
+    text = long_answer()
+    size_mb = len(text.encode("utf-8")) / 1e6
+    print(f"answer: {len(text.encode('utf-8')) / 1024:.0f} KB, {text.count(chr(10))} lines, best of {RUNS}")
+    for label, fn, runs in (("legacy, one shot", legacy_markdown_to_html, RUNS),
+                            (f"legacy, re-render per {CHUNK}-byte chunk", legacy_rerendered, 1),
+                            ("single pass, one shot", markdown_to_html, RUNS),
+                            (f"single pass, {CHUNK}-byte chunks", chunked, RUNS)):
+        seconds = best_of(fn, text, runs=runs)
+        print(f"  {label:<36} {seconds * 1000:7.1f} ms  {size_mb / seconds:6.2f} MB/s")
+    assert chunked(text) == markdown_to_html(text)
+
+    lines = text.split("\n")
+    italicised = sum(1 for line in lines if "<i>" in legacy_markdown_to_html(line) and "*positive*" not in line)
+    unescaped = sum(1 for line in lines if re.search(r"[<>&]", line))
+    print(f"  legacy output: {italicised} lines with multiplication turned into italics, "
+          f"{unescaped} lines with raw < > & left in the HTML")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# Compares API calls and wall time for a worksheet of problems solved one
+# upload at a time against one multi-problem extraction plus batched solves.
+# Runs against the stub backend: each call costs a fixed round trip plus time per solution.
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import solver
+from backends import NUMBERED_LINE, StubBackend, set_backend
+
+PROBLEMS = [f"Find the derivative of {i + 2}x^3 + sin({i + 1}x)" for i in range(12)]
+ROUND_TRIP_SECONDS = 0.6
+SECONDS_PER_SOLUTION = 0.1
+
+
+class WorksheetBackend(StubBackend):
+    # Stub whose calls cost a fixed round trip plus time for every solution written
+    def call_seconds(self, contents):
+        if isinstance(contents, list):
+            return ROUND_TRIP_SECONDS
+        solutions = len(NUMBERED_LINE.findall(contents)) or 1
+        return ROUND_TRIP_SECONDS + SECONDS_PER_SOLUTION * solutions
+
+    def generate(self, contents):
+        time.sleep(self.call_seconds(contents))
+        return super().generate(contents)
+
+
+def one_at_a_time(backend, paths):
+    for index, path in enumerate(paths):
+        # One cropped photo per problem
+        backend.image_problems = [PROBLEMS[index]]
+        problem = solver.get_text_from_image(path)
+        solver.solve_problem_text(problem)
+
+
+def batched(backend, path):
+    backend.image_problems = PROBLEMS
+    extraction = solver.extract_image(path, all_problems=True)
+    problems = list(enumerate(extraction.problems, 1))
+    solutions = {}
+    for batch in solver.pack_problems(problems):
+        solutions.update(solver.solve_batch(batch))
+    assert len(solutions) == len(PROBLEMS)
+
+
+def measure(fn, *args):
+    backend = set_backend(WorksheetBackend())
+    start = time.perf_counter()
+    fn(backend, *args)
+    return backend.calls, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(len(PROBLEMS)):
+            path = os.path.join(tmp, f"problem-{i}.png")
+            Image.new("L", (400, 120), 255).save(path)
+            paths.append(path)
+        single_calls, single_seconds = measure(one_at_a_time, paths)
+        batch_calls, batch_seconds = measure(batched, paths[0])
+    print(f"{len(PROBLEMS)} problems, {ROUND_TRIP_SECONDS:.1f} s round trip + "
+          f"{SECONDS_PER_SOLUTION:.1f} s per solution")
+    print(f"one at a time: {single_calls:3d} API calls, {single_seconds:6.2f} s")
+    print(f"batched:       {batch_calls:3d} API calls, {batch_seconds:6.2f} s "
+          f"({single_seconds / batch_seconds:.1f}x faster)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
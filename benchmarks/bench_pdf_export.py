@@ -0,0 +1,82 @@
+# Export time and peak Python memory for chat histories of growing size,
+# streamed message by message into pdf_export. Both should grow linearly;
+# the per-message columns staying flat is the check. The old exporter
+# (one big plain-text string, unwrapped drawString lines) runs at the largest size.
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from chat_view import to_plain
+from pdf_export import export_pdf
+
+SIZES = (1000, 5000, 10000)
+
+
+def history(count):
+    for i in range(count):
+        if i % 2 == 0:
+            yield "User", f"<b>🧑‍💻 You:</b> Solve {i}x + 3 &lt; {i + 20} for x and explain each step in detail"
+        else:
+            yield "AI", (f"<b>🤖 AI:</b><br><b>Step 1:</b> Subtract 3 from both sides: {i}x &lt; {i + 17}<br>"
+                         f"<b>Step 2:</b> Divide by {i} " + "so the inequality keeps its direction " * 4 +
+                         f"<br><b>Final Answer:</b> x &lt; {i + 17}/{i}")
+
+
+def legacy_export(messages, path):
+    chat_content = "\n".join(to_plain(message_html) for _, message_html in messages)
+    c = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 30, "MathSolver AI - Chat History")
+    c.setFont("Helvetica", 12)
+    y = height - 70
+    for line in chat_content.split("\n"):
+        if y < 50:
+            c.showPage()
+            c.setFont("Helvetica", 12)
+            y = height - 50
+        c.drawString(50, y, line)
+        y -= 15
+    c.save()
+
+
+def measure(fn, count, path):
+    # Timed and memory-traced in separate runs; tracing slows Python down several times over
+    start = time.perf_counter()
+    fn(history(count), path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn(history(count), path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, os.path.getsize(path)
+
+
+def streamed(messages, path):
+    for _ in export_pdf(messages, path):
+        pass
+
+
+def main():
+    print(f"{'messages':>8} {'time':>8} {'ms/msg':>7} {'peak MB':>8} {'KB/msg':>7} {'PDF MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat.pdf")
+        for count in SIZES:
+            seconds, peak, size = measure(streamed, count, path)
+            print(f"{count:8d} {seconds:7.2f}s {seconds * 1000 / count:7.3f} {peak / 1e6:8.1f} "
+                  f"{peak / 1024 / count:7.2f} {size / 1e6:7.2f}")
+        seconds, peak, size = measure(legacy_export, SIZES[-1], path)
+        print(f"legacy exporter at {SIZES[-1]} messages: {seconds:.2f} s, peak {peak / 1e6:.1f} MB, "
+              f"{size / 1e6:.2f} MB PDF, long lines run off the page")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
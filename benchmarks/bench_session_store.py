@@ -0,0 +1,89 @@
+# Chat history store at 100k messages: how long the batched background
+# writes take, what startup pays to show the latest page, paging further back
+# while scrolling, and full-text search latency against a LIKE scan over the
+# same rows, which is what searching without the FTS index would cost.
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chat_view import PAGE_SIZE
+from metrics import percentile
+from session_store import SessionHistory, SessionStore
+
+MESSAGES = 100000
+SEARCH_RUNS = 50
+WORDS = ("derivative integral limit matrix eigenvalue series sum product chain rule substitution "
+         "parts polynomial root factor quadratic sine cosine tangent logarithm exponential").split()
+QUERIES = ("eigenvalue", "chain rule", "quadratic root", "logarith", "zeta7")
+
+
+def make_messages(count):
+    rng = random.Random(7)
+    for i in range(count):
+        words = " ".join(rng.choice(WORDS) for _ in range(12))
+        if i % 1000 == 0:
+            words += f" zeta{i // 1000}"
+        if i % 2:
+            yield "AI", f"<b>🤖 AI:</b> <p>{words}</p><p>So the answer is x = {i}.</p>"
+        else:
+            yield "User", f"<b>🧑‍💻 You:</b> {words}"
+
+
+def timed(runs, fn):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return percentile(times, 50), percentile(times, 95)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.sqlite3")
+        store = SessionStore(path)
+        session = store.new_session()
+        messages = list(make_messages(MESSAGES))
+        start = time.perf_counter()
+        for position, (sender, html) in enumerate(messages):
+            store.append(session, position, sender, html)
+        queued = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+        store.close()
+        size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+        print(f"{MESSAGES} messages: append calls {queued * 1000:.0f} ms on the caller "
+              f"({queued / MESSAGES * 1e6:.1f} µs each), committed after {written:.2f} s, {size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        store = SessionStore(path)
+        history = SessionHistory(store)
+        first = history.load_older(PAGE_SIZE)
+        print(f"startup: open and load the latest {len(first)} messages in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        p50, p95 = timed(SEARCH_RUNS, lambda: history.load_older(PAGE_SIZE))
+        print(f"scrolling back: {PAGE_SIZE} older messages per page  p50 {p50:.2f} ms  p95 {p95:.2f} ms")
+
+        conn = sqlite3.connect(path)
+        print(f"{'query':<16}{'hits':>6}{'fts p50':>10}{'fts p95':>10}{'like p50':>11}")
+        for query in QUERIES:
+            hits = len(store.search(query))
+            fts50, fts95 = timed(SEARCH_RUNS, lambda: store.search(query))
+            like = f"%{query}%"
+            like50, _ = timed(5, lambda: conn.execute(
+                "SELECT session, sender, html, created FROM messages WHERE html LIKE ? "
+                "ORDER BY id DESC LIMIT 50", (like,)).fetchall())
+            print(f"{query:<16}{hits:>6}{fts50:>8.2f}ms{fts95:>8.2f}ms{like50:>9.2f}ms")
+        conn.close()
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Latency the user sees after pressing Enter, with and without speculative
+# pre-solving. Simulated typists enter problems a key at a time, now and
+# then pausing mid-problem long enough to set speculation off on a prefix
+# that then goes to waste. Offscreen Qt, the stub backend with a fixed model
+# latency, and a fresh temporary cache per run.
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEventLoop, QTimer
+from PyQt5.QtWidgets import QApplication
+
+import backends
+import upstream
+from core import SolverCore
+from metrics import percentile
+from solution_cache import SolutionCache
+from speculation import DEBOUNCE_MS, Speculator
+from workers import TaskRunner
+
+PROBLEMS = 12
+MODEL_LATENCY = 1.5
+KEY_MS = 50
+# Chance of a pause after any key, and how long the pause is
+PAUSE_CHANCE = 0.02
+PAUSE_MS = DEBOUNCE_MS + 400
+# Reading the problem over before pressing Enter, from a glance to a check
+REVIEW_MS = (150, 1200)
+
+
+def wait(ms):
+    loop = QEventLoop()
+    QTimer.singleShot(int(ms), loop.quit)
+    loop.exec_()
+
+
+def submit(tasks, core, speculator, problem):
+    # What the app does on Enter; returns seconds until the answer is complete
+    start = time.perf_counter()
+    speculator.claim(problem)
+    if core.answer_locally(problem) is not None:
+        return time.perf_counter() - start
+    loop = QEventLoop()
+    tasks.submit(core.stream_model, problem, key=core.key_for(problem),
+                 on_chunk=lambda chunk: None, on_finished=loop.quit)
+    loop.exec_()
+    return time.perf_counter() - start
+
+
+def session(tmp, label, speculate):
+    rng = random.Random(3)
+    core = SolverCore(SolutionCache(os.path.join(tmp, f"{label}.sqlite3")))
+    tasks = TaskRunner(max_workers=4)
+    speculator = Speculator(tasks, core)
+    speculator.set_enabled(speculate)
+    latencies = []
+    for number in range(PROBLEMS):
+        problem = f"Integrate x^{number + 2} * cos({number + 1}x) dx"
+        typed = ""
+        for char in problem:
+            typed += char
+            speculator.text_changed(typed)
+            wait(PAUSE_MS if rng.random() < PAUSE_CHANCE else KEY_MS)
+        wait(rng.uniform(*REVIEW_MS))
+        latencies.append(submit(tasks, core, speculator, problem) * 1000)
+    speculator.set_enabled(False)
+    tasks.wait_for_done()
+    core.close()
+    return latencies, speculator
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)
+    stub = backends.StubBackend()
+    stub.latency = MODEL_LATENCY
+    backends.set_backend(upstream.GuardedBackend(stub, rate=1e6, burst=1000000))
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{PROBLEMS} problems typed at {KEY_MS} ms a key, {MODEL_LATENCY * 1000:.0f} ms model latency, "
+              f"{DEBOUNCE_MS} ms debounce")
+        for label, speculate in (("submit only", False), ("pre-solve", True)):
+            latencies, speculator = session(tmp, label.replace(" ", "-"), speculate)
+            line = (f"  {label:<12} after Enter p50 {percentile(latencies, 50):7.1f} ms  "
+                    f"p95 {percentile(latencies, 95):7.1f} ms")
+            if speculate:
+                line += (f"  | {speculator.started} speculative calls, {speculator.hits} hits "
+                         f"({speculator.hit_rate():.0%}), {len(speculator.wasted)} wasted, "
+                         f"{speculator.saved:.1f} s saved")
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Cold-start cost of the app: time to import main7 and time from process
+# start to the window's first paint, each measured in a fresh interpreter
+# (offscreen Qt, Gemini backend with a dummy key; nothing is sent before
+# the first paint). Also reports which heavy modules were loaded by then and
+# what importing them up front, as main7 used to, costs on its own.
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+HEAVY = ("google.generativeai", "reportlab.pdfgen.canvas", "PIL.Image", "webbrowser", "dotenv")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main7
+imported = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+marks = {{}}
+original = main7.MathSolverApp.paintEvent
+
+def paintEvent(self, event):
+    first = "paint" not in marks
+    if first:
+        marks["loaded"] = [name for name in {heavy!r} if name in sys.modules]
+    original(self, event)
+    if first:
+        marks["paint"] = time.perf_counter()
+        QApplication.instance().quit()
+
+main7.MathSolverApp.paintEvent = paintEvent
+main7.main()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_paint_ms": (marks["paint"] - start) * 1000,
+    "loaded": marks["loaded"],
+}}))
+"""
+
+EAGER = """
+import time
+start = time.perf_counter()
+{imports}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def run_child(code, env):
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen", MATHSOLVER_BACKEND="gemini",
+                   GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "benchmark"),
+                   MATHSOLVER_CACHE_PATH=os.path.join(tmp, "solutions.sqlite3"),
+                   MATHSOLVER_IMAGE_CACHE_PATH=os.path.join(tmp, "images.sqlite3"))
+        results = [json.loads(run_child(CHILD.format(root=ROOT, heavy=HEAVY), env)) for _ in range(RUNS)]
+        eager = [float(run_child(EAGER.format(imports="\n".join(f"import {name}" for name in HEAVY)), env))
+                 for _ in range(RUNS)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    paint_ms = statistics.median(r["first_paint_ms"] for r in results)
+    print(f"median of {RUNS} fresh processes")
+    print(f"  import main7:        {import_ms:7.1f} ms")
+    print(f"  first window paint:  {paint_ms:7.1f} ms after process start")
+    print(f"  heavy modules loaded by first paint: {', '.join(results[0]['loaded']) or 'none'}")
+    print(f"  importing {', '.join(HEAVY)} up front would add {statistics.median(eager):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
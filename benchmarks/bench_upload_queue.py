@@ -0,0 +1,100 @@
+# End-to-end throughput of a multi-image upload: a folder of scanned pages,
+# each extracted then solved, through the pipelined UploadQueue versus one
+# image at a time (extract, solve, next), as the single-image upload flow
+# worked. Offscreen Qt, the stub backend with per-call latency, temporary
+# caches, and a distinct problem per page so nothing is served from cache.
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image, ImageDraw
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+import backends
+import upstream
+from core import SolverCore
+from image_pipeline import image_files
+from solution_cache import SolutionCache
+from upload_queue import UploadQueue
+from workers import TaskRunner
+
+PAGES = 24
+EXTRACT_LATENCY = 0.3
+SOLVE_LATENCY = 0.5
+
+
+class ScanBackend(backends.StubBackend):
+    # Reads a different problem off every page; solving takes longer than reading
+    def generate(self, contents):
+        if isinstance(contents, list):
+            time.sleep(EXTRACT_LATENCY)
+            page = zlib.crc32(contents[-1]["data"]) % 10000
+            return f"Find the derivative of x^{page} * sin(x)"
+        time.sleep(SOLVE_LATENCY)
+        return self.answer(contents)
+
+
+def make_pages(folder):
+    for page in range(PAGES):
+        image = Image.new("RGB", (1200, 1600), "white")
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((100 + page * 20, 200, 700 + page * 10, 260 + page * 5), fill="black")
+        image.save(os.path.join(folder, f"page{page:02d}.png"))
+
+
+def open_core(tmp, label):
+    return SolverCore(SolutionCache(os.path.join(tmp, f"{label}-solutions.sqlite3")),
+                      SolutionCache(os.path.join(tmp, f"{label}-images.sqlite3")))
+
+
+def sequential(core, paths):
+    start = time.perf_counter()
+    first = None
+    for path in paths:
+        extraction = core.extract(path)
+        core.solve_all([extraction.text])
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first
+
+
+def pipelined(core, paths):
+    tasks = TaskRunner(max_workers=4)
+    queue = UploadQueue(tasks, core)
+    done = []
+    loop = QEventLoop()
+    start = time.perf_counter()
+    queue.item_done.connect(lambda item: done.append(time.perf_counter() - start))
+    queue.changed.connect(lambda: queue.idle() and loop.quit())
+    queue.add(paths)
+    loop.exec_()
+    elapsed = time.perf_counter() - start
+    failed = queue.counts()["failed"]
+    return elapsed, done[0], failed
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)
+    backends.set_backend(upstream.GuardedBackend(ScanBackend(), rate=1e6, burst=1000000))
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "scans")
+        os.makedirs(folder)
+        make_pages(folder)
+        paths = image_files([folder])
+        seq_time, seq_first = sequential(open_core(tmp, "sequential"), paths)
+        pipe_time, pipe_first, failed = pipelined(open_core(tmp, "pipelined"), paths)
+    print(f"{PAGES} pages, {EXTRACT_LATENCY * 1000:.0f} ms extraction and {SOLVE_LATENCY * 1000:.0f} ms solve per page")
+    print(f"  one at a time: {seq_time:6.2f} s  {PAGES / seq_time:5.2f} pages/s  first result {seq_first:5.2f} s")
+    print(f"  upload queue:  {pipe_time:6.2f} s  {PAGES / pipe_time:5.2f} pages/s  first result {pipe_first:5.2f} s"
+          f"  ({seq_time / pipe_time:.1f}x, {failed} failed)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# Drives the stub backend the way a busy classroom would: many concurrent
+# solves against a quota that refuses calls beyond a few in flight (429),
+# occasional 503s and a slow tail. Compares raw calls with the guarded
+# backend (rate limit, retries with backoff, adaptive concurrency, hedging).
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import StubBackend
+from metrics import percentile
+from upstream import GuardedBackend
+
+REQUESTS = 300
+CLIENTS = 16
+
+
+def stub():
+    return StubBackend(latency=0.05, jitter=0.02, error_rate=0.03, error_status=503,
+                       slow_rate=0.03, slow_latency=1.0, max_concurrent=6, seed=1)
+
+
+def run(backend):
+    def one(i):
+        start = time.perf_counter()
+        try:
+            backend.generate(f"Solve this:\n{i}x + 3 = {i + 20}")
+            ok = True
+        except Exception:
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        results = list(pool.map(one, range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    latencies = [ms for ok, ms in results if ok]
+    succeeded = len(latencies)
+    return (f"{succeeded}/{REQUESTS} succeeded, {elapsed:5.2f} s, "
+            f"p50 {percentile(latencies, 50):4.0f} ms, p95 {percentile(latencies, 95):4.0f} ms, "
+            f"p99 {percentile(latencies, 99):4.0f} ms")
+
+
+def main():
+    print(f"{REQUESTS} requests from {CLIENTS} clients, quota of 6 in flight, 3% 503s, 3% take 1 s")
+    raw = stub()
+    print(f"raw:              {run(raw)}, upstream calls {raw.calls}")
+    for hedge in (False, True):
+        inner = stub()
+        guarded = GuardedBackend(inner, rate=200, burst=20, hedge=hedge, seed=1)
+        label = "guarded + hedge: " if hedge else "guarded:          "
+        print(f"{label}{run(guarded)}, upstream calls {inner.calls}, retries {guarded.retried}, "
+              f"429s {guarded.throttled}, hedges {guarded.hedges} ({guarded.hedge_wins} won), "
+              f"final concurrency {guarded.limit.limit:.1f}")
+        guarded.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# Cost and accuracy of checking final answers locally. Each case is a
+# problem with a right and a wrong final answer written the way the model
+# writes them; a good check verifies the first, fails the second and stays
+# within a few milliseconds either way.
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import percentile
+
+RUNS = 200
+CASES = [
+    ("What is sqrt(2) * sin(1)", "1.19", "1.25"),
+    ("Calculate 3^(1/3) + e^2", "≈ 8.831", "8.9"),
+    ("Solve x^2 - 5x + 6 = 0", "x = 2 or x = 3", "x = 2 or x = 4"),
+    ("Solve x^2 = 2", "x = ±1.414", "x = ±1.5"),
+    ("Solve 2^x = 10", "x ≈ 3.32", "x ≈ 3.5"),
+    ("Solve sin(x) = 0.5", "x = π/6", "x = π/3"),
+    ("Find the derivative of x^3 * e^x", "3x^2 e^x + x^3 e^x", "3x^2 e^x"),
+    ("Differentiate sin(x)^2 * ln(x)", "2 sin(x) cos(x) ln(x) + sin(x)^2/x", "2 sin(x) cos(x) ln(x)"),
+    ("d/dx sqrt(x^2 + 1)", "f'(x) = x/sqrt(x^2 + 1)", "f'(x) = 1/(2sqrt(x^2 + 1))"),
+    ("Integrate x^2 * sin(x) dx", "-x^2 cos(x) + 2x sin(x) + 2cos(x) + C", "-x^2 cos(x) + 2x sin(x) + C"),
+    ("What is the integral of 1/x dx", "ln|x| + C", "1/x^2 + C"),
+    ("Integrate x * e^x dx", "x e^x - e^x + C", "x e^x + C"),
+    ("Integrate sin(x) from 0 to pi", "2", "1"),
+    ("Integrate e^x from 0 to 1", "≈ 1.718", "≈ 2.718"),
+]
+
+
+def answer(text):
+    return f"**Step 1:** Work it out\n**Step 2:** Check it\n**Final Answer:** {text}"
+
+
+def main():
+    # The import pays for numpy; the app does it on a thread at startup
+    start = time.perf_counter()
+    from verification import check_answer
+    check_answer(*CASES[0][:2])
+    print(f"first check (imports numpy): {(time.perf_counter() - start) * 1000:.1f} ms")
+    times = {}
+    wrong = 0
+    print(f"{'problem':<36}{'right':>10}{'wrong':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for problem, right, bad in CASES:
+        results = [check_answer(problem, answer(right)), check_answer(problem, answer(bad))]
+        wrong += (results[0].status != "verified") + (results[1].status != "failed")
+        samples = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            check_answer(problem, answer(right))
+            samples.append((time.perf_counter() - start) * 1000)
+        kind = results[0].kind or "unchecked"
+        times.setdefault(kind, []).extend(samples)
+        print(f"{problem[:35]:<36}{results[0].status:>10}{results[1].status:>10}"
+              f"{percentile(samples, 50):9.3f}{percentile(samples, 95):9.3f}")
+    for kind, samples in sorted(times.items()):
+        print(f"  {kind:<12} p50 {percentile(samples, 50):.3f} ms  p95 {percentile(samples, 95):.3f} ms")
+    print(f"{len(CASES) * 2 - wrong}/{len(CASES) * 2} verdicts as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# Load test for server.py: many keep-alive clients posting problems at once,
+# reporting requests/s and latency percentiles. Without --url it starts the
+# server itself on a free port with the stub backend, temporary caches and
+# the client-side rate limit lifted, so what is measured is the service.
+# Two mixes run by default: every problem distinct (each one a model call)
+# and a hot set of a few problems (coalesced in flight, then cached).
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import percentile
+
+
+async def read_response(reader):
+    # Returns (status, seconds until the first body byte arrived, body)
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        parts, first = [], None
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if first is None:
+                first = time.perf_counter()
+            data = await reader.readexactly(size + 2)
+            if not size:
+                break
+            parts.append(data[:-2])
+        return status, first, b"".join(parts)
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, time.perf_counter(), body
+
+
+async def client(host, port, path, problems, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for problem in problems:
+            body = json.dumps({"problem": problem}).encode("utf-8")
+            start = time.perf_counter()
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+            status, first, _ = await read_response(reader)
+            results.append((status, time.perf_counter() - start, first - start))
+    finally:
+        writer.close()
+
+
+async def fetch_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    _, _, body = await read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def run(host, port, path, problems, concurrency):
+    # Problems are dealt out round-robin, one keep-alive connection per client
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, path, problems[i::concurrency], results)
+                           for i in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def report(label, results, elapsed, before, after):
+    latencies = [total * 1000 for _, total, _ in results]
+    firsts = [first * 1000 for _, _, first in results]
+    errors = sum(1 for status, _, _ in results if status != 200)
+    calls = after["counters"].get("upstream.calls", 0) - before["counters"].get("upstream.calls", 0)
+    print(f"{label}: {len(results)} requests in {elapsed:.2f} s = {len(results) / elapsed:.0f} req/s, "
+          f"{errors} errors, {calls} model calls, {after['coalesced'] - before['coalesced']} coalesced")
+    print(f"  latency ms    p50 {percentile(latencies, 50):7.1f}  p95 {percentile(latencies, 95):7.1f}  "
+          f"p99 {percentile(latencies, 99):7.1f}  max {max(latencies):7.1f}")
+    print(f"  first byte ms p50 {percentile(firsts, 50):7.1f}  p95 {percentile(firsts, 95):7.1f}  "
+          f"p99 {percentile(firsts, 99):7.1f}")
+
+
+async def load(host, port, args):
+    path = "/solve/stream" if args.stream else "/solve"
+    mixes = [("distinct problems", [f"Find the derivative of x^{i} * sin(x)" for i in range(args.requests)]),
+             (f"hot set of {args.hot}", [f"Integrate x^{i % args.hot} * e^x dx" for i in range(args.requests)])]
+    for label, problems in mixes:
+        before = await fetch_json(host, port, "/metrics")
+        results, elapsed = await run(host, port, path, problems, args.concurrency)
+        after = await fetch_json(host, port, "/metrics")
+        report(f"{label} ({path}, {args.concurrency} clients)", results, elapsed, before, after)
+
+
+def start_server(tmp, latency):
+    env = dict(os.environ, MATHSOLVER_BACKEND="stub", MATHSOLVER_RATE_LIMIT="1000000",
+               MATHSOLVER_RATE_BURST="1000000",
+               MATHSOLVER_CACHE_PATH=os.path.join(tmp, "solutions.sqlite3"),
+               MATHSOLVER_IMAGE_CACHE_PATH=os.path.join(tmp, "images.sqlite3"))
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", "0",
+                                "--stub-latency", str(latency)],
+                               env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Serving on"):
+        process.kill()
+        raise RuntimeError("server did not start")
+    url = urlsplit(line.split()[-1])
+    return process, url.hostname, url.port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the HTTP solve service.")
+    parser.add_argument("--url", help="existing server to hit (default: start one with the stub backend)")
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    parser.add_argument("--hot", type=int, default=10, help="distinct problems in the hot mix")
+    parser.add_argument("--stream", action="store_true", help="use the server-sent events endpoint")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="seconds per stub model call")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        url = urlsplit(args.url)
+        asyncio.run(load(url.hostname, url.port, args))
+        return 0
+    with tempfile.TemporaryDirectory() as tmp:
+        process, host, port = start_server(tmp, args.stub_latency)
+        try:
+            asyncio.run(load(host, port, args))
+        finally:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
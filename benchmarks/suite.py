@@ -0,0 +1,523 @@
+# Regression suite: end-to-end solve latency, event-loop lag while answers
+# stream, render throughput, image preprocessing, PDF export and memory growth
+# over a long session, all against the real app with offscreen Qt and the
+# deterministic stub backend. Every scenario runs in a fresh interpreter with
+# its own temporary caches and history, a few times over; the medians are
+# written to a JSON file that `compare` checks against a baseline.
+#
+#   python benchmarks/suite.py run [--only solve render] [--repeat 3] [--output FILE]
+#   python benchmarks/suite.py compare BASELINE.json CURRENT.json [--threshold 10]
+#   python benchmarks/suite.py scenario NAME    (one run, printed, for poking at)
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from metrics import percentile
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SCHEMA = 1
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 10.0
+
+# Stub model: fixed latency, no jitter, so the app's own overhead is what moves
+MODEL_LATENCY = 0.1
+CHUNKS = 8
+CHUNK_DELAY = 0.01
+SOLVES = 20
+# Event-loop lag: answers in flight at once, each streamed over about a second
+IN_FLIGHT = 3
+LAG_CHUNKS = 40
+LAG_SOLVE_SECONDS = 1.2
+RENDER_MESSAGES = 2000
+STREAM_CHUNK = 40
+IMAGE_RUNS = 5
+EXPORT_MESSAGES = 2000
+SESSION_TURNS = 3000
+# Memory is measured from here on, after caches, fonts and pools have filled
+SESSION_WARMUP = 500
+# One turn in this many goes to the model instead of the fast path
+SESSION_MODEL_EVERY = 10
+
+# Word problems: not answered locally, not checkable, so no rechecks muddy the timings
+WORD_PROBLEM = "A train covers {miles} miles in {hours} hours; how fast does it go"
+LOCAL_PROBLEM = "Solve {a}x + {b} = {c}"
+# Scheduler noise on an idle machine; lag differences below this are not regressions
+LAG_FLOOR_MS = 1.0
+
+
+def metric(value, unit, better="lower", floor=0.0):
+    # floor: absolute differences below it are noise whatever the percentage
+    return {"value": round(float(value), 4), "unit": unit, "better": better, "floor": floor}
+
+
+# --- scenario helpers (run inside the child interpreter) -----------------------
+
+def qt_app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def use_stub(**options):
+    import backends
+    import upstream
+    stub = backends.StubBackend(**options)
+    backends.set_backend(upstream.GuardedBackend(stub, rate=1e6, burst=1000000))
+    return stub
+
+
+def open_window():
+    import main7
+    app = qt_app()
+    window = main7.MathSolverApp()
+    window.show()
+    app.processEvents()
+    return window
+
+
+def close_window(window):
+    window.close()
+    window.tasks.wait_for_done()
+    qt_app().processEvents()
+
+
+def wait_idle(window):
+    # Until every foreground task (streams, exports) has reported back
+    from PyQt5.QtCore import QEventLoop
+    if window.tasks.active_count() == 0:
+        return
+    loop = QEventLoop()
+
+    def changed(count):
+        if count == 0:
+            loop.quit()
+
+    window.tasks.active_changed.connect(changed)
+    loop.exec_()
+    window.tasks.active_changed.disconnect(changed)
+
+
+def submit(window, problem):
+    window.text_input.setText(problem)
+    window.solve_problem()
+
+
+def timed_solve(window, problem):
+    start = time.perf_counter()
+    submit(window, problem)
+    wait_idle(window)
+    qt_app().processEvents()
+    return (time.perf_counter() - start) * 1000
+
+
+def word_problem(n):
+    return WORD_PROBLEM.format(miles=60 + 7 * n, hours=2 + n % 5)
+
+
+def local_problem(n):
+    return LOCAL_PROBLEM.format(a=2 + n % 9, b=n, c=3 * n + 11)
+
+
+def rss_mb():
+    # Resident set size now (not the peak), Linux only
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def bench_module(name):
+    # Workloads shared with the single-purpose benchmarks next to this file
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    return __import__(name)
+
+
+# --- scenarios -------------------------------------------------------------------
+
+def scenario_solve():
+    # solve_math_problem from Enter to the finished answer on screen: model
+    # answers (stub latency subtracted gives the app's overhead), the same
+    # problems again from the cache, and fast-path problems
+    use_stub(latency=MODEL_LATENCY, chunks=CHUNKS, chunk_delay=CHUNK_DELAY)
+    window = open_window()
+    stub_ms = (MODEL_LATENCY + CHUNK_DELAY * (CHUNKS - 1)) * 1000
+    model = [timed_solve(window, word_problem(n)) for n in range(SOLVES)]
+    cached = [timed_solve(window, word_problem(n)) for n in range(SOLVES)]
+    local = [timed_solve(window, local_problem(n)) for n in range(SOLVES)]
+    close_window(window)
+    return {
+        "model_p50_ms": metric(percentile(model, 50), "ms"),
+        "model_p95_ms": metric(percentile(model, 95), "ms"),
+        "overhead_p50_ms": metric(percentile(model, 50) - stub_ms, "ms", floor=5.0),
+        "cached_p50_ms": metric(percentile(cached, 50), "ms", floor=0.5),
+        "local_p50_ms": metric(percentile(local, 50), "ms", floor=0.5),
+    }
+
+
+def scenario_event_loop():
+    # How late a 5 ms timer fires while several answers stream in at once
+    from PyQt5.QtCore import QTimer
+    from workers import EventLoopLagMonitor
+    per_chunk = LAG_SOLVE_SECONDS / LAG_CHUNKS
+    use_stub(latency=per_chunk, chunks=LAG_CHUNKS, chunk_delay=per_chunk)
+    window = open_window()
+    monitor = EventLoopLagMonitor(interval_ms=5)
+    monitor.start()
+    for n in range(IN_FLIGHT):
+        submit(window, word_problem(n))
+    wait_idle(window)
+    # Let the last renders and repaints land inside the measurement
+    QTimer.singleShot(100, monitor.stop)
+    while monitor.timer.isActive():
+        qt_app().processEvents()
+    close_window(window)
+    return {
+        "lag_p50_ms": metric(monitor.percentile_ms(50), "ms", floor=LAG_FLOOR_MS),
+        "lag_p99_ms": metric(monitor.percentile_ms(99), "ms", floor=5 * LAG_FLOOR_MS),
+        # One stall is all the max is; only a much longer one means anything
+        "lag_max_ms": metric(monitor.max_lag_ms(), "ms", floor=50 * LAG_FLOOR_MS),
+    }
+
+
+def scenario_render():
+    # markdown_to_html on a long answer in one go and in streaming-sized
+    # chunks, and add_chat_message into the chat view with each one painted
+    from markdown_render import MarkdownRenderer, markdown_to_html
+    text = bench_module("bench_markdown").long_answer()
+    megabytes = len(text.encode("utf-8")) / 1e6
+    one_shot = []
+    streamed = []
+    for _ in range(5):
+        start = time.perf_counter()
+        markdown_to_html(text)
+        one_shot.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        renderer = MarkdownRenderer()
+        for i in range(0, len(text), STREAM_CHUNK):
+            renderer.feed(text[i:i + STREAM_CHUNK])
+        renderer.flush()
+        streamed.append(time.perf_counter() - start)
+
+    stub = use_stub()
+    window = open_window()
+    app = qt_app()
+    answer = markdown_to_html(stub.solution("Integrate x^2 * sin(x) dx") + "\n" + text[:600])
+    append_ms = []
+    start = time.perf_counter()
+    for n in range(RENDER_MESSAGES):
+        begin = time.perf_counter()
+        if n % 2 == 0:
+            window.add_chat_message(word_problem(n), sender="User")
+        else:
+            window.add_chat_message(answer)
+        app.processEvents()
+        append_ms.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - start
+    close_window(window)
+    return {
+        "markdown_mb_per_s": metric(megabytes / min(one_shot), "MB/s", better="higher"),
+        "stream_mb_per_s": metric(megabytes / min(streamed), "MB/s", better="higher"),
+        "messages_per_s": metric(RENDER_MESSAGES / elapsed, "msg/s", better="higher"),
+        "append_p95_ms": metric(percentile(append_ms, 95), "ms", floor=0.5),
+    }
+
+
+def scenario_image():
+    # preprocess_image on a synthetic phone photo, and get_text_from_image
+    # through the stub, first upload and the same file again from the cache
+    import solver
+    from image_pipeline import preprocess_image
+    use_stub()
+    raw = bench_module("bench_image_preprocess").synthetic_photo()
+    timings = []
+    for _ in range(IMAGE_RUNS):
+        start = time.perf_counter()
+        data, _ = preprocess_image(raw)
+        timings.append((time.perf_counter() - start) * 1000)
+    path = os.path.join(os.environ["MATHSOLVER_BENCH_TMP"], "worksheet.jpg")
+    with open(path, "wb") as f:
+        f.write(raw)
+    cache = solver.open_image_cache()
+    start = time.perf_counter()
+    solver.get_text_from_image(path, cache)
+    cold = (time.perf_counter() - start) * 1000
+    repeat = []
+    for _ in range(IMAGE_RUNS):
+        start = time.perf_counter()
+        solver.get_text_from_image(path, cache)
+        repeat.append((time.perf_counter() - start) * 1000)
+    cache.close()
+    return {
+        "preprocess_p50_ms": metric(statistics.median(timings), "ms"),
+        "upload_ratio": metric(len(data) / len(raw), "ratio"),
+        "extract_cold_ms": metric(cold, "ms"),
+        "extract_cached_ms": metric(statistics.median(repeat), "ms", floor=0.5),
+    }
+
+
+def scenario_export():
+    # export_chat as the user runs it (dialogs answered in code) on a long
+    # history, then the exporter alone under tracemalloc for its peak memory
+    from PyQt5.QtWidgets import QFileDialog, QMessageBox
+    import pdf_export
+    use_stub()
+    path = os.path.join(os.environ["MATHSOLVER_BENCH_TMP"], "chat.pdf")
+    messages = list(bench_module("bench_pdf_export").history(EXPORT_MESSAGES))
+    window = open_window()
+    window.chat_model.clear()
+    for sender, html in messages:
+        window.append_chat(html, sender=sender)
+    qt_app().processEvents()
+    notes = []
+    QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (path, "PDF Files (*.pdf)"))
+    QMessageBox.information = staticmethod(lambda parent, title, text, *args: notes.append(text))
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *args: notes.append(text))
+    start = time.perf_counter()
+    window.export_chat()
+    wait_idle(window)
+    seconds = time.perf_counter() - start
+    close_window(window)
+    pages = re.search(r"\((\d+) pages\)", " ".join(notes))
+    if pages is None:
+        raise RuntimeError(f"export did not succeed: {notes}")
+    tracemalloc.start()
+    for _ in pdf_export.export_pdf(iter(messages), path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "export_s": metric(seconds, "s"),
+        "ms_per_message": metric(seconds * 1000 / EXPORT_MESSAGES, "ms"),
+        "pages": metric(int(pages.group(1)), "pages"),
+        "peak_mb": metric(peak / 1e6, "MB"),
+        "pdf_kb_per_message": metric(os.path.getsize(path) / 1024 / EXPORT_MESSAGES, "KB"),
+    }
+
+
+def scenario_memory():
+    # A long session of fast-path answers with a model answer every tenth
+    # turn; resident memory and live objects should level off once the chat
+    # starts paging old messages out
+    use_stub(chunks=4)
+    window = open_window()
+    app = qt_app()
+    start = time.perf_counter()
+    for turn in range(SESSION_TURNS):
+        if turn == SESSION_WARMUP:
+            gc.collect()
+            rss_start, objects_start = rss_mb(), len(gc.get_objects())
+        if turn % SESSION_MODEL_EVERY == 0:
+            submit(window, word_problem(turn))
+            wait_idle(window)
+        else:
+            submit(window, local_problem(turn))
+        app.processEvents()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    turns = SESSION_TURNS - SESSION_WARMUP
+    result = {
+        "rss_end_mb": metric(rss_mb(), "MB"),
+        "rss_growth_kb_per_turn": metric((rss_mb() - rss_start) * 1000 / turns, "KB", floor=0.5),
+        "objects_per_turn": metric((len(gc.get_objects()) - objects_start) / turns, "objects", floor=1.0),
+        "in_memory_messages": metric(len(window.chat_model.messages), "messages"),
+        "turn_mean_ms": metric(seconds * 1000 / SESSION_TURNS, "ms", floor=0.2),
+    }
+    close_window(window)
+    return result
+
+
+SCENARIOS = {
+    "solve": scenario_solve,
+    "event_loop": scenario_event_loop,
+    "render": scenario_render,
+    "image": scenario_image,
+    "export": scenario_export,
+    "memory": scenario_memory,
+}
+
+
+def run_scenario(name):
+    # In this interpreter, with caches, history and settings of its own
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "MATHSOLVER_BACKEND": "stub",
+            "MATHSOLVER_CACHE_PATH": os.path.join(tmp, "solutions.sqlite3"),
+            "MATHSOLVER_IMAGE_CACHE_PATH": os.path.join(tmp, "images.sqlite3"),
+            "MATHSOLVER_HISTORY_PATH": os.path.join(tmp, "history.sqlite3"),
+            "MATHSOLVER_SPECULATE": "0",
+            "MATHSOLVER_CONVERSATION": "0",
+            "MATHSOLVER_BENCH_TMP": tmp,
+        })
+        os.environ.pop("MATHSOLVER_METRICS", None)
+        # Held for the whole run; an unreferenced QApplication is collected along with every widget
+        app = qt_app()
+        result = SCENARIOS[name]()
+        app.processEvents()
+        return result
+
+
+# --- run and compare -----------------------------------------------------------------
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def environment():
+    from PyQt5.QtCore import QT_VERSION_STR
+    return {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "qt": QT_VERSION_STR,
+        "qt_platform": os.environ["QT_QPA_PLATFORM"],
+    }
+
+
+def child_run(name):
+    # A fresh interpreter per run: no warm caches, Qt state or heap carried over
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "scenario", name, "--json"],
+                               capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"scenario {name} failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(args):
+    names = args.only or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"unknown scenario {', '.join(unknown)}; expected {', '.join(SCENARIOS)}", file=sys.stderr)
+        return 2
+    results = {"schema": SCHEMA, "environment": environment(), "repeat": args.repeat, "scenarios": {}}
+    failed = False
+    for name in names:
+        start = time.perf_counter()
+        try:
+            runs = [child_run(name) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            failed = True
+            continue
+        scenario = {}
+        for key, first in runs[0].items():
+            samples = [r[key]["value"] for r in runs]
+            scenario[key] = dict(first, value=round(statistics.median(samples), 4), runs=samples)
+        results["scenarios"][name] = scenario
+        print(f"{name} ({time.perf_counter() - start:.1f} s)")
+        for key, value in scenario.items():
+            print(f"  {key:<26}{value['value']:>12.3f} {value['unit']}")
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['environment']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"results written to {output}")
+    return 1 if failed else 0
+
+
+def change(base, current):
+    # (percent change, worse?) with the metric's direction taken into account
+    if base["value"] == current["value"]:
+        return 0.0, False
+    pct = (current["value"] - base["value"]) / abs(base["value"]) * 100 if base["value"] else float("inf")
+    worse = pct > 0 if base["better"] == "lower" else pct < 0
+    return pct, worse
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for key in ("python", "platform", "cpus", "qt"):
+        before, after = baseline["environment"].get(key), current["environment"].get(key)
+        if before != after:
+            print(f"note: {key} differs ({before} → {after}); numbers may not be comparable")
+    print(f"{baseline['environment'].get('commit')} → {current['environment'].get('commit')}, "
+          f"threshold {args.threshold:g}%")
+    regressions = []
+    for name, metrics in baseline["scenarios"].items():
+        for key, base in metrics.items():
+            after = current["scenarios"].get(name, {}).get(key)
+            label = f"{name}.{key}"
+            if after is None:
+                print(f"  {label:<36} missing from {args.current}")
+                continue
+            pct, worse = change(base, after)
+            noise = abs(after["value"] - base["value"]) <= base.get("floor", 0.0)
+            if noise or abs(pct) <= args.threshold:
+                verdict = ""
+            elif worse:
+                verdict = "REGRESSION"
+                regressions.append(label)
+            else:
+                verdict = "improved"
+            print(f"  {label:<36}{base['value']:>12.3f}{after['value']:>12.3f} {base['unit']:<8}"
+                  f"{pct:>+8.1f}%  {verdict}")
+    for name in current["scenarios"].keys() - baseline["scenarios"].keys():
+        print(f"  {name}: not in the baseline")
+    if regressions:
+        print(f"{len(regressions)} regression{'s' if len(regressions) != 1 else ''} beyond "
+              f"{args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    print("no regressions")
+    return 0
+
+
+def scenario(args):
+    result = run_scenario(args.name)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f"{key:<26}{value['value']:>12.3f} {value['unit']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MathSolver benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the scenarios and save the results as JSON")
+    run_parser.add_argument("--only", nargs="+", metavar="SCENARIO", help=f"any of: {', '.join(SCENARIOS)}")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                            help=f"runs per scenario, the median is kept (default {DEFAULT_REPEAT})")
+    run_parser.add_argument("--output", help="results file (default benchmarks/results/<time>-<commit>.json)")
+    run_parser.set_defaults(handler=run)
+    compare_parser = commands.add_parser("compare", help="flag regressions between two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help=f"percent worse that counts as a regression (default {DEFAULT_THRESHOLD:g})")
+    compare_parser.set_defaults(handler=compare)
+    scenario_parser = commands.add_parser("scenario", help="run one scenario in this process")
+    scenario_parser.add_argument("name", choices=list(SCENARIOS))
+    scenario_parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    scenario_parser.set_defaults(handler=scenario)
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
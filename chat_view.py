@@ -0,0 +1,333 @@
+import html
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QSize, Qt
+from PyQt5.QtGui import QAbstractTextDocumentLayout, QKeySequence, QPalette, QTextDocument
+from PyQt5.QtWidgets import QApplication, QListView, QStyle, QStyledItemDelegate
+
+DEFAULT_MAX_IN_MEMORY = 500
+PAGE_SIZE = 100
+DOCUMENT_CACHE = 64
+MESSAGE_PADDING = 6
+
+SenderRole = Qt.UserRole + 1
+
+TAG = re.compile(r"<[^>]+>")
+LINE_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+
+
+def to_plain(message_html):
+    return html.unescape(TAG.sub("", LINE_BREAK.sub("\n", message_html))).strip()
+
+
+class ChatMessage:
+    # One chat entry. pending marks a message that is still streaming in and
+    # must stay in memory; height caches the laid-out size for one view width.
+    # stored is set once the message is in the session history (or if it is
+    # never meant to be), session and position are its place in the history.
+    __slots__ = ("sender", "html", "pending", "width", "height", "stored", "session", "position")
+
+    def __init__(self, sender, html, pending=False, stored=False):
+        self.sender = sender
+        self.html = html
+        self.pending = pending
+        self.width = None
+        self.height = None
+        self.stored = stored
+        self.session = None
+        self.position = None
+
+
+class MessageSpill:
+    # Append-only JSONL file holding messages paged out of the model. Offsets
+    # are kept in memory so any record can be read back with one seek.
+    def __init__(self, path=None):
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix="mathsolver-chat-", suffix=".jsonl")
+            os.close(handle)
+        self.path = path
+        self.file = open(path, "a+b")
+        self.offsets = []
+        # Open SpillReaders; while any exist the file is never cut short under them
+        self.readers = 0
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def write(self, messages):
+        self.file.seek(0, os.SEEK_END)
+        for message in messages:
+            self.offsets.append(self.file.tell())
+            record = {"sender": message.sender, "html": message.html}
+            self.file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.file.flush()
+
+    def read(self, start, stop):
+        messages = []
+        for offset in self.offsets[start:stop]:
+            # Records are not always back to back: see truncate()
+            self.file.seek(offset)
+            record = json.loads(self.file.readline())
+            # Only finished messages are spilled, and they were saved on the way out
+            messages.append(ChatMessage(record["sender"], record["html"], stored=True))
+        return messages
+
+    def truncate(self, length):
+        # Messages loaded back into the model leave the spill again. While a
+        # reader is going through the file the bytes stay and only the offsets go.
+        if length < len(self.offsets):
+            if not self.readers:
+                self.file.truncate(self.offsets[length])
+            del self.offsets[length:]
+
+    def reader(self):
+        return SpillReader(self)
+
+    def clear(self):
+        self.truncate(0)
+
+    def close(self):
+        self.file.close()
+        os.remove(self.path)
+
+
+class SpillReader:
+    # Iterates (sender, html) for the records spilled when it was created, on
+    # its own file handle, so another thread can walk the history while the
+    # chat keeps changing.
+    def __init__(self, spill):
+        self.spill = spill
+        self.offsets = list(spill.offsets)
+        self.open = True
+        spill.readers += 1
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        try:
+            with open(self.spill.path, "rb") as f:
+                for offset in self.offsets:
+                    f.seek(offset)
+                    record = json.loads(f.readline())
+                    yield record["sender"], record["html"]
+        finally:
+            self.close()
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self.spill.readers -= 1
+
+    __del__ = close
+
+
+class ChatModel(QAbstractListModel):
+    # Chat history as compact records. Only the newest max_in_memory messages
+    # live in the model; older ones are paged out to disk and read back a page
+    # at a time when the user scrolls to the top. With a SessionHistory every
+    # finished message is also saved, and scrolling past what this run paged
+    # out continues into earlier runs of the session.
+    def __init__(self, max_in_memory=DEFAULT_MAX_IN_MEMORY, spill=None, history=None, parent=None):
+        super().__init__(parent)
+        self.max_in_memory = max_in_memory
+        self.messages = []
+        self.spill = spill or MessageSpill()
+        self.history = history
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message.html
+        if role == SenderRole:
+            return message.sender
+        return None
+
+    def append(self, message):
+        if self.history:
+            self.history.record(message)
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append(message)
+        self.endInsertRows()
+        if len(self.messages) > self.max_in_memory:
+            self.page_out()
+        return message
+
+    def refresh(self, message):
+        # Re-measure and repaint a message whose html changed (streaming);
+        # it is saved the first time it is refreshed as no longer pending.
+        # Messages Clear Chat removed are left alone.
+        message.width = None
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row] is message:
+                if self.history and not message.pending and not message.stored:
+                    self.history.save(message)
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+                return True
+        return False
+
+    def page_out(self):
+        count = 0
+        # Page out a little more than needed so this doesn't run on every append
+        keep = max(self.max_in_memory - PAGE_SIZE, self.max_in_memory // 2)
+        limit = len(self.messages) - keep
+        while count < limit and not self.messages[count].pending:
+            count += 1
+        if count:
+            if self.history:
+                for message in self.messages[:count]:
+                    if not message.stored:
+                        self.history.save(message)
+            self.spill.write(self.messages[:count])
+            self.beginRemoveRows(QModelIndex(), 0, count - 1)
+            del self.messages[:count]
+            self.endRemoveRows()
+
+    def has_older(self):
+        return len(self.spill) > 0 or bool(self.history and self.history.has_older())
+
+    def load_older(self, count=PAGE_SIZE):
+        # Pulls the most recent page back from disk and returns how many rows
+        # were added. The spill holds what this run paged out, which is newer
+        # than anything the history still has to give back.
+        if len(self.spill):
+            stop = len(self.spill)
+            start = max(0, stop - count)
+            older = self.spill.read(start, stop)
+            self.spill.truncate(start)
+        elif self.history:
+            older = self.history.load_older(count)
+        else:
+            older = []
+        if not older:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(older) - 1)
+        self.messages[:0] = older
+        self.endInsertRows()
+        return len(older)
+
+    def snapshot(self):
+        # (count, iterator of (sender, html)) for the whole history as it is now,
+        # oldest first; safe to consume on a worker thread
+        stored, earlier = self.history.older() if self.history else (0, iter(()))
+        older = self.spill.reader()
+        current = [(message.sender, message.html) for message in self.messages]
+
+        def iterate():
+            yield from earlier
+            yield from older
+            yield from current
+        return stored + len(older) + len(current), iterate()
+
+    def clear(self):
+        # The history keeps the old session (it stays searchable); a new one starts
+        self.beginResetModel()
+        self.messages = []
+        self.spill.clear()
+        if self.history:
+            self.history.restart()
+        self.endResetModel()
+
+    def close(self):
+        # Messages still streaming are saved as far as they got
+        if self.history:
+            for message in self.messages:
+                if not message.stored:
+                    self.history.save(message)
+        self.spill.close()
+
+
+class ChatDelegate(QStyledItemDelegate):
+    # Paints each message as rich text. Heights are cached on the message for the
+    # current width, and parsed documents for recently painted rows are reused.
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.documents = OrderedDict()
+
+    def document(self, message, width):
+        key = id(message)
+        cached = self.documents.get(key)
+        if cached is not None and cached[0] is message and cached[1] == message.html and cached[2] == width:
+            self.documents.move_to_end(key)
+            return cached[3]
+        document = QTextDocument()
+        document.setDefaultFont(self.view.font())
+        document.setDocumentMargin(MESSAGE_PADDING)
+        document.setHtml(message.html)
+        document.setTextWidth(width)
+        self.documents[key] = (message, message.html, width, document)
+        if len(self.documents) > DOCUMENT_CACHE:
+            self.documents.popitem(last=False)
+        return document
+
+    def text_width(self):
+        return max(self.view.viewport().width() - 4, 50)
+
+    def sizeHint(self, option, index):
+        message = index.model().messages[index.row()]
+        width = self.text_width()
+        if message.width != width:
+            message.height = int(self.document(message, width).size().height())
+            message.width = width
+        return QSize(width, message.height)
+
+    def paint(self, painter, option, index):
+        message = index.model().messages[index.row()]
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        document = self.document(message, self.text_width())
+        context = QAbstractTextDocumentLayout.PaintContext()
+        role = QPalette.HighlightedText if option.state & QStyle.State_Selected else QPalette.Text
+        context.palette.setColor(QPalette.Text, option.palette.color(role))
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setClipRect(0, 0, option.rect.width(), option.rect.height())
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+
+class ChatView(QListView):
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(ChatDelegate(self))
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(50)
+        self.setSelectionMode(QListView.ExtendedSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.verticalScrollBar().valueChanged.connect(self.maybe_load_older)
+
+    def maybe_load_older(self, value):
+        model = self.model()
+        if value == 0 and model.has_older():
+            added = model.load_older()
+            if added:
+                # Keep the message that was at the top in place after rows are prepended
+                self.scrollTo(model.index(added), QListView.PositionAtTop)
+
+    def refresh_layout(self):
+        self.scheduleDelayedItemsLayout()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.scheduleDelayedItemsLayout()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            QApplication.clipboard().setText("\n".join(to_plain(self.model().messages[row].html) for row in rows))
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,157 @@
+import os
+import re
+from collections import deque
+import fast_solver
+from metrics import metrics
+from solver import SOLVE_PROMPT, estimate_tokens, final_answer
+
+DEFAULT_CONTEXT_TOKENS = 1500
+# Turns kept word for word; older ones live on as a line in the summary
+KEEP_TURNS = 8
+# Share of the context budget the summary of older turns may take
+SUMMARY_SHARE = 0.25
+SUMMARY_PROBLEM_CHARS = 120
+SUMMARY_ANSWER_CHARS = 80
+CONVERSATION_PROMPT = (
+    "You are helping a student with a series of math questions. Use the conversation so far "
+    "to answer the follow-up. Solve it step-by-step and clearly show the final answer at the end "
+    "without LaTeX or special formatting.\n\n{context}\nFollow-up: {problem}"
+)
+# Questions that lean on what came before: "now explain step 3", "what if
+# x = 5", "why is that", "do the same for cos(x)". Pronouns only count right
+# after a verb ("explain it"); on their own they are in plenty of problems.
+FOLLOW_UP = re.compile(
+    r"^\s*(now|and|then|so|but|also|why|how come|explain|what if|what about|and if|instead|again|"
+    r"continue|plug|substitute|do the same|same)\b"
+    r"|\b(step\s*\d+|previous|above|last one|the answer|your answer)\b"
+    r"|\b(explain|why is|why does|why did|how is|how does|how did|check|verify|simplify|expand|factor|"
+    r"solve|redo)\s+(it|that|this|these|those)\b",
+    re.IGNORECASE
+)
+# An operator between two operands (3x + 5, 2^10, (x+1)^2), which a question
+# carrying its own problem has; "what if x = 5" does not
+EXPRESSION = re.compile(
+    r"(?:\d|(?<![a-z])[a-z](?![a-z])|\))\s*[-+*/^×÷]\s*(?:\d|(?<![a-z])[a-z](?![a-z])|\(|\.\d)",
+    re.IGNORECASE
+)
+WORD = re.compile(r"[a-z]{3,}|\d+(?:\.\d+)?", re.IGNORECASE)
+STOP_WORDS = frozenset("the and for what with this that then now why how step steps show explain "
+                       "find solve answer final".split())
+
+
+def keywords(text):
+    return {word.lower() for word in WORD.findall(text)} - STOP_WORDS
+
+
+def shorten(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class Turn:
+    __slots__ = ("problem", "answer", "tokens", "words")
+
+    def __init__(self, problem, answer):
+        self.problem = problem
+        self.answer = answer
+        self.tokens = estimate_tokens(self.text())
+        self.words = keywords(problem)
+
+    def text(self):
+        return f"Student: {self.problem}\nTutor: {self.answer}\n"
+
+    def line(self):
+        return f"- {shorten(self.problem, SUMMARY_PROBLEM_CHARS)} → {shorten(final_answer(self.answer), SUMMARY_ANSWER_CHARS)}"
+
+
+class Conversation:
+    # The recent back-and-forth, kept compact for follow-up questions. The
+    # last KEEP_TURNS turns are kept word for word; as each older one drops
+    # out it is folded into a running summary of one line per turn (question
+    # and final answer), so nothing is ever re-summarized. A follow-up's
+    # prompt gets the latest turn, then the most relevant others in full
+    # while they fit the token budget, then summary lines for the rest, so
+    # its size stays flat however long the session runs. Used from the GUI
+    # thread only.
+    def __init__(self, budget=None):
+        self.budget = budget or int(os.getenv("MATHSOLVER_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS))
+        self.turns = deque()
+        self.summary = deque()
+        self.summary_tokens = 0
+
+    def __len__(self):
+        return len(self.turns) + len(self.summary)
+
+    def is_follow_up(self, problem):
+        return bool(self.turns) and FOLLOW_UP.search(problem) is not None and not stands_alone(problem)
+
+    def add(self, problem, answer):
+        self.turns.append(Turn(problem, answer))
+        if len(self.turns) > KEEP_TURNS:
+            self._fold(self.turns.popleft())
+
+    def clear(self):
+        self.turns.clear()
+        self.summary.clear()
+        self.summary_tokens = 0
+
+    def prompt(self, problem):
+        # (prompt, estimated prompt tokens) for a follow-up
+        room = self.budget - estimate_tokens(CONVERSATION_PROMPT.format(context="", problem=problem))
+        turns = list(self.turns)
+        latest = turns[-1]
+        chosen = {len(turns) - 1: self._fit(latest, room)}
+        room -= estimate_tokens(chosen[len(turns) - 1])
+        # The rest by shared keywords with the question, newest first on a tie
+        words = keywords(problem)
+        ranked = sorted(range(len(turns) - 1), key=lambda i: (len(words & turns[i].words), i), reverse=True)
+        for i in ranked:
+            if turns[i].tokens <= room:
+                chosen[i] = turns[i].text()
+                room -= turns[i].tokens
+        # Whatever did not fit in full, and the folded turns, as summary lines, newest first
+        lines = []
+        candidates = [turns[i].line() for i in range(len(turns) - 1, -1, -1) if i not in chosen]
+        candidates += reversed(self.summary)
+        for line in candidates:
+            cost = estimate_tokens(line) + 1
+            if cost > room:
+                break
+            lines.append(line)
+            room -= cost
+        context = ""
+        if lines:
+            context += "Earlier questions and answers:\n" + "\n".join(reversed(lines)) + "\n\n"
+        context += "".join(chosen[i] for i in sorted(chosen))
+        prompt = CONVERSATION_PROMPT.format(context=context, problem=problem)
+        tokens = estimate_tokens(prompt)
+        metrics.count("conversation.follow_ups")
+        metrics.count("conversation.prompt_tokens", tokens)
+        return prompt, tokens
+
+    def _fit(self, turn, room):
+        # The latest turn always goes in, its answer cut short if it alone is over budget
+        text = turn.text()
+        if estimate_tokens(text) <= room:
+            return text
+        keep = max(0, room * 4 - len(turn.problem) - 32)
+        return f"Student: {turn.problem}\nTutor: {turn.answer[:keep]}…\n"
+
+    def _fold(self, turn):
+        line = turn.line()
+        self.summary.append(line)
+        self.summary_tokens += estimate_tokens(line) + 1
+        metrics.count("conversation.summarized")
+        while self.summary_tokens > self.budget * SUMMARY_SHARE:
+            self.summary_tokens -= estimate_tokens(self.summary.popleft()) + 1
+
+
+def stands_alone(problem):
+    # A question with its own equation or expression, or one the fast path
+    # answers, needs no context however it is phrased
+    return EXPRESSION.search(problem) is not None or fast_solver.try_solve(problem, record=False) is not None
+
+
+def standalone_tokens(problem):
+    # Prompt size of an ordinary solve, for comparison with follow-ups
+    return estimate_tokens(SOLVE_PROMPT.format(problem=problem))
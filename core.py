@@ -0,0 +1,252 @@
+import os
+from html import escape
+import fast_solver
+import solver
+from intents import IntentMatcher
+from markdown_render import markdown_to_html
+from metrics import metrics
+from solution_cache import SingleFlight, normalize_problem
+from upstream import TokenBucket
+
+INVALID_PROBLEM = "Please enter a valid math problem to solve."
+# Answers that fail verification may be solved again this many times an hour
+DEFAULT_RECHECK_BUDGET = 10
+
+
+def is_valid_problem(problem):
+    return len(problem) >= 5 and any(char.isdigit() for char in problem)
+
+
+class Answer:
+    # source says where the text came from: intent, invalid, local, cache,
+    # model, or unsolved when the model gave nothing back. verification is
+    # set once SolverCore.verify has checked it.
+    def __init__(self, problem, text, source):
+        self.problem = problem
+        self.text = text
+        self.source = source
+        self.verification = None
+
+    @property
+    def solved(self):
+        return self.source in ("local", "cache", "model")
+
+    def html(self):
+        # Intent replies are written as HTML in intents.json
+        if self.source == "intent":
+            return self.text
+        return markdown_to_html(self.text) if self.solved else escape(self.text)
+
+    def to_dict(self):
+        result = {"problem": self.problem, "answer": self.text, "source": self.source, "html": self.html()}
+        if self.verification is not None:
+            result["verified"] = self.verification.status
+        return result
+
+
+def model_answer(problem, text):
+    text = text.strip() if text else ""
+    if not text or text == solver.NO_SOLUTION:
+        return Answer(problem, solver.NO_SOLUTION, "unsolved")
+    return Answer(problem, text, "model")
+
+
+class SolverCore:
+    # Everything needed to answer a problem or read an image, with no Qt:
+    # canned intent replies, the exact local fast path, the answer cache, model
+    # calls and image extraction. Safe to share between threads; the desktop
+    # app, the HTTP service and batch runs all go through one of these.
+    # Without a cache every problem goes to the model.
+    def __init__(self, cache=None, image_cache=None, intents=None):
+        self.intents = intents if intents is not None else IntentMatcher()
+        self.cache = cache
+        self.image_cache = image_cache
+        # Identical problems solved at the same time share one model call
+        self.flights = SingleFlight()
+        budget = int(os.getenv("MATHSOLVER_RECHECK_BUDGET", DEFAULT_RECHECK_BUDGET))
+        self.rechecks = TokenBucket(rate=budget / 3600, burst=budget)
+        self.rechecked = set()
+
+    @classmethod
+    def open(cls):
+        return cls(solver.open_solution_cache(), solver.open_image_cache())
+
+    def close(self):
+        for cache in (self.cache, self.image_cache):
+            if cache:
+                cache.close()
+
+    def key_for(self, problem):
+        return self.cache.key_for(problem) if self.cache else normalize_problem(problem)
+
+    def reply(self, problem, request=None):
+        # Greetings and small talk get their canned reply, anything else
+        # without a number is turned away; None means it is a real problem
+        with metrics.span("solve.intent", request):
+            response = self.intent(problem)
+        if response:
+            metrics.count("intent.hits")
+            return Answer(problem, response, "intent")
+        if not is_valid_problem(problem):
+            return Answer(problem, INVALID_PROBLEM, "invalid")
+        return None
+
+    def intent(self, problem):
+        # A problem with small talk around it ("thank you, 2+2?", "help me
+        # solve 2x+3=11") is still a problem: the canned reply is only for
+        # input with no number left once the matched phrase is taken out
+        response, rest = self.intents.split(problem)
+        if response is None or any(char.isdigit() for char in rest):
+            return None
+        return response
+
+    def answer_locally(self, problem, request=None):
+        # Arithmetic and simple equations are solved exactly without a round
+        # trip, then the cache is tried
+        with metrics.span("solve.fast_path", request):
+            local = fast_solver.try_solve(problem)
+        if local is not None:
+            metrics.count("fast_path.hits")
+            return Answer(problem, local.text, "local")
+        if self.cache is None:
+            return None
+        with metrics.span("solve.cache", request):
+            cached = self.cache.get(self.cache.key_for(problem))
+        if cached is not None:
+            metrics.count("cache.hits")
+            return Answer(problem, cached, "cache")
+        metrics.count("cache.misses")
+        return None
+
+    def needs_model(self, problem):
+        # True when only a model call can answer it. Checked without metrics or
+        # cache stats, so looking ahead at a half-typed problem counts for nothing.
+        if self.intent(problem) or not is_valid_problem(problem):
+            return False
+        if fast_solver.try_solve(problem, record=False) is not None:
+            return False
+        return self.cache is None or not self.cache.contains(self.cache.key_for(problem))
+
+    def quick_answer(self, problem, request=None):
+        return self.reply(problem, request) or self.answer_locally(problem, request)
+
+    def solve(self, problem, request=None):
+        # Blocking; meant for worker threads
+        return self.quick_answer(problem, request) or self.solve_model(problem)
+
+    def solve_model(self, problem):
+        def fetch():
+            return self.remember(problem, solver.solve_problem_text(problem))
+        return self.flights.do(self.key_for(problem), fetch)
+
+    def stream(self, problem, request=None):
+        # Generator of answer text chunks that returns the Answer; anything
+        # answered without the model arrives as a single chunk
+        answer = self.quick_answer(problem, request)
+        if answer is None:
+            answer = yield from self.stream_model(problem)
+        else:
+            yield answer.text
+        return answer
+
+    def stream_model(self, problem):
+        # Closing the generator early (cancel) leaves the cache untouched
+        parts = []
+        for chunk in solver.stream_problem_text(problem):
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        return self.remember(problem, "".join(parts))
+
+    def stream_follow_up(self, problem, prompt):
+        # A follow-up's answer depends on the conversation around it, so it is
+        # streamed from the prompt it was given and never cached
+        parts = []
+        for chunk in solver.stream_prompt_text(prompt):
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        text = "".join(parts).strip()
+        if not text or text == solver.NO_SOLUTION:
+            return Answer(problem, solver.NO_SOLUTION, "unsolved")
+        return Answer(problem, text, "model")
+
+    def verify(self, answer):
+        # Checks a model or cached answer's final answer numerically, in a few
+        # ms; returns the Verification (also kept on the answer), or None for
+        # answers that need no check
+        if answer.source not in ("model", "cache"):
+            return None
+        from verification import check_answer
+        with metrics.span("solve.verify"):
+            answer.verification = check_answer(answer.problem, answer.text)
+        metrics.count(f"verify.{answer.verification.status}")
+        return answer.verification
+
+    def allow_recheck(self, problem):
+        # Each problem is solved again at most once, within the hourly budget
+        key = self.key_for(problem)
+        if key in self.rechecked or not self.rechecks.try_acquire():
+            return False
+        self.rechecked.add(key)
+        return True
+
+    def recheck(self, problem, previous):
+        # One more model call for an answer that failed verification. The
+        # failing answer leaves the cache, and the new one only takes its
+        # place once it is verified. Blocking, for worker threads.
+        metrics.count("verify.rechecks")
+        text = solver.recheck_problem_text(problem, solver.final_answer(previous))
+        if self.cache:
+            self.cache.discard(self.cache.key_for(problem))
+        answer = model_answer(problem, text)
+        if answer.solved and self.verify(answer).status == "verified":
+            self.remember(problem, text)
+        return answer
+
+    def solve_batch(self, batch):
+        # (number, problem) pairs in one request; returns {number: Answer}
+        solutions = solver.solve_batch(batch)
+        return {number: self.remember(problem, solutions[number]) for number, problem in batch}
+
+    def solve_all(self, problems):
+        # Answers in order: anything solvable locally right away, the rest
+        # packed into as few model requests as the token budget allows. A
+        # problem that repeats, here or in another solve in flight, is only
+        # sent once.
+        answers = [self.answer_locally(problem) for problem in problems]
+        first = {}
+        for number, (problem, answer) in enumerate(zip(problems, answers), 1):
+            if answer is None:
+                first.setdefault(self.key_for(problem), (number, problem))
+        calls = {key: self.flights.begin(key) for key in first}
+        try:
+            leading = [first[key] for key, (_, leader) in calls.items() if leader]
+            for batch in solver.pack_problems(leading):
+                for number, answer in self.solve_batch(batch).items():
+                    calls[self.key_for(answer.problem)][0]["result"] = answer
+        except Exception as e:
+            for call, leader in calls.values():
+                if leader and call["result"] is None:
+                    call["error"] = e
+            raise
+        finally:
+            for key, (call, leader) in calls.items():
+                if leader:
+                    self.flights.finish(key, call)
+        for number, problem in enumerate(problems, 1):
+            if answers[number - 1] is None:
+                answers[number - 1] = self.flights.wait(calls[self.key_for(problem)][0])
+        return answers
+
+    def remember(self, problem, text):
+        answer = model_answer(problem, text)
+        if answer.solved and self.cache:
+            self.cache.put(self.cache.key_for(problem), problem, answer.text)
+        return answer
+
+    def extract(self, image_path, all_problems=False):
+        return solver.extract_image(image_path, self.image_cache, all_problems)
+
+    def extract_data(self, raw, name="image", all_problems=False):
+        return solver.extract_image_data(raw, name, self.image_cache, all_problems)
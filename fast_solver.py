@@ -0,0 +1,470 @@
+import math
+import re
+import time
+from fractions import Fraction
+
+# Problems are solved here without a network round trip when they fall into one
+# of the supported classes: arithmetic, percentages and single-variable linear
+# or quadratic equations. Anything else returns None and goes to Gemini.
+
+MAX_EXPONENT = 64
+MAX_DIGITS = 200
+
+PREFIX = re.compile(
+    r"^(?:please\s+)?(?:what\s+is|what's|calculate|compute|evaluate|simplify|"
+    r"solve\s+for\s+[a-z]|solve|find\s+[a-z]|find)\b\s*:?\s*",
+    re.IGNORECASE
+)
+PERCENT_OF = re.compile(r"^(.+?)\s*(?:%|percent)\s+of\s+(.+)$", re.IGNORECASE)
+TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|([a-zA-Z]+)|(\*\*|[-+*/^()=]))")
+# Closing punctuation, but not a factorial's "!" (5!, (n+1)!)
+TRAILING = re.compile(r"(?:[\s?.]|(?<![\d)])!)+$")
+SYMBOLS = str.maketrans({"×": "*", "÷": "/", "−": "-", "–": "-", "²": "^2", "³": "^3", "·": "*"})
+
+
+class Unsupported(Exception):
+    pass
+
+
+class LocalSolution:
+    def __init__(self, kind, steps, answer):
+        self.kind = kind
+        self.steps = steps
+        self.answer = answer
+
+    @property
+    def text(self):
+        lines = [f"**Step {i}:** {step}" for i, step in enumerate(self.steps, 1)]
+        lines.append(f"**Final Answer:** {self.answer}")
+        return "\n".join(lines)
+
+
+class FastPathStats:
+    def __init__(self):
+        self.attempts = 0
+        self.solved = 0
+        self.by_kind = {}
+        self.total_ms = 0.0
+
+    def record(self, solution, elapsed_ms):
+        self.attempts += 1
+        self.total_ms += elapsed_ms
+        if solution is not None:
+            self.solved += 1
+            self.by_kind[solution.kind] = self.by_kind.get(solution.kind, 0) + 1
+
+    def coverage(self):
+        return self.solved / self.attempts if self.attempts else 0.0
+
+    def mean_ms(self):
+        return self.total_ms / self.attempts if self.attempts else 0.0
+
+
+stats = FastPathStats()
+
+
+def try_solve(problem, record=True):
+    # record=False leaves the coverage stats alone (a lookahead, not a request)
+    start = time.perf_counter()
+    try:
+        solution = solve(problem)
+    except Exception:
+        # Unsupported, or anything the parser or evaluator trips over: either
+        # way there is no local answer and the model gets the problem
+        solution = None
+    if record:
+        stats.record(solution, (time.perf_counter() - start) * 1000)
+    return solution
+
+
+def solve(problem):
+    text = problem.strip().translate(SYMBOLS)
+    text = TRAILING.sub("", PREFIX.sub("", text))
+    percent = PERCENT_OF.match(text)
+    if percent:
+        return solve_percentage(percent.group(1), percent.group(2))
+    if text.endswith("="):
+        text = text[:-1]
+    sides = text.split("=")
+    if len(sides) == 1:
+        return solve_arithmetic(text)
+    if len(sides) == 2:
+        return solve_equation(sides[0], sides[1])
+    raise Unsupported(problem)
+
+
+# --- parsing -----------------------------------------------------------------
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if not match:
+            raise Unsupported(text[pos:])
+        number, word, op = match.groups()
+        if number:
+            tokens.append(("num", number))
+        elif word:
+            # Only single-letter variables; words like sin or sqrt need Gemini
+            if len(word) != 1:
+                raise Unsupported(word)
+            tokens.append(("var", word.lower()))
+        else:
+            tokens.append(("op", "^" if op == "**" else op))
+        pos = match.end()
+    return tokens
+
+
+class Parser:
+    # Recursive descent over + - * / ^ and parentheses with implicit
+    # multiplication (2x, 3(x + 1)). Produces a small tuple AST.
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise Unsupported("empty")
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise Unsupported("trailing input")
+        return node
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            node = (self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while True:
+            kind, value = self.peek()
+            if kind == "op" and value in "*/":
+                self.take()
+                node = (value, node, self.unary())
+            elif kind == "var" or (kind, value) == ("op", "("):
+                node = ("*", node, self.power())
+            else:
+                return node
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.unary())
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() == ("op", "^"):
+            self.take()
+            return ("^", base, self.unary())
+        return base
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            # Keep the literal so steps show 1.5 rather than 3/2
+            return ("num", Fraction(value), value)
+        if kind == "var":
+            return ("var", value)
+        if (kind, value) == ("op", "("):
+            node = self.expr()
+            if self.take() != ("op", ")"):
+                raise Unsupported("unbalanced parentheses")
+            return node
+        raise Unsupported(f"unexpected {value}")
+
+
+def variables(node, found=None):
+    found = set() if found is None else found
+    if node[0] == "var":
+        found.add(node[1])
+    elif node[0] != "num":
+        for child in node[1:]:
+            variables(child, found)
+    return found
+
+
+# --- exact arithmetic ----------------------------------------------------------
+
+def check_size(value):
+    if len(str(value.numerator)) + len(str(value.denominator)) > MAX_DIGITS:
+        raise Unsupported("number too large")
+    return value
+
+
+def evaluate(node, steps):
+    # Constant folding with one step per operation, innermost first
+    kind = node[0]
+    if kind == "num":
+        return node[1]
+    if kind == "neg":
+        return -evaluate(node[1], steps)
+    left = evaluate(node[1], steps)
+    right = evaluate(node[2], steps)
+    if kind == "/" and node[1][0] == node[2][0] == "num" and left.denominator == right.denominator == 1:
+        # A literal fraction like 3/4 is a number, not a step
+        return check_size(left / right)
+    if kind == "+":
+        result, verb = left + right, "Add"
+    elif kind == "-":
+        result, verb = left - right, "Subtract"
+    elif kind == "*":
+        result, verb = left * right, "Multiply"
+    elif kind == "/":
+        result, verb = left / right, "Divide"
+    else:
+        if right.denominator != 1 or abs(right) > MAX_EXPONENT:
+            raise Unsupported("exponent")
+        result, verb = left ** int(right), "Evaluate the power"
+    result = check_size(result)
+    steps.append(f"{verb}: {operand(node[1], left)} {display_op(kind)} {operand(node[2], right)} = {fmt(result)}")
+    return result
+
+
+def display_op(op):
+    return {"*": "×", "/": "÷"}.get(op, op)
+
+
+def operand(node, value):
+    return node[2] if node[0] == "num" else fmt(value, True)
+
+
+def fmt(value, parenthesize=False):
+    if value.denominator == 1:
+        text = str(value.numerator)
+    else:
+        text = f"{value.numerator}/{value.denominator}"
+    if parenthesize and (value < 0 or value.denominator != 1):
+        return f"({text})"
+    return text
+
+
+def fmt_answer(value):
+    # Exact value, plus a decimal when the fraction does not terminate neatly
+    if value.denominator == 1:
+        return str(value.numerator)
+    denominator = value.denominator
+    for prime in (2, 5):
+        while denominator % prime == 0:
+            denominator //= prime
+    decimal = f"{float(value):.6g}"
+    if denominator == 1 and len(decimal) < 12:
+        return f"{fmt(value)} = {decimal}"
+    return f"{fmt(value)} ≈ {decimal}"
+
+
+def solve_arithmetic(text):
+    tree = Parser(text).parse()
+    if variables(tree):
+        raise Unsupported("expression has a variable")
+    steps = []
+    result = evaluate(tree, steps)
+    if not steps:
+        steps.append(reduce_step(tree[1] if tree[0] == "neg" else tree, abs(result)))
+    return LocalSolution("arithmetic", steps, fmt_answer(result))
+
+
+def reduce_step(node, value):
+    # A bare literal fraction (3/4, 10 / 4) has nothing to fold, only to reduce
+    if node[0] != "/":
+        raise Unsupported("nothing to compute")
+    written = f"{node[1][2]}/{node[2][2]}"
+    if fmt(value) == written:
+        return f"{written} is already in lowest terms"
+    divisor = math.gcd(int(node[1][1]), int(node[2][1]))
+    return f"Divide the numerator and denominator by {divisor}: {written} = {fmt(value)}"
+
+
+def solve_percentage(percent_text, whole_text):
+    steps = []
+    percent_tree = Parser(percent_text).parse()
+    whole_tree = Parser(whole_text).parse()
+    if variables(percent_tree) or variables(whole_tree):
+        raise Unsupported("percentage of an expression with a variable")
+    percent = evaluate(percent_tree, steps)
+    whole = evaluate(whole_tree, steps)
+    rate = percent / 100
+    result = check_size(rate * whole)
+    steps.append(f"Convert the percentage to a fraction: {fmt(percent)}% = {fmt(percent)}/100 = {fmt(rate)}")
+    steps.append(f"Multiply by the whole: {fmt(rate, True)} × {fmt(whole, True)} = {fmt(result)}")
+    return LocalSolution("percentage", steps, f"{fmt(percent)}% of {fmt(whole)} = {fmt_answer(result)}")
+
+
+# --- polynomials ---------------------------------------------------------------
+
+def to_poly(node):
+    # Polynomials in one variable as {degree: coefficient}
+    kind = node[0]
+    if kind == "num":
+        return {0: node[1]}
+    if kind == "var":
+        return {1: Fraction(1)}
+    if kind == "neg":
+        return {d: -c for d, c in to_poly(node[1]).items()}
+    left, right = to_poly(node[1]), to_poly(node[2])
+    if kind == "+":
+        return poly_add(left, right)
+    if kind == "-":
+        return poly_add(left, {d: -c for d, c in right.items()})
+    if kind == "*":
+        return poly_mul(left, right)
+    if kind == "/":
+        if set(right) != {0} or right[0] == 0:
+            raise Unsupported("division by a variable")
+        return {d: c / right[0] for d, c in left.items()}
+    if set(right) != {0} or right[0].denominator != 1 or not 0 <= right[0] <= 2:
+        raise Unsupported("exponent")
+    result = {0: Fraction(1)}
+    for _ in range(int(right[0])):
+        result = poly_mul(result, left)
+    return result
+
+
+def poly_add(a, b):
+    result = dict(a)
+    for degree, coef in b.items():
+        result[degree] = result.get(degree, 0) + coef
+    return {d: c for d, c in result.items() if c != 0}
+
+
+def poly_mul(a, b):
+    result = {}
+    for da, ca in a.items():
+        for db, cb in b.items():
+            if da + db > 2:
+                raise Unsupported("degree above 2")
+            result[da + db] = result.get(da + db, 0) + ca * cb
+    return {d: check_size(c) for d, c in result.items() if c != 0}
+
+
+def fmt_poly(poly, var):
+    if not poly:
+        return "0"
+    parts = []
+    for degree in sorted(poly, reverse=True):
+        coef = poly[degree]
+        sign = "-" if coef < 0 else "+"
+        size = abs(coef)
+        if degree == 0:
+            body = fmt(size)
+        else:
+            power = var if degree == 1 else f"{var}^{degree}"
+            if size == 1:
+                body = power
+            elif size.denominator == 1:
+                body = f"{size}{power}"
+            else:
+                body = f"({fmt(size)}){power}"
+        parts.append((sign, body))
+    first_sign, first = parts[0]
+    text = ("-" if first_sign == "-" else "") + first
+    for sign, body in parts[1:]:
+        text += f" {sign} {body}"
+    return text
+
+
+def solve_equation(left_text, right_text):
+    left_tree = Parser(left_text).parse()
+    right_tree = Parser(right_text).parse()
+    names = variables(left_tree) | variables(right_tree)
+    if len(names) != 1:
+        raise Unsupported("need exactly one variable")
+    var = names.pop()
+    left, right = to_poly(left_tree), to_poly(right_tree)
+    simplified = f"{fmt_poly(left, var)} = {fmt_poly(right, var)}"
+    steps = []
+    if compact(simplified) != compact(f"{left_text}={right_text}"):
+        steps.append(f"Simplify both sides: {simplified}")
+    combined = poly_add(left, {d: -c for d, c in right.items()})
+    if combined.get(2, 0) != 0:
+        if any(right.values()):
+            steps.append(f"Move every term to the left side: {fmt_poly(combined, var)} = 0")
+        return solve_quadratic(combined, var, steps)
+    return solve_linear(combined, var, steps)
+
+
+def compact(text):
+    return re.sub(r"\s+", "", text.replace("**", "^")).lower()
+
+
+def solve_linear(poly, var, steps):
+    a = poly.get(1, Fraction(0))
+    b = poly.get(0, Fraction(0))
+    if a == 0:
+        if b == 0:
+            steps.append("Both sides are identical, so the equation holds for every value.")
+            return LocalSolution("linear", steps, f"Infinitely many solutions (every {var} works)")
+        steps.append(f"The {var} terms cancel, leaving {fmt(-b)} = 0, which is false.")
+        return LocalSolution("linear", steps, "No solution")
+    steps.append(f"Move the {var} terms to one side and the constants to the other: "
+                 f"{fmt_poly({1: a}, var)} = {fmt(-b)}")
+    root = -b / a
+    if a != 1:
+        steps.append(f"Divide both sides by {fmt(a, True)}: {var} = {fmt(-b, True)} ÷ {fmt(a, True)} = {fmt(root)}")
+    return LocalSolution("linear", steps, f"{var} = {fmt_answer(root)}")
+
+
+def exact_sqrt(value):
+    # Square root of a non-negative Fraction as (rational, radicand) with radicand square-free
+    outside, inside = 1, value.numerator * value.denominator
+    root = math.isqrt(inside)
+    if root * root == inside:
+        return Fraction(root, value.denominator), 1
+    # Trial division only pulls out small square factors; larger ones stay inside
+    factor = 2
+    while factor <= 1000 and factor * factor <= inside:
+        while inside % (factor * factor) == 0:
+            inside //= factor * factor
+            outside *= factor
+        factor += 1
+    return Fraction(outside, value.denominator), inside
+
+
+def solve_quadratic(poly, var, steps):
+    a = poly.get(2, Fraction(0))
+    b = poly.get(1, Fraction(0))
+    c = poly.get(0, Fraction(0))
+    if max(len(str(abs(x.numerator) * x.denominator)) for x in (a, b, c)) > 12:
+        raise Unsupported("coefficients too large to factor")
+    steps.append(f"Identify the coefficients: a = {fmt(a)}, b = {fmt(b)}, c = {fmt(c)}")
+    disc = b * b - 4 * a * c
+    steps.append(f"Compute the discriminant: D = b^2 - 4ac = {fmt(b, True)}^2 - 4 × {fmt(a, True)} × {fmt(c, True)} = {fmt(disc)}")
+    if disc < 0:
+        steps.append("The discriminant is negative, so there are no real roots.")
+        return LocalSolution("quadratic", steps, "No real solutions")
+    if disc == 0:
+        root = -b / (2 * a)
+        steps.append(f"The discriminant is zero, so there is one repeated root: {var} = -b / 2a = {fmt(root)}")
+        return LocalSolution("quadratic", steps, f"{var} = {fmt_answer(root)}")
+    steps.append(f"Apply the quadratic formula: {var} = (-b ± √D) / 2a")
+    rational, radicand = exact_sqrt(disc)
+    if radicand == 1:
+        roots = sorted({(-b - rational) / (2 * a), (-b + rational) / (2 * a)})
+        steps.append(f"√D = {fmt(rational)}, so {var} = ({fmt(-b)} ± {fmt(rational)}) / {fmt(2 * a)}")
+        answer = " or ".join(f"{var} = {fmt_answer(root)}" for root in roots)
+        return LocalSolution("quadratic", steps, answer)
+    centre = -b / (2 * a)
+    spread = abs(rational / (2 * a))
+    surd = ("" if spread.numerator == 1 else str(spread.numerator)) + f"√{radicand}"
+    if spread.denominator != 1:
+        surd += f"/{spread.denominator}"
+    exact = f"±{surd}" if centre == 0 else f"{fmt(centre)} ± {surd}"
+    approx = sorted(float(centre) + sign * float(spread) * math.sqrt(radicand) for sign in (-1, 1))
+    steps.append(f"√D does not simplify to a rational number, so the roots are {var} = {exact}")
+    answer = f"{var} = {exact} (≈ {approx[0]:.6g} or {approx[1]:.6g})"
+    return LocalSolution("quadratic", steps, answer)
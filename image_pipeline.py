@@ -0,0 +1,104 @@
+import hashlib
+import os
+from io import BytesIO
+
+TARGET_LONG_EDGE = 1536
+# How much darker than the paper a pixel must be to count as writing
+CONTENT_CONTRAST = 80
+CROP_MARGIN = 16
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+# Bump whenever the steps below change so cached extractions are not reused
+PIPELINE_VERSION = 1
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+
+def content_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+def image_files(paths):
+    # Image files among paths, with folders expanded (recursively, in name order)
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subfolders, names in os.walk(path):
+                subfolders.sort()
+                found.extend(os.path.join(folder, name) for name in sorted(names)
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            found.append(path)
+    return found
+
+
+def crop_to_content(image):
+    # Trims the empty paper around the writing. The paper colour is the median
+    # brightness; anything clearly darker than it counts as content.
+    histogram = image.histogram()
+    half, seen, paper = image.width * image.height / 2, 0, 255
+    for level, count in enumerate(histogram):
+        seen += count
+        if seen >= half:
+            paper = level
+            break
+    threshold = paper - CONTENT_CONTRAST
+    if threshold <= 0:
+        return image
+    box = image.point(lambda p: 255 if p < threshold else 0).getbbox()
+    if not box:
+        return image
+    left, top, right, bottom = box
+    box = (max(left - CROP_MARGIN, 0), max(top - CROP_MARGIN, 0),
+           min(right + CROP_MARGIN, image.width), min(bottom + CROP_MARGIN, image.height))
+    return image.crop(box)
+
+
+def preprocess_image(raw, long_edge=TARGET_LONG_EDGE):
+    # Returns (bytes, mime type) ready to upload: upright, grayscale, cropped,
+    # no larger than long_edge, and recompressed. PIL is imported here so the
+    # app doesn't pay for it until the first upload.
+    from PIL import Image, ImageOps, features
+    image = Image.open(BytesIO(raw))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparent areas become white paper instead of black
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = crop_to_content(image.convert("L"))
+    # reducing_gap does a fast integer downscale before the final resample
+    image.thumbnail((long_edge, long_edge), Image.LANCZOS, reducing_gap=2.0)
+    out = BytesIO()
+    if features.check("webp"):
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=2)
+        mime = "image/webp"
+    else:
+        image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    return out.getvalue(), mime
+
+
+class ImageExtraction:
+    def __init__(self, text, bytes_before, bytes_after, latency_ms, cached=False):
+        self.text = text
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+        self.latency_ms = latency_ms
+        self.cached = cached
+
+    @property
+    def problems(self):
+        return self.text.split("\n") if self.text else []
+
+    def summary(self):
+        if self.cached:
+            return f"⚡ cached extraction · {self.latency_ms:.1f} ms"
+        return (f"🖼️ {format_bytes(self.bytes_before)} → {format_bytes(self.bytes_after)} · "
+                f"{self.latency_ms / 1000:.2f} s")
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
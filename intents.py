@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULT_INTENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+RELOAD_CHECK_SECONDS = 1.0
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    return WHITESPACE.sub(" ", text.replace("’", "'").lower()).strip()
+
+
+class AhoCorasick:
+    # Multi-pattern automaton: one pass over the text finds every pattern
+    # occurrence, no matter how many patterns were loaded.
+    def __init__(self, patterns):
+        self.lengths = [len(pattern) for pattern in patterns]
+        goto = self.goto = [{}]
+        out = self.out = [None]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                child = goto[node].get(char)
+                if child is None:
+                    child = len(goto)
+                    goto.append({})
+                    out.append(None)
+                    goto[node][char] = child
+                node = child
+            out[node] = index
+
+        # Failure links, plus a link to the nearest node that ends a pattern so
+        # matching never walks failure chains that carry no output
+        fail = self.fail = [0] * len(goto)
+        link = self.link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(char, 0)
+                fail[child] = target
+                link[child] = target if out[target] is not None else link[target]
+
+    def iter_matches(self, text):
+        # Yields (start, end, pattern_index) for every occurrence
+        node = 0
+        goto, fail, out, link, lengths = self.goto, self.fail, self.out, self.link, self.lengths
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            state = node if out[node] is not None else link[node]
+            while state:
+                index = out[state]
+                yield end - lengths[index], end, index
+                state = link[state]
+
+
+class IntentMatcher:
+    # Canned replies loaded from intents.json. A pattern only fires on whole
+    # words ("hi" does not match inside "this"), and the longest pattern wins.
+    # The file is re-read in the background when its modification time changes.
+    def __init__(self, path=None, intents=None):
+        self.mtime = None
+        self.last_check = 0.0
+        self.reloading = False
+        self.table = ([], AhoCorasick([]))
+        if intents is not None:
+            self.path = None
+            self._install(intents)
+        else:
+            self.path = path or os.getenv("MATHSOLVER_INTENTS_PATH", DEFAULT_INTENTS_PATH)
+            self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Keep serving the last good set while the file is missing or half-written
+            return False
+        self._install(data.get("intents", []))
+        self.mtime = mtime
+        return True
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if self.path is None or now - self.last_check < RELOAD_CHECK_SECONDS:
+            return False
+        self.last_check = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self.mtime or self.reloading:
+            return False
+        # Large intent sets take a while to compile; keep matching against the
+        # current table until the new one is ready
+        self.reloading = True
+        threading.Thread(target=self._background_reload, daemon=True).start()
+        return True
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        finally:
+            self.reloading = False
+
+    def match(self, text):
+        return self.split(text)[0]
+
+    def split(self, text):
+        # (response, the rest of the text once the matched phrase is taken
+        # out), or (None, text) when nothing matches
+        self.reload_if_changed()
+        responses, automaton = self.table
+        text = normalize_text(text)
+        best = None
+        for start, end, index in automaton.iter_matches(text):
+            if start > 0 and is_word_char(text[start - 1]):
+                continue
+            if end < len(text) and is_word_char(text[end]):
+                continue
+            if best is None or end - start > best[1] - best[0]:
+                best = (start, end, index)
+        if best is None:
+            return None, text
+        return responses[best[2]], text[:best[0]] + text[best[1]:]
+
+    def _install(self, intents):
+        patterns, responses = [], []
+        for intent in intents:
+            for pattern in intent.get("patterns", []):
+                pattern = normalize_text(pattern)
+                if pattern:
+                    patterns.append(pattern)
+                    responses.append(intent["response"])
+        # Swapped in one assignment so a concurrent match never sees a half-built set
+        self.table = (responses, AhoCorasick(patterns))
+
+    def __len__(self):
+        return len(self.table[0])
+
+
+def is_word_char(char):
+    return char.isalnum() or char == "_"
@@ -1,72 +1,72 @@
 import sys
 import base64
-import google.generativeai as gmai
+from html import escape
+import threading
+import time
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QFrame, QPushButton, QLabel,
-    QFileDialog, QLineEdit, QTextEdit, QScrollBar, QCheckBox, QMessageBox
+    QFileDialog, QLineEdit, QScrollBar, QCheckBox, QMessageBox, QProgressDialog, QShortcut,
+    QInputDialog
 )
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QTextCursor, QIcon
-from PIL import Image
-import re
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QFont, QIcon, QKeySequence
 import os
-import webbrowser
-from dotenv import load_dotenv
+import backends
+import styles
+import upstream
+import fast_solver
+from core import SolverCore
+from image_pipeline import image_files
+from markdown_render import MarkdownRenderer, markdown_to_html
+from metrics import NULL_SPAN, RequestTiming, configure_from_env, metrics
+from session_store import SessionHistory, SessionStore
+from speculation import WASTE_BUDGET, Speculator
+from conversation import Conversation, standalone_tokens
+from chat_view import DEFAULT_MAX_IN_MEMORY, ChatMessage, ChatModel, ChatView, to_plain
+from upload_queue import STATE_ICONS, UploadQueue
+from workers import TaskRunner
+
+# Characters of each search hit shown in the results message
+SNIPPET_CHARS = 160
 
-# Load environment variables
-load_dotenv()
-
-# Configure Gemini API
-api_key = os.getenv('GEMINI_API_KEY')
-if not api_key:
-    QMessageBox.critical(None, "Error", "API key not found. Please create a .env file with GEMINI_API_KEY.")
-    sys.exit(1)
-
-gmai.configure(api_key=api_key)
 
 class MathSolverApp(QWidget):
+    # Emitted once, after the window has painted for the first time
+    first_paint = pyqtSignal()
+
     def __init__(self):
         super().__init__()
-        self.custom_responses = {
-            "hi": "<b>Hey there! 👋 Ready to solve some math?</b>",
-            "hello": "<b>Hello! Let's get solving 📂</b>",
-            "hii": "<b>Hi! 😊 Please enter your math question.</b>",
-            "thanks": "<b>You're welcome! Happy to help ✨</b>",
-            "thank you": "<b>Anytime! 🙌</b>",
-            "who made you": "<b>I was built by Krishna 🚀</b>",
-            "who are you": "<b>I'm your friendly AI Math Solver 🤖💡</b>",
-            "hey": "<b>Hey! 😊 How can I help you today?</b>",
-            "good morning": "<b>Good morning! ☀️ Ready to solve some problems?</b>",
-            "good night": "<b>Good night! 🌙 See you soon!</b>",
-            "bye": "<b>Bye! 👋 Come back for more math help anytime!</b>",
-            "i love you": "<b>❤️ Aww! I love solving math with you too!</b>",
-            "help": "<b>Need help? Just ask your math problem or upload an image! 🆘</b>",
-            "how are you": "<b>I'm great! Thanks for asking 😊</b>",
-            "yo": "<b>Yo! Ready to do some math magic? 🧠</b>",
-            "what's up": "<b>Not much! Just chilling and solving equations 😎</b>",
-            "ok": "<b>Okay! Just drop in your next math challenge 📝</b>",
-            "cool": "<b>Cool cool! Let's keep going 🔥</b>",
-            "what can you do": "<b>I can solve math problems, explain steps, read from images, and more! 🧮</b>",
-            "awesome": "<b>You're awesome too! Let's crack some numbers! 🤩</b>",
-            "are you real": "<b>I'm real in the digital world 🌐💻</b>",
-            "thank god": "<b>Haha, I'll take that as a compliment 😄</b>",
-            "who's your creator": "<b>I was crafted by Krishna! 👨‍💻</b>",
-            "you are cool": "<b>You're cooler! Let's keep solving 🔥</b>",
-            "you're smart": "<b>Thanks! I'm trained to be clever at math 😄</b>",
-            "solve this": "<b>Sure! Just send me the problem 🧮</b>",
-            "love you": "<b>Back at ya! 💖 Let's conquer those numbers!</b>",
-            "good evening": "<b>Good evening! 🌇 Let's dive into some math!</b>",
-            "gm": "<b>GM! ☀️ Hit me with a math question!</b>",
-            "gn": "<b>GN! 🌙 Dream of numbers!</b>"
-        }
         self.dark_mode = False
         # Initialize button variables
         self.github_btn = None
         self.issue_btn = None
         self.solve_btn = None
         self.upload_btn = None
+        self.folder_btn = None
+        self.cancel_btn = None
+        # Gemini calls run here so the event loop keeps painting and taking input
+        self.tasks = TaskRunner(max_workers=4, parent=self)
+        self.tasks.active_changed.connect(self.update_busy_state)
+        self.request_timings = []
+        self.export_worker = None
+        self.perf_panel = None
+        self.painted = False
+        # Intent replies, the fast path, the caches and model calls; nothing Qt in there
+        self.core = SolverCore.open()
+        self.cache = self.core.cache
+        # Uploaded images are extracted and solved as a pipeline; one chat message tracks them
+        self.uploads = UploadQueue(self.tasks, self.core, self)
+        self.uploads.changed.connect(self.show_upload_progress)
+        self.uploads.item_done.connect(self.show_upload_result)
+        self.upload_message = None
+        # In conversation mode follow-ups are answered with a window of the turns before them
+        self.conversation = Conversation()
+        # Optionally starts solving the input box's problem while it is still being typed;
+        # follow-ups depend on the conversation, so they are left alone
+        self.speculator = Speculator(self.tasks, self.core, self,
+                                     budget=int(os.getenv("MATHSOLVER_SPECULATE_BUDGET", WASTE_BUDGET)),
+                                     accept=lambda problem: not self.is_follow_up(problem))
+        self.setAcceptDrops(True)
         self.init_ui()
 
     def init_ui(self):
@@ -80,6 +80,9 @@ class MathSolverApp(QWidget):
             self.setWindowIcon(QIcon(icon_path))
         
         self.update_theme()
+        # Ctrl+Shift+P shows live stage latencies and event-loop lag
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=self.toggle_perf_panel)
+        QShortcut(QKeySequence.Find, self, activated=self.search_history)
 
         main_layout = QVBoxLayout(self)
         main_layout.setSpacing(10)
@@ -88,7 +91,7 @@ class MathSolverApp(QWidget):
         # Header with logo and title
         header = QFrame(self)
         header_layout = QHBoxLayout(header)
-        header.setStyleSheet("background: #3C8CE7; border-radius: 15px; padding: 15px;")
+        header.setObjectName("header")
         
         # Logo and title container
         title_container = QFrame()
@@ -96,11 +99,11 @@ class MathSolverApp(QWidget):
         title_layout.setContentsMargins(0, 0, 0, 0)
         
         logo_label = QLabel("🧮")
-        logo_label.setStyleSheet("font-size: 24px;")
+        logo_label.setObjectName("logo")
         title_layout.addWidget(logo_label)
         
         title_label = QLabel("MathSolver AI")
-        title_label.setStyleSheet("color: white; font-size: 24px; font-weight: bold; margin-left: 10px;")
+        title_label.setObjectName("title")
         title_label.setMinimumWidth(200)  # Minimum width for title
         title_layout.addWidget(title_label)
         
@@ -114,65 +117,43 @@ class MathSolverApp(QWidget):
         buttons_layout.setContentsMargins(0, 0, 0, 0)
 
         self.clear_btn = QPushButton("🗑️ Clear Chat", self)
-        self.clear_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #f44336;
-                color: white;
-                padding: 8px 15px;
-                border-radius: 8px;
-                font-weight: bold;
-                min-width: 100px;
-            }
-            QPushButton:hover {
-                background-color: #d32f2f;
-            }
-        """)
+        self.clear_btn.setObjectName("clearButton")
+        self.clear_btn.setProperty("role", "header")
         self.clear_btn.clicked.connect(self.clear_chat)
         buttons_layout.addWidget(self.clear_btn)
 
+        self.search_btn = QPushButton("🔎 Search", self)
+        self.search_btn.setObjectName("searchButton")
+        self.search_btn.setProperty("role", "header")
+        self.search_btn.clicked.connect(self.search_history)
+        buttons_layout.addWidget(self.search_btn)
+
         self.export_btn = QPushButton("📄 Export PDF", self)
-        self.export_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                padding: 8px 15px;
-                border-radius: 8px;
-                font-weight: bold;
-                min-width: 100px;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-        """)
+        self.export_btn.setObjectName("exportButton")
+        self.export_btn.setProperty("role", "header")
         self.export_btn.clicked.connect(self.export_chat)
         buttons_layout.addWidget(self.export_btn)
 
         self.dark_toggle = QCheckBox("🌙 Dark Mode", self)
-        self.dark_toggle.setStyleSheet("""
-            QCheckBox {
-                color: white;
-                font-weight: bold;
-                padding: 8px;
-            }
-        """)
+        self.dark_toggle.setObjectName("darkToggle")
         self.dark_toggle.stateChanged.connect(self.toggle_dark_mode)
         buttons_layout.addWidget(self.dark_toggle)
 
         header_layout.addWidget(buttons_container)
         main_layout.addWidget(header)
 
-        # Chat area with improved styling
-        self.chat_area = QTextEdit(self)
-        self.chat_area.setReadOnly(True)
-        self.chat_area.setStyleSheet("""
-            QTextEdit {
-                background-color: white;
-                border-radius: 15px;
-                padding: 15px;
-                font-size: 14px;
-                border: 2px solid #E0E0E0;
-            }
-        """)
+        # Chat area with improved styling. Messages live in a bounded model and
+        # the list view only lays out the rows it shows. Every message is kept
+        # in the history store; startup reads back only the latest page.
+        self.history_store = SessionStore()
+        self.chat_model = ChatModel(
+            max_in_memory=int(os.getenv("MATHSOLVER_CHAT_IN_MEMORY", DEFAULT_MAX_IN_MEMORY)),
+            history=SessionHistory(self.history_store),
+            parent=self
+        )
+        self.chat_model.load_older()
+        self.chat_area = ChatView(self.chat_model, self)
+        self.chat_area.setObjectName("chatArea")
         self.chat_area.setFont(QFont("Segoe UI", 12))
         main_layout.addWidget(self.chat_area, 8)
 
@@ -184,19 +165,9 @@ class MathSolverApp(QWidget):
         
         self.text_input = QLineEdit(self)
         self.text_input.setPlaceholderText("Type your math problem here...")
-        self.text_input.setStyleSheet("""
-            QLineEdit {
-                border: 2px solid #E0E0E0;
-                border-radius: 10px;
-                padding: 12px;
-                font-size: 14px;
-                background-color: white;
-            }
-            QLineEdit:focus {
-                border: 2px solid #3C8CE7;
-            }
-        """)
+        self.text_input.setObjectName("problemInput")
         self.text_input.returnPressed.connect(self.solve_problem)
+        self.text_input.textChanged.connect(self.speculator.text_changed)
         input_layout.addWidget(self.text_input, 3)
 
         # Buttons container for input area
@@ -206,52 +177,53 @@ class MathSolverApp(QWidget):
         input_buttons_layout.setContentsMargins(0, 0, 0, 0)
 
         self.solve_btn = QPushButton("🚀 Solve", self)
-        self.solve_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border-radius: 10px;
-                padding: 12px 20px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #388E3C;
-            }
-        """)
+        self.solve_btn.setObjectName("solveButton")
+        self.solve_btn.setProperty("role", "input")
         self.solve_btn.clicked.connect(self.solve_problem)
         input_buttons_layout.addWidget(self.solve_btn)
 
         self.upload_btn = QPushButton("📸 Upload", self)
-        self.upload_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #FF5722;
-                color: white;
-                border-radius: 10px;
-                padding: 12px 20px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #E64A19;
-            }
-        """)
+        self.upload_btn.setObjectName("uploadButton")
+        self.upload_btn.setProperty("role", "input")
         self.upload_btn.clicked.connect(self.upload_image)
         input_buttons_layout.addWidget(self.upload_btn)
 
+        self.folder_btn = QPushButton("📂 Folder", self)
+        self.folder_btn.setObjectName("folderButton")
+        self.folder_btn.setProperty("role", "input")
+        self.folder_btn.setToolTip("Upload every image in a folder")
+        self.folder_btn.clicked.connect(self.upload_folder)
+        input_buttons_layout.addWidget(self.folder_btn)
+
+        self.multi_toggle = QCheckBox("📚 All problems", self)
+        self.multi_toggle.setToolTip("Extract and solve every problem in each uploaded image")
+        input_buttons_layout.addWidget(self.multi_toggle)
+
+        self.speculate_toggle = QCheckBox("🔮 Pre-solve", self)
+        self.speculate_toggle.setToolTip("Start solving while you type, so the answer is ready sooner")
+        self.speculate_toggle.toggled.connect(self.speculator.set_enabled)
+        self.speculate_toggle.setChecked(os.getenv("MATHSOLVER_SPECULATE") == "1")
+        input_buttons_layout.addWidget(self.speculate_toggle)
+
+        self.conversation_toggle = QCheckBox("💬 Conversation", self)
+        self.conversation_toggle.setToolTip("Answer follow-ups like \"now explain step 3\" using the chat so far")
+        self.conversation_toggle.setChecked(os.getenv("MATHSOLVER_CONVERSATION") == "1")
+        input_buttons_layout.addWidget(self.conversation_toggle)
+
+        self.cancel_btn = QPushButton("⏹ Cancel", self)
+        self.cancel_btn.setObjectName("cancelButton")
+        self.cancel_btn.setProperty("role", "input")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_pending)
+        input_buttons_layout.addWidget(self.cancel_btn)
+
         input_layout.addWidget(input_buttons_container, 1)
         main_layout.addWidget(input_container, 1)
 
         # Footer with improved styling
         footer = QFrame(self)
         footer_layout = QHBoxLayout(footer)
-        footer.setStyleSheet("""
-            QFrame {
-                background: #FF9800;
-                border-radius: 15px;
-                padding: 15px;
-            }
-        """)
+        footer.setObjectName("footer")
         
         # Left side - Developer info
         developer_info = QFrame()
@@ -259,11 +231,11 @@ class MathSolverApp(QWidget):
         developer_layout.setContentsMargins(0, 0, 0, 0)
         
         developer_label = QLabel("👨‍💻 Developed by Krishna Singh")
-        developer_label.setStyleSheet("color: white; font-size: 14px; font-weight: bold;")
+        developer_label.setObjectName("developer")
         developer_layout.addWidget(developer_label)
         
         version_label = QLabel("Version 1.0.0")
-        version_label.setStyleSheet("color: white; font-size: 12px;")
+        version_label.setObjectName("version")
         developer_layout.addWidget(version_label)
         
         footer_layout.addWidget(developer_info)
@@ -276,46 +248,23 @@ class MathSolverApp(QWidget):
         
         # GitHub button
         self.github_btn = QPushButton("⭐ Star", self)
-        self.github_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                color: white;
-                border: 2px solid white;
-                border-radius: 8px;
-                padding: 8px 15px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: rgba(255, 255, 255, 0.1);
-            }
-        """)
-        self.github_btn.clicked.connect(lambda: webbrowser.open("https://github.com/Krishna-singh18/mathsolver-ai"))
+        self.github_btn.setProperty("role", "link")
+        self.github_btn.clicked.connect(lambda: self.open_link("https://github.com/Krishna-singh18/mathsolver-ai"))
         links_layout.addWidget(self.github_btn)
         
         # Report Issue button
         self.issue_btn = QPushButton("🐛 Issue", self)
-        self.issue_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                color: white;
-                border: 2px solid white;
-                border-radius: 8px;
-                padding: 8px 15px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: rgba(255, 255, 255, 0.1);
-            }
-        """)
-        self.issue_btn.clicked.connect(lambda: webbrowser.open("https://github.com/Krishna-singh18/mathsolver-ai/issues"))
+        self.issue_btn.setProperty("role", "link")
+        self.issue_btn.clicked.connect(lambda: self.open_link("https://github.com/Krishna-singh18/mathsolver-ai/issues"))
         links_layout.addWidget(self.issue_btn)
         
         footer_layout.addWidget(links_container)
         main_layout.addWidget(footer)
 
-        # Add welcome message
+        # Add welcome message, unless the last session is being continued
+        if self.chat_model.rowCount():
+            self.scroll_to_bottom()
+            return
         self.add_chat_message("""
         <b>Welcome to MathSolver AI! 🎉</b><br><br>
         I can help you with:
@@ -327,13 +276,12 @@ class MathSolverApp(QWidget):
         """, "AI")
 
     def update_theme(self):
-        if self.dark_mode:
-            self.setStyleSheet("background-color: #121212; color: white;")
-            self.chat_area.setStyleSheet("background-color: #1E1E1E; color: white; border-radius: 10px; padding: 10px; font-size: 14px;")
-        else:
-            self.setStyleSheet("background: #F0F4F8;")
-            if hasattr(self, 'chat_area'):
-                self.chat_area.setStyleSheet("background-color: white; color: black; border-radius: 10px; padding: 10px; font-size: 14px;")
+        # One application-wide stylesheet, re-parsed only when the theme changes
+        QApplication.instance().setStyleSheet(styles.stylesheet(self.dark_mode))
+
+    def open_link(self, url):
+        import webbrowser
+        webbrowser.open(url)
 
     def toggle_dark_mode(self):
         self.dark_mode = not self.dark_mode
@@ -341,172 +289,391 @@ class MathSolverApp(QWidget):
 
     def add_chat_message(self, text, sender="AI"):
         if sender == "User":
-            self.chat_area.append(f"<b>🧑‍💻 You:</b> {text}")
+            self.append_chat(f"<b>🧑‍💻 You:</b> {escape(text)}", sender="User")
         else:
-            self.chat_area.append(f"<b>🤖 AI:</b> {text}")
-        self.chat_area.moveCursor(QTextCursor.End)
-        self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
+            self.append_chat(f"<b>🤖 AI:</b> {text}")
+
+    def append_chat(self, html, sender="AI", pending=False, persist=True):
+        # persist=False shows a message without keeping it in the history
+        message = self.chat_model.append(ChatMessage(sender, html, pending, stored=not persist))
+        self.scroll_to_bottom()
+        return message
+
+    def scroll_to_bottom(self):
+        self.chat_area.scrollToBottom()
 
     def clear_chat(self):
-        self.chat_area.clear()
+        self.chat_model.clear()
+        self.conversation.clear()
+
+    def search_history(self):
+        text, ok = QInputDialog.getText(self, "Search History", "Find messages containing:")
+        if not ok or not text.strip():
+            return
+        start = time.perf_counter()
+        results = self.history_store.search(text)
+        elapsed = (time.perf_counter() - start) * 1000
+        lines = [f"<b>🔎 {len(results)} result{'s' if len(results) != 1 else ''} for "
+                 f"“{escape(text.strip())}”</b>"]
+        for _, sender, html, created in results:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(created))
+            snippet = " ".join(to_plain(html).split())
+            if len(snippet) > SNIPPET_CHARS:
+                snippet = snippet[:SNIPPET_CHARS] + "…"
+            lines.append(f"<span style='color: gray;'>{when}</span> {escape(snippet)}")
+        lines.append(f"<span style='color: gray; font-size: 11px;'>{elapsed:.1f} ms</span>")
+        self.append_chat("<br>".join(lines), persist=False)
 
     def export_chat(self):
-        try:
-            chat_content = self.chat_area.toPlainText()
-            if not chat_content.strip():
-                QMessageBox.warning(self, "Warning", "No chat history to export!")
-                return
-                
-            file_path, _ = QFileDialog.getSaveFileName(
-                self,
-                "Export Chat History",
-                "chat_history.pdf",
-                "PDF Files (*.pdf)"
-            )
-            
-            if file_path:
-                c = canvas.Canvas(file_path, pagesize=letter)
-                width, height = letter
-                y = height - 50
-                c.setFont("Helvetica", 12)
-                
-                # Add title
-                c.setFont("Helvetica-Bold", 16)
-                c.drawString(50, height - 30, "MathSolver AI - Chat History")
-                c.setFont("Helvetica", 12)
-                y = height - 70
-                
-                for line in chat_content.split("\n"):
-                    if y < 50:
-                        c.showPage()
-                        c.setFont("Helvetica", 12)
-                        y = height - 50
-                    c.drawString(50, y, line)
-                    y -= 15
-                
-                c.save()
-                QMessageBox.information(self, "Success", "Chat history exported successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to export chat history: {str(e)}")
+        if self.export_worker is not None:
+            QMessageBox.information(self, "Export", "An export is already running.")
+            return
+        count, messages = self.chat_model.snapshot()
+        if not count:
+            QMessageBox.warning(self, "Warning", "No chat history to export!")
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Chat History",
+            "chat_history.pdf",
+            "PDF Files (*.pdf)"
+        )
+        if not file_path:
+            return
+
+        # The PDF is written on a worker thread straight from the history, a
+        # message at a time; the dialog only shows progress and offers Cancel
+        import pdf_export  # reportlab is only loaded once someone exports
+        progress = QProgressDialog("Exporting chat history...", "Cancel", 0, count, self)
+        progress.setWindowTitle("Export PDF")
+        progress.setMinimumDuration(300)
+        progress.setValue(0)
+
+        def finish():
+            if self.export_worker is not None:
+                self.export_worker = None
+                progress.close()
+
+        def on_result(pages):
+            finish()
+            QMessageBox.information(self, "Success", f"Chat history exported successfully! ({pages} pages)")
+
+        def on_error(error):
+            finish()
+            QMessageBox.critical(self, "Error", f"Failed to export chat history: {str(error)}")
+
+        self.export_worker = self.tasks.submit(
+            pdf_export.export_pdf, messages, file_path,
+            on_chunk=progress.setValue,
+            on_result=on_result,
+            on_error=on_error,
+            # A cancelled worker never reports a result, only that it finished
+            on_finished=finish
+        )
+        progress.canceled.connect(lambda: self.export_worker and self.tasks.cancel(self.export_worker))
 
     def solve_problem(self):
         problem = self.text_input.text().strip()
         if problem:
             self.add_chat_message(problem, sender="User")
             self.text_input.clear()
-            self.add_chat_message("Typing...", sender="AI")
-            QTimer.singleShot(1000, lambda: self.solve_math_problem(problem))
+            self.solve_math_problem(problem)
 
     def solve_math_problem(self, problem):
-        problem_lower = problem.lower().strip()
-        for key in self.custom_responses:
-            if key in problem_lower:
-                self.chat_area.append(f"<b>🤖 AI:</b> {self.custom_responses[key]}")
-                self.chat_area.moveCursor(QTextCursor.End)
-                self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
-                return
-
-        if len(problem) < 5 or not any(char.isdigit() for char in problem):
-            self.chat_area.append("<b>🤖 AI:</b> Please enter a valid math problem to solve.")
-            self.chat_area.moveCursor(QTextCursor.End)
-            self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
+        # Every stage is timed under one request id; all no-ops unless metrics are on
+        request = metrics.new_request()
+        total = metrics.span("solve.total", request)
+        # Seconds already spent on it while it was typed, or None
+        speculated = self.speculator.claim(problem)
+        if self.is_follow_up(problem):
+            prompt, tokens = self.conversation.prompt(problem)
+            self.append_chat("<b>🤖 AI:</b> Answering with the conversation so far...")
+            self.stream_solution(problem, None, request, total, prompt=prompt, prompt_tokens=tokens)
+            return
+        reply = self.core.reply(problem, request)
+        if reply is not None:
+            self.append_chat(f"<b>🤖 AI:</b> {reply.html()}")
+            total.end()
+            return
+
+        local = self.answer_locally(problem, request)
+        if local is not None:
+            answer, badge = local
+            self.remember_turn(problem, answer)
+            if speculated is not None:
+                badge += f"<br>{self.speculation_badge(speculated)}"
+            with metrics.span("solve.render", request):
+                self.append_chat(f"<b>🤖 AI:</b><br>{self.markdown_to_html(answer)}<br>{badge}")
+            total.end()
             return
 
         # Show loading message
-        self.chat_area.append("<b>🤖 AI:</b> Generating step-by-step solution...")
-        self.chat_area.moveCursor(QTextCursor.End)
-        self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
-        
-        # Disable buttons while processing
-        self.solve_btn.setEnabled(False)
-        self.upload_btn.setEnabled(False)
-        self.text_input.setEnabled(False)
-        
-        try:
-            model = gmai.GenerativeModel("gemini-2.0-flash")
-            prompt = f"Solve this math problem step-by-step. Clearly show final answer at the end without LaTeX or special formatting:\n{problem}"
-            response = model.generate_content(prompt)
-            result = response.text.strip() if response and hasattr(response, "text") else "Sorry, I couldn't solve this."
-            html_result = self.markdown_to_html(result)
-            self.chat_area.append(f"<b>🤖 AI:</b><br>{html_result}")
-        except Exception as e:
-            error_msg = str(e)
-            if "API key" in error_msg:
-                self.chat_area.append("<b>❌ Error:</b> API key is invalid or not set. Please check your configuration.")
-            elif "network" in error_msg.lower():
-                self.chat_area.append("<b>❌ Error:</b> Network connection error. Please check your internet connection.")
+        self.append_chat("<b>🤖 AI:</b> Generating step-by-step solution...")
+        tokens = standalone_tokens(problem) if self.conversation_toggle.isChecked() else None
+        self.stream_solution(problem, self.core.key_for(problem), request, total, speculated, prompt_tokens=tokens)
+
+    def is_follow_up(self, problem):
+        return self.conversation_toggle.isChecked() and self.conversation.is_follow_up(problem)
+
+    def remember_turn(self, problem, answer):
+        if self.conversation_toggle.isChecked():
+            self.conversation.add(problem, answer)
+
+    def answer_locally(self, problem, request=None):
+        # Returns (answer, badge html) for anything solved locally or cached, else None
+        local = self.core.answer_locally(problem, request)
+        if local is None:
+            return None
+        badge = self.answer_badge(local)
+        check = self.verify_answer(local)
+        return local.text, badge + (f"<br>{check}" if check else "")
+
+    def verify_answer(self, answer, retry=True):
+        # Badge html for the local check of a model or cached answer ("" when
+        # its kind can't be checked). One that fails is solved again in the
+        # background while the recheck budget lasts.
+        verification = self.core.verify(answer)
+        if verification is None or verification.status == "unchecked":
+            return ""
+        if verification.status == "verified":
+            label = f"✅ Verified: {verification.kind} checked {verification.detail}"
+        else:
+            label = f"⚠️ Not verified: the {verification.kind} did not check out {verification.detail}"
+            if retry and self.core.allow_recheck(answer.problem):
+                label += " · solving again"
+                self.tasks.submit(
+                    self.core.recheck, answer.problem, answer.text,
+                    on_result=self.show_recheck,
+                    on_error=self.show_error
+                )
+        return f"<span style='color: gray; font-size: 11px;'>{label} · {verification.ms:.1f} ms</span>"
+
+    def show_recheck(self, answer):
+        if not answer.solved:
+            self.append_chat(f"<b>🔁 AI (solved again):</b> {answer.html()}")
+            return
+        self.remember_turn(answer.problem, answer.text)
+        check = self.verify_answer(answer, retry=False)
+        self.append_chat(f"<b>🔁 AI (solved again):</b><br>{answer.html()}" + (f"<br>{check}" if check else ""))
+
+    def cache_badge(self, cached):
+        label = "⚡ Cached answer" if cached else "🌐 Fresh answer"
+        return f"<span style='color: gray; font-size: 11px;'>{label} · cache hit rate {self.cache.hit_rate():.0%}</span>"
+
+    def fast_path_badge(self):
+        stats = fast_solver.stats
+        return (f"<span style='color: gray; font-size: 11px;'>🧮 Solved locally · fast-path coverage "
+                f"{stats.coverage():.0%} · avg {stats.mean_ms():.2f} ms</span>")
+
+    def speculation_badge(self, saved):
+        return (f"<span style='color: gray; font-size: 11px;'>🔮 Started while you typed · {saved:.2f} s saved · "
+                f"pre-solve hit rate {self.speculator.hit_rate():.0%}</span>")
+
+    def conversation_badge(self, tokens, follow_up):
+        label = "💬 Follow-up with context" if follow_up else "💬 New problem"
+        return (f"<span style='color: gray; font-size: 11px;'>{label} · {tokens} prompt tokens · "
+                f"budget {self.conversation.budget}</span>")
+
+    def stream_solution(self, problem, cache_key, request=None, total=NULL_SPAN, speculated=None,
+                        prompt=None, prompt_tokens=None):
+        # With a prompt it is a follow-up: answered from that prompt, not cached
+        # One AI message grows in place, even if other messages are appended
+        # below it while it streams
+        message = self.append_chat("<b>🤖 AI:</b>", pending=True)
+        renderer = MarkdownRenderer()
+        timing = RequestTiming()
+
+        def insert(html):
+            message.html += html
+            self.chat_model.refresh(message)
+            self.chat_area.refresh_layout()
+            self.scroll_to_bottom()
+
+        def on_chunk(chunk):
+            with metrics.span("solve.render", request):
+                if timing.first_token is None:
+                    metrics.observe("solve.first_token", time.perf_counter() - timing.start, request)
+                    insert("<br>")
+                timing.mark_chunk()
+                html = renderer.feed(chunk)
+                if html:
+                    insert(html)
+
+        def on_result(answer):
+            timing.finish()
+            metrics.observe("solve.model", timing.total, request)
+            total.end()
+            message.pending = False
+            # The core has already cached it
+            if answer.solved:
+                html = renderer.flush()
             else:
-                self.chat_area.append(f"<b>❌ Error:</b> {error_msg}")
-        finally:
-            # Re-enable buttons after processing
-            self.solve_btn.setEnabled(True)
-            self.upload_btn.setEnabled(True)
-            self.text_input.setEnabled(True)
-            self.text_input.setFocus()
-            
-        self.chat_area.moveCursor(QTextCursor.End)
-        self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
+                html = f"<br>{answer.html()}"
+            if answer.solved:
+                self.remember_turn(problem, answer.text)
+            badge = self.cache_badge(False)
+            # Follow-ups are not problems on their own, so there is nothing to check them against
+            check = self.verify_answer(answer) if answer.solved and prompt is None else ""
+            if check:
+                badge += f"<br>{check}"
+            if speculated is not None:
+                badge += f"<br>{self.speculation_badge(speculated)}"
+            if prompt_tokens is not None:
+                badge += f"<br>{self.conversation_badge(prompt_tokens, prompt is not None)}"
+            insert(f"{html}<br><span style='color: gray; font-size: 11px;'>⏱ {timing.summary()}</span><br>{badge}")
+            self.request_timings.append(timing)
+
+        def on_error(error):
+            message.pending = False
+            self.chat_model.refresh(message)
+            total.end(error=True)
+            self.show_error(error)
+
+        def on_finished():
+            # A cancelled stream reports neither a result nor an error; keep what
+            # had arrived, saved like any finished answer
+            if message.pending:
+                message.pending = False
+                total.end(error=True)
+                insert(f"{renderer.flush()}<br><span style='color: gray; font-size: 11px;'>⏹ Cancelled</span>")
+
+        if prompt is not None:
+            fn, args = self.core.stream_follow_up, (problem, prompt)
+        else:
+            fn, args = self.core.stream_model, (problem,)
+        # Identical problems already streaming (or being pre-solved) share that one upstream call
+        self.tasks.submit(
+            fn, *args,
+            key=cache_key,
+            on_chunk=on_chunk,
+            on_result=on_result,
+            on_error=on_error,
+            on_finished=on_finished
+        )
+
+    def show_error(self, error):
+        metrics.count("errors")
+        self.append_chat(f"<b>❌ Error:</b> {self.error_text(error)}")
+
+    def error_text(self, error):
+        error_msg = str(error)
+        if upstream.error_status(error) == 429:
+            return "Too many requests right now. Please wait a moment and try again."
+        if "API key" in error_msg:
+            return "API key is invalid or not set. Please check your configuration."
+        if "network" in error_msg.lower():
+            return "Network connection error. Please check your internet connection."
+        return escape(error_msg)
+
+    def cancel_pending(self):
+        count = self.tasks.active_count() + self.uploads.waiting_count()
+        if count:
+            # The queue first, so cancelled uploads don't start the next images
+            self.uploads.cancel()
+            self.tasks.cancel_all()
+            self.append_chat(f"<b>🤖 AI:</b> Cancelled {count} pending request{'s' if count > 1 else ''}.")
+
+    def update_busy_state(self, active):
+        # Input stays usable while requests run; only Cancel depends on pending work
+        if self.cancel_btn:
+            self.cancel_btn.setEnabled(active > 0)
 
     def upload_image(self):
-        try:
-            options = QFileDialog.Options()
-            file_path, _ = QFileDialog.getOpenFileName(
-                self, 
-                "Upload Image", 
-                "", 
-                "Images (*.png *.jpg *.jpeg *.bmp *.gif)", 
-                options=options
-            )
-            
-            if file_path:
-                # Show loading message
-                self.chat_area.append("<b>📸 AI:</b> Processing image...")
-                self.chat_area.moveCursor(QTextCursor.End)
-                self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
-                
-                # Disable buttons while processing
-                self.solve_btn.setEnabled(False)
-                self.upload_btn.setEnabled(False)
-                self.text_input.setEnabled(False)
-                
-                extracted_text = self.get_text_from_image(file_path)
-                if extracted_text:
-                    self.chat_area.append(f"<b>📸 Extracted Text:</b> {extracted_text}")
-                    self.solve_math_problem(extracted_text)
-                else:
-                    self.chat_area.append("<b>⚠️ Unable to extract text from the image. Please try another image.</b>")
-        except Exception as e:
-            self.chat_area.append(f"<b>❌ Error:</b> {str(e)}")
-        finally:
-            # Re-enable buttons after processing
-            self.solve_btn.setEnabled(True)
-            self.upload_btn.setEnabled(True)
-            self.text_input.setEnabled(True)
-            self.text_input.setFocus()
-            
-        self.chat_area.moveCursor(QTextCursor.End)
-        self.chat_area.verticalScrollBar().setValue(self.chat_area.verticalScrollBar().maximum())
-
-    def get_text_from_image(self, image_path):
-        try:
-            image = Image.open(image_path)
-            model = gmai.GenerativeModel("gemini-2.0-flash")
-            response = model.generate_content([image])
-            if response and hasattr(response, "text"):
-                extracted_text = response.text.strip()
-                for line in extracted_text.split("\n"):
-                    if any(char.isdigit() for char in line):
-                        return line.strip()
-        except Exception as e:
-            return f"Error: {str(e)}"
-        return None
+        paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Upload Images",
+            "",
+            "Images (*.png *.jpg *.jpeg *.bmp *.gif *.webp)"
+        )
+        if paths:
+            self.enqueue_images(paths)
+
+    def upload_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Upload Folder of Images")
+        if folder:
+            self.enqueue_images([folder])
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.enqueue_images(paths)
+
+    def enqueue_images(self, paths):
+        # Files and folders (expanded) from the dialogs or a drop
+        images = image_files(paths)
+        if not images:
+            self.append_chat("<b>⚠️ No images found.</b> Supported formats: PNG, JPG, BMP, GIF and WebP.")
+            return
+        if self.uploads.idle():
+            self.upload_message = self.append_chat("<b>📸 AI:</b> Processing images...", pending=True)
+        accepted = self.uploads.add(images, self.multi_toggle.isChecked())
+        if accepted < len(images):
+            self.append_chat(f"<b>⚠️ The upload queue is full;</b> {len(images) - accepted} images were left out.")
+
+    def show_upload_progress(self):
+        # One line per image, updated in place as each moves through the pipeline
+        message = self.upload_message
+        if message is None:
+            return
+        items = self.uploads.items
+        counts = self.uploads.counts()
+        finished = counts["done"] + counts["failed"] + counts["cancelled"]
+        rows = "<br>".join(f"{STATE_ICONS[item.state]} {escape(item.name)}" for item in items)
+        message.html = f"<b>📸 Images:</b> {finished}/{len(items)} finished<br>{rows}"
+        message.pending = not self.uploads.idle()
+        self.chat_model.refresh(message)
+        self.chat_area.refresh_layout()
+
+    def show_upload_result(self, item):
+        name = escape(item.name)
+        if item.state == "failed":
+            reason = self.error_text(item.error) if item.error else "Unable to extract a problem from this image."
+            self.append_chat(f"<b>⚠️ {name}:</b> {reason}")
+            return
+        parts = [f"<b>📸 {name}</b> <span style='color: gray; font-size: 11px;'>{item.extraction.summary()}</span>"]
+        for number, (problem, answer) in enumerate(zip(item.problems, item.answers), 1):
+            label = f"Problem {number}:" if item.all_problems else "AI:"
+            badge = self.answer_badge(answer)
+            check = self.verify_answer(answer) if answer.solved else ""
+            if check:
+                badge += f"<br>{check}"
+            parts.append(f"<b>🤖 {label}</b> {escape(problem)}<br>{answer.html()}<br>{badge}")
+        self.append_chat("<br>".join(parts))
+
+    def answer_badge(self, answer):
+        if answer.source == "local":
+            return self.fast_path_badge()
+        return self.cache_badge(answer.source == "cache")
 
     def markdown_to_html(self, text):
-        text = re.sub(r"\\boxed\{(.*?)\}", r"\1", text)
-        text = re.sub(r"\*\*(.*?)\*\*", r"<b>\1</b>", text)
-        text = re.sub(r"\*(.*?)\*", r"<i>\1</i>", text)
-        text = re.sub(r"\n", r"<br>", text)
-        return text
+        return markdown_to_html(text)
+
+    def toggle_perf_panel(self):
+        if self.perf_panel is None:
+            from perf_panel import PerfPanel
+            self.perf_panel = PerfPanel(self)
+        self.perf_panel.setVisible(not self.perf_panel.isVisible())
+
+    def closeEvent(self, event):
+        self.speculator.set_enabled(False)
+        self.tasks.cancel_all()
+        metrics.disable()
+        self.core.close()
+        self.chat_model.close()
+        self.history_store.close()
+        super().closeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.first_paint.emit()
 
     def resizeEvent(self, event):
         # Update button sizes based on window width
@@ -516,18 +683,42 @@ class MathSolverApp(QWidget):
         if window_width < 900:
             self.solve_btn.setText("🚀")
             self.upload_btn.setText("📸")
+            self.folder_btn.setText("📂")
             self.github_btn.setText("⭐")
             self.issue_btn.setText("🐛")
         else:
             self.solve_btn.setText("🚀 Solve")
             self.upload_btn.setText("📸 Upload")
+            self.folder_btn.setText("📂 Folder")
             self.github_btn.setText("⭐ Star")
             self.issue_btn.setText("🐛 Issue")
         
         super().resizeEvent(event)
 
-if __name__ == "__main__":
+def main():
     app = QApplication(sys.argv)
+    # Load environment variables and pick the model backend (MATHSOLVER_BACKEND=stub runs offline)
+    from dotenv import load_dotenv
+    load_dotenv()
+    try:
+        backend = backends.set_backend(upstream.guard(backends.create_backend()))
+    except backends.BackendError as e:
+        QMessageBox.critical(None, "Error", str(e))
+        return 1
+    # MATHSOLVER_METRICS=1 (or a file path) records stage timings and counters as JSONL
+    configure_from_env()
     window = MathSolverApp()
     window.show()
-    sys.exit(app.exec_())
+    if os.getenv("MATHSOLVER_PERF_PANEL", "0") == "1":
+        window.toggle_perf_panel()
+    # The model SDK (and numpy, for answer verification) is imported and the
+    # connection opened once the window is on screen
+    def warm_up():
+        import verification
+        backend.warm_up()
+    window.first_paint.connect(lambda: threading.Thread(target=warm_up, daemon=True).start())
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import re
+
+# Everything the inline scanner has to look at; the text between two tokens
+# is copied through untouched
+INLINE_TOKEN = re.compile(r"\\boxed\{|\*{1,3}|`|[{}]")
+EMPHASIS = {"*": ("<i>", "</i>"), "**": ("<b>", "</b>"), "***": ("<b><i>", "</i></b>")}
+BOXED = ("<b>", "</b>")
+HEADING = re.compile(r"#{1,6}\s+(.*?)\s*#*\s*$")
+BULLET = re.compile(r"( *)[-*+]\s+(.*)$")
+FENCE = "```"
+
+
+def escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_inline(line):
+    # One scan over the line. Emphasis markers go into the output as literal
+    # text and are swapped for tags only once a matching closer turns up, so
+    # the `*` in "2 * 3" or "x**2" is left alone. A marker can open only when
+    # it isn't preceded by a letter or digit and is followed by a non-space, and
+    # close only when preceded by a non-space and not followed by a letter or digit.
+    # Escaping first leaves no markup characters behind that could be mistaken for tokens.
+    line = escape(line)
+    parts = []
+    openers = []
+    code = None
+    boxed = []
+    position = 0
+    for match in INLINE_TOKEN.finditer(line):
+        start, end = match.span()
+        token = match.group()
+        if start > position:
+            parts.append(line[position:start])
+        position = end
+        if code is not None:
+            if token == "`":
+                parts[code] = "<code>"
+                parts.append("</code>")
+                code = None
+            else:
+                parts.append(token)
+            continue
+        if token == "`":
+            code = len(parts)
+            parts.append("`")
+        elif token == "\\boxed{":
+            boxed.append(0)
+            parts.append(BOXED[0])
+        elif token == "{":
+            if boxed:
+                boxed[-1] += 1
+            parts.append("{")
+        elif token == "}":
+            if boxed and boxed[-1] == 0:
+                boxed.pop()
+                parts.append(BOXED[1])
+            else:
+                if boxed:
+                    boxed[-1] -= 1
+                parts.append("}")
+        else:
+            before = line[start - 1] if start else " "
+            after = line[end] if end < len(line) else " "
+            closed = False
+            if not before.isspace() and not after.isalnum():
+                for depth in range(len(openers) - 1, -1, -1):
+                    if openers[depth][0] == token:
+                        # Openers skipped over stay literal, so tags always nest
+                        parts[openers[depth][1]] = EMPHASIS[token][0]
+                        parts.append(EMPHASIS[token][1])
+                        del openers[depth:]
+                        closed = True
+                        break
+            if not closed:
+                if not before.isalnum() and not after.isspace():
+                    openers.append((token, len(parts)))
+                parts.append(token)
+    parts.append(line[position:])
+    # Unclosed \boxed{ still gets closed so the markup stays balanced
+    parts.extend(BOXED[1] for _ in boxed)
+    return "".join(parts)
+
+
+class MarkdownRenderer:
+    # Incremental markdown -> chat HTML. feed() takes text in arbitrary chunks
+    # and returns the HTML for every line completed so far; the unfinished tail
+    # waits in the buffer, and earlier lines are never looked at again.
+    def __init__(self):
+        self.pending = ""
+        self.started = False
+        self.in_code_block = False
+
+    def feed(self, chunk):
+        self.pending += chunk
+        if "\n" not in chunk:
+            return ""
+        complete, self.pending = self.pending.rsplit("\n", 1)
+        html = []
+        for line in self.lines(complete):
+            rendered = self.render_line(line)
+            if rendered is not None:
+                html.append(rendered + "<br>")
+        return "".join(html)
+
+    def flush(self):
+        rest, self.pending = self.pending, ""
+        if not rest:
+            return ""
+        return "".join(rendered for rendered in map(self.render_line, self.lines(rest)) if rendered is not None)
+
+    def render(self, text):
+        return self.feed(text) + self.flush()
+
+    def lines(self, text):
+        # Leading blank space of the whole answer is dropped, like response.text.strip()
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+            if not text:
+                return []
+        return text.split("\n")
+
+    def render_line(self, line):
+        # Returns None for lines that produce no output (code fences)
+        if line.lstrip().startswith(FENCE):
+            self.in_code_block = not self.in_code_block
+            return None
+        if self.in_code_block:
+            stripped = line.lstrip(" ")
+            return "<code>" + "&nbsp;" * (len(line) - len(stripped)) + escape(stripped) + "</code>"
+        heading = HEADING.match(line)
+        if heading:
+            return f"<b>{render_inline(heading.group(1))}</b>"
+        bullet = BULLET.match(line)
+        if bullet:
+            indent = "&nbsp;" * (2 * len(bullet.group(1)))
+            return f"{indent}• {render_inline(bullet.group(2))}"
+        return render_inline(line)
+
+
+def markdown_to_html(text):
+    return MarkdownRenderer().render(text)
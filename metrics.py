@@ -0,0 +1,229 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+
+class RequestTiming:
+    # Time to first token and total latency of one streamed request
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.end = None
+
+    def mark_chunk(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def ttft(self):
+        return None if self.first_token is None else self.first_token - self.start
+
+    @property
+    def total(self):
+        return None if self.end is None else self.end - self.start
+
+    def summary(self):
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"first token {self.ttft:.2f} s")
+        if self.total is not None:
+            parts.append(f"total {self.total:.2f} s")
+        return " · ".join(parts)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+RECENT_SPANS = 500
+FLUSH_SECONDS = 1.0
+DEFAULT_METRICS_PATH = os.path.join(os.path.expanduser("~"), ".mathsolver", "metrics.jsonl")
+DEFAULT_METRICS_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_METRICS_BACKUPS = 3
+
+
+class Span:
+    # Times a stage; usable as a context manager or started now and ended later
+    # (for stages that finish in a callback on another thread)
+    __slots__ = ("metrics", "name", "request", "start")
+
+    def __init__(self, metrics, name, request=None):
+        self.metrics = metrics
+        self.name = name
+        self.request = request
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(error=exc_type is not None)
+
+    def end(self, error=False):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, self.request, error)
+
+
+class NullSpan:
+    # What span() hands out while metrics are off: one shared object that does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def end(self, error=False):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class MetricsFile:
+    # JSONL records appended by a background thread in batches, rotated to
+    # path.1 .. path.<backups> once the file passes max_bytes
+    def __init__(self, path, max_bytes=DEFAULT_METRICS_MAX_BYTES, backups=DEFAULT_METRICS_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=2)
+
+    def _run(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        while True:
+            records = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while records[-1] is not None and time.monotonic() < deadline:
+                try:
+                    records.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            closing = records[-1] is None
+            lines = [json.dumps(record) + "\n" for record in records if record is not None]
+            while lines:
+                # As many lines as still fit in the current file, then rotate
+                fit = 0
+                while fit < len(lines) and size < self.max_bytes:
+                    size += len(lines[fit])
+                    fit += 1
+                if fit:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.writelines(lines[:fit])
+                    lines = lines[fit:]
+                if size >= self.max_bytes:
+                    self._rotate()
+                    size = 0
+            if closing:
+                return
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+class Metrics:
+    # Process-wide stage timings and counters. Off by default: span() returns
+    # NULL_SPAN and count() returns straight away, so instrumented code pays
+    # one attribute check. When on, recent durations are kept per stage for
+    # percentiles and every span (plus periodic counter totals) can go to a
+    # MetricsFile.
+    def __init__(self):
+        self.enabled = False
+        self.sink = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.recent = {}
+        self.requests = itertools.count(1)
+        self.last_counter_dump = time.time()
+
+    def enable(self, path=None, max_bytes=DEFAULT_METRICS_MAX_BYTES, backups=DEFAULT_METRICS_BACKUPS):
+        if path and self.sink is None:
+            self.sink = MetricsFile(path, max_bytes, backups)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.sink:
+            self.sink.write({"ts": time.time(), "counters": dict(self.counters)})
+            self.sink.close()
+            self.sink = None
+
+    def new_request(self):
+        return next(self.requests) if self.enabled else None
+
+    def span(self, name, request=None):
+        return Span(self, name, request) if self.enabled else NULL_SPAN
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds, request=None, error=False):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        now = time.time()
+        with self.lock:
+            recent = self.recent.get(name)
+            if recent is None:
+                recent = self.recent[name] = deque(maxlen=RECENT_SPANS)
+            recent.append(ms)
+            dump = self.sink is not None and now - self.last_counter_dump >= FLUSH_SECONDS * 10
+            if dump:
+                self.last_counter_dump = now
+                counters = dict(self.counters)
+        if self.sink is not None:
+            record = {"ts": now, "span": name, "ms": round(ms, 3)}
+            if request is not None:
+                record["request"] = request
+            if error:
+                record["error"] = True
+            self.sink.write(record)
+            if dump:
+                self.sink.write({"ts": now, "counters": counters})
+
+    def summary(self):
+        # {stage: (count, p50 ms, p95 ms)} over the recent window, and the counters
+        with self.lock:
+            recent = {name: list(values) for name, values in self.recent.items()}
+            counters = dict(self.counters)
+        stages = {name: (len(values), percentile(values, 50), percentile(values, 95))
+                  for name, values in sorted(recent.items())}
+        return stages, counters
+
+
+metrics = Metrics()
+
+
+def configure_from_env():
+    # MATHSOLVER_METRICS=1 writes to the default file; any other value is taken as the path
+    setting = os.getenv("MATHSOLVER_METRICS", "")
+    if setting and setting != "0":
+        metrics.enable(DEFAULT_METRICS_PATH if setting == "1" else setting)
+    return metrics
@@ -0,0 +1,169 @@
+import html
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+TITLE = "MathSolver AI - Chat History"
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 15
+MESSAGE_GAP = 8
+PROGRESS_EVERY = 50
+FONTS = {False: "Helvetica", True: "Helvetica-Bold"}
+# RGB text colours per sender
+COLORS = {"User": (0.13, 0.33, 0.75), "AI": (0.1, 0.1, 0.1)}
+
+TAG = re.compile(r"<(/?)([a-zA-Z]+)[^>]*>")
+SPACES = re.compile(r"(\s+)")
+# The built-in PDF fonts only cover Latin-1 style text
+SUBSTITUTES = {
+    "√": "sqrt", "≤": "<=", "≥": ">=", "≠": "!=", "≈": "~", "→": "->", "←": "<-",
+    "⇒": "=>", "∞": "inf", "π": "pi", "θ": "theta", "∫": "integral ", "∑": "sum ",
+    "−": "-", "⋅": "·", " ": " ", "‑": "-",
+}
+
+
+def printable(text):
+    if text.isascii():
+        return text
+    out = []
+    for char in text:
+        if char in SUBSTITUTES:
+            out.append(SUBSTITUTES[char])
+            continue
+        try:
+            char.encode("cp1252")
+        except UnicodeEncodeError:
+            # Emoji and other symbols the fonts can't draw are dropped
+            if unicodedata.category(char) not in ("So", "Cs", "Mn"):
+                out.append("?")
+            continue
+        out.append(char)
+    return "".join(out)
+
+
+def html_to_runs(message_html):
+    # Splits chat HTML into paragraphs (one per <br>) of (text, bold) runs
+    paragraphs = [[]]
+    bold = 0
+    position = 0
+    for match in TAG.finditer(message_html):
+        text = message_html[position:match.start()]
+        if text:
+            paragraphs[-1].append((printable(html.unescape(text)), bold > 0))
+        position = match.end()
+        closing, name = match.group(1), match.group(2).lower()
+        if name == "br":
+            paragraphs.append([])
+        elif name in ("b", "strong"):
+            bold = max(0, bold - 1) if closing else bold + 1
+    text = message_html[position:]
+    if text:
+        paragraphs[-1].append((printable(html.unescape(text)), bold > 0))
+    return paragraphs
+
+
+@lru_cache(maxsize=65536)
+def text_width(text, bold):
+    return stringWidth(text, FONTS[bold], FONT_SIZE)
+
+
+def wrap_runs(runs, width):
+    # Greedy word wrap over mixed-font runs; words wider than a line are split.
+    # Returns lines of (text, bold) runs with neighbouring same-font words merged.
+    lines, line, used = [], [], 0.0
+
+    def add(text, bold):
+        if line and line[-1][1] == bold:
+            line[-1] = (line[-1][0] + text, bold)
+        else:
+            line.append((text, bold))
+
+    for text, bold in runs:
+        for word in SPACES.split(text):
+            if not word:
+                continue
+            if word.isspace():
+                if line:
+                    add(" ", bold)
+                    used += text_width(" ", bold)
+                continue
+            size = text_width(word, bold)
+            if used + size > width and line:
+                lines.append(strip_trailing(line))
+                line, used = [], 0.0
+            while size > width:
+                # Cut the word where it stops fitting
+                cut = len(word)
+                while cut > 1 and text_width(word[:cut], bold) > width:
+                    cut -= 1
+                lines.append([(word[:cut], bold)])
+                word = word[cut:]
+                size = text_width(word, bold)
+            add(word, bold)
+            used += size
+    lines.append(strip_trailing(line))
+    return lines
+
+
+def strip_trailing(line):
+    if line and line[-1][0].endswith(" "):
+        text, bold = line[-1]
+        line[-1] = (text.rstrip(" "), bold)
+    return line
+
+
+def export_pdf(messages, path):
+    # Generator: writes (sender, html) messages to a PDF and yields the number
+    # of messages written every PROGRESS_EVERY messages. Closing it early
+    # (cancel) leaves nothing behind; the file only appears once it is complete.
+    # Returns the page count.
+    page_width, page_height = letter
+    line_width = page_width - 2 * MARGIN
+    partial = path + ".part"
+    pdf = canvas.Canvas(partial, pagesize=letter, pageCompression=1)
+    pdf.setTitle(TITLE)
+    pages = 1
+    try:
+        pdf.setFont(FONTS[True], 16)
+        pdf.drawString(MARGIN, page_height - 30, TITLE)
+        # One text object per page; drawing it is what costs, not the lines in it
+        text = pdf.beginText()
+        font = None
+        y = page_height - 70
+        done = 0
+        for sender, message_html in messages:
+            text.setFillColorRGB(*COLORS.get(sender, COLORS["AI"]))
+            for paragraph in html_to_runs(message_html):
+                for line in wrap_runs(paragraph, line_width):
+                    if y < MARGIN:
+                        pdf.drawText(text)
+                        pdf.showPage()
+                        pages += 1
+                        text = pdf.beginText()
+                        text.setFillColorRGB(*COLORS.get(sender, COLORS["AI"]))
+                        font = None
+                        y = page_height - MARGIN
+                    text.setTextOrigin(MARGIN, y)
+                    for run, bold in line:
+                        if font != bold:
+                            text.setFont(FONTS[bold], FONT_SIZE)
+                            font = bold
+                        text.textOut(run)
+                    y -= LEADING
+            y -= MESSAGE_GAP
+            done += 1
+            if done % PROGRESS_EVERY == 0:
+                yield done
+        pdf.drawText(text)
+        pdf.save()
+        os.replace(partial, path)
+        yield done
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return pages
@@ -0,0 +1,55 @@
+from html import escape
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget
+from metrics import metrics
+from workers import EventLoopLagMonitor
+
+REFRESH_MS = 1000
+LAG_WINDOW = 2000
+
+
+class PerfPanel(QWidget):
+    # Small tool window with recent p50/p95 per stage, the counters and
+    # event-loop lag. Showing it turns metrics on (in memory if no file was
+    # configured); the lag timer only runs while it is visible.
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Tool)
+        self.setWindowTitle("Performance")
+        self.setObjectName("perfPanel")
+        self.stats = QLabel()
+        self.stats.setObjectName("perfStats")
+        self.stats.setTextFormat(Qt.RichText)
+        self.stats.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.stats)
+        self.lag = EventLoopLagMonitor(parent=self, window=LAG_WINDOW)
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.resize(420, 360)
+
+    def showEvent(self, event):
+        metrics.enable()
+        self.lag.start()
+        self.timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        self.lag.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        stages, counters = metrics.summary()
+        rows = [f"<tr><td>{escape(name)}</td><td align='right'>{count}</td>"
+                f"<td align='right'>{p50:.1f}</td><td align='right'>{p95:.1f}</td></tr>"
+                for name, (count, p50, p95) in stages.items()]
+        rows.append(f"<tr><td><b>event loop lag</b></td><td align='right'>{len(self.lag.samples)}</td>"
+                    f"<td align='right'>{self.lag.percentile_ms(50):.1f}</td>"
+                    f"<td align='right'>{self.lag.percentile_ms(95):.1f}</td></tr>")
+        totals = " · ".join(f"{escape(name)} {value}" for name, value in sorted(counters.items()))
+        self.stats.setText(
+            "<table cellspacing='4'><tr><th align='left'>stage</th><th>n</th><th>p50 ms</th><th>p95 ms</th></tr>"
+            + "".join(rows) + f"</table><br>{totals or 'no counters yet'}"
+        )
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import UnidentifiedImageError
+
+import backends
+import upstream
+from core import SolverCore
+from image_pipeline import content_hash
+from metrics import configure_from_env, metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 32
+MAX_BODY = 10 * 1024 * 1024
+MAX_HEADERS = 100
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+           502: "Bad Gateway"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Flight:
+    # One solve shared by every request for the same problem. Chunks are kept
+    # so a request that joins late replays the stream from the start. Only
+    # touched from the event loop thread.
+    def __init__(self):
+        self.chunks = []
+        self.answer = None
+        self.error = None
+        self.done = False
+        self.changed = asyncio.Event()
+
+    def push(self, chunk):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, answer, error):
+        self.answer = answer
+        self.error = error
+        self.done = True
+        self._wake()
+
+    def _wake(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self):
+        # Yields every chunk, then returns; raises the solve's error if it failed
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self.changed.wait()
+
+    async def result(self):
+        async for _ in self.follow():
+            pass
+        return self.answer
+
+
+class SolveService:
+    # JSON over HTTP/1.1 with keep-alive:
+    #   POST /solve          {"problem": "..."} -> answer
+    #   POST /solve/stream   same body, answer streamed as server-sent events
+    #   GET  /solve/stream?problem=...  the same, for EventSource clients
+    #   POST /image          {"image": base64, "all": false} -> problems and answers
+    #   GET  /health, GET /metrics
+    # Blocking solver work runs on a thread pool; identical problems in flight
+    # share one solve, and identical images one extraction.
+    def __init__(self, core, workers=DEFAULT_WORKERS):
+        self.core = core
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.flights = {}
+        self.extractions = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_BODY)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def flight(self, problem):
+        key = self.core.key_for(problem)
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            metrics.count("server.coalesced")
+            return flight
+        flight = self.flights[key] = Flight()
+        loop = asyncio.get_running_loop()
+
+        def finish(answer, error):
+            # Later requests for this problem find it in the cache instead
+            del self.flights[key]
+            flight.finish(answer, error)
+
+        def verify(answer):
+            # Best effort: the answer is solved and cached already, and a
+            # check that breaks must not turn it into an error
+            try:
+                self.core.verify(answer)
+            except Exception as e:
+                metrics.count("verify.errors")
+                print(f"Verification failed for {problem!r}: {e!r}", file=sys.stderr)
+
+        def run():
+            try:
+                stream = self.core.stream(problem)
+                while True:
+                    try:
+                        chunk = next(stream)
+                    except StopIteration as stop:
+                        verify(stop.value)
+                        loop.call_soon_threadsafe(finish, stop.value, None)
+                        return
+                    loop.call_soon_threadsafe(flight.push, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(finish, None, e)
+
+        loop.run_in_executor(self.executor, run)
+        return flight
+
+    async def extract(self, raw, all_problems):
+        # Kiosks photographing the same sheet at once share one extraction
+        key = (all_problems, content_hash(raw))
+        future = self.extractions.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.extractions[key] = loop.run_in_executor(
+                self.executor, self.core.extract_data, raw, "upload", all_problems)
+            future.add_done_callback(lambda _: self.extractions.pop(key, None))
+        else:
+            self.coalesced += 1
+            metrics.count("server.coalesced")
+        return await asyncio.shield(future)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.requests += 1
+                try:
+                    await self.dispatch(method, target, body, writer, keep_alive)
+                except HttpError as e:
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except Exception as e:
+                    metrics.count("errors")
+                    status = upstream.error_status(e)
+                    await send_json(writer, 429 if status == 429 else 502, {"error": str(e)}, keep_alive)
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            # The request itself could not be read; answer and hang up
+            await send_json(writer, e.status, {"error": str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body, writer, keep_alive):
+        url = urlsplit(target)
+        if url.path == "/solve":
+            require(method, "POST")
+            answer = await self.solve(problem_from(json_body(body)))
+            await send_json(writer, 200, answer, keep_alive)
+        elif url.path == "/solve/stream":
+            if method == "GET":
+                problem = problem_from({"problem": parse_qs(url.query).get("problem", [""])[0]})
+            else:
+                require(method, "POST")
+                problem = problem_from(json_body(body))
+            await self.stream(problem, writer, keep_alive)
+        elif url.path == "/image":
+            require(method, "POST")
+            await send_json(writer, 200, await self.image(json_body(body)), keep_alive)
+        elif url.path == "/health":
+            await send_json(writer, 200, {"status": "ok", "backend": backends.get_backend().name,
+                                          "in_flight": len(self.flights)}, keep_alive)
+        elif url.path == "/metrics":
+            stages, counters = metrics.summary()
+            await send_json(writer, 200, {
+                "requests": self.requests, "coalesced": self.coalesced, "counters": counters,
+                "stages": {name: {"count": n, "p50_ms": p50, "p95_ms": p95} for name, (n, p50, p95) in stages.items()},
+            }, keep_alive)
+        else:
+            raise HttpError(404, f"No such endpoint: {url.path}")
+
+    async def solve(self, problem):
+        start = time.perf_counter()
+        answer = await self.flight(problem).result()
+        return dict(answer.to_dict(), ms=round((time.perf_counter() - start) * 1000, 2))
+
+    async def stream(self, problem, writer, keep_alive):
+        # Headers go out straight away; errors after that arrive as an error event
+        start = time.perf_counter()
+        flight = self.flight(problem)
+        writer.write(response_head(200, "text/event-stream", keep_alive, chunked=True,
+                                   extra="Cache-Control: no-cache\r\n"))
+        try:
+            async for chunk in flight.follow():
+                await send_chunk(writer, sse("chunk", {"text": chunk}))
+            done = dict(flight.answer.to_dict(), ms=round((time.perf_counter() - start) * 1000, 2))
+            await send_chunk(writer, sse("done", done))
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            metrics.count("errors")
+            await send_chunk(writer, sse("error", {"error": str(e), "status": upstream.error_status(e)}))
+        await send_chunk(writer, b"")
+
+    async def image(self, request):
+        start = time.perf_counter()
+        try:
+            raw = base64.b64decode(request.get("image") or "", validate=True)
+        except (binascii.Error, TypeError):
+            raise HttpError(400, "image must be base64 encoded")
+        if not raw:
+            raise HttpError(400, "image is required")
+        try:
+            extraction = await self.extract(raw, bool(request.get("all")))
+        except UnidentifiedImageError:
+            raise HttpError(400, "image could not be read; send a PNG, JPEG, BMP, GIF or WebP")
+        problems = extraction.problems
+        answers = []
+        if problems and request.get("solve", True):
+            answers = await asyncio.gather(*(self.flight(problem).result() for problem in problems))
+        return {"problems": problems, "answers": [answer.to_dict() for answer in answers],
+                "cached": extraction.cached, "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def require(method, expected):
+    if method != expected:
+        raise HttpError(405, f"Use {expected}")
+
+
+def json_body(body):
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError:
+        raise HttpError(400, "Body must be JSON")
+    if not isinstance(request, dict):
+        raise HttpError(400, "Body must be a JSON object")
+    return request
+
+
+def problem_from(request):
+    problem = request.get("problem")
+    if not isinstance(problem, str) or not problem.strip():
+        raise HttpError(400, "problem is required")
+    return problem.strip()
+
+
+async def read_request(reader):
+    # (method, target, headers, body), or None once the client has gone
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(400, "Too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length")
+    if length < 0:
+        raise HttpError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def response_head(status, content_type, keep_alive, length=None, chunked=False, extra=""):
+    head = f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\nContent-Type: {content_type}\r\n"
+    head += "Transfer-Encoding: chunked\r\n" if chunked else f"Content-Length: {length}\r\n"
+    head += f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n{extra}\r\n"
+    return head.encode("latin-1")
+
+
+async def send_json(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(response_head(status, "application/json; charset=utf-8", keep_alive, len(body)) + body)
+    await writer.drain()
+
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def send_chunk(writer, data):
+    # An empty chunk ends the response
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+    await writer.drain()
+
+
+async def serve(host, port, workers):
+    # numpy, for answer verification, so the first answer doesn't pay for the import
+    import verification
+    core = SolverCore.open()
+    service = SolveService(core, workers)
+    host, port = await service.start(host, port)
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+        core.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the solver over HTTP as JSON and server-sent events.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="threads for solver work")
+    parser.add_argument("--backend", choices=sorted(backends.BACKENDS),
+                        help="model backend (default: $MATHSOLVER_BACKEND or gemini)")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="seconds each stub backend call takes, for load testing")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    try:
+        backend = backends.create_backend(args.backend)
+    except backends.BackendError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if isinstance(backend, backends.StubBackend):
+        backend.latency = args.stub_latency
+    backends.set_backend(upstream.guard(backend))
+    configure_from_env()
+    # /metrics reports stage timings even without a metrics file
+    metrics.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from chat_view import ChatMessage, to_plain
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".mathsolver", "history.sqlite3")
+FLUSH_SECONDS = 0.5
+READ_PAGE = 500
+SEARCH_LIMIT = 50
+# Only conversation is indexed, not status lines the app posts
+INDEXED_SENDERS = ("User", "AI")
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text):
+    # Every word must appear; the last may be a prefix, so results show while typing
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+
+class SessionStore:
+    # Every chat message ever shown, append-only, in SQLite. Messages are
+    # numbered by position within their session, and the plain text of each
+    # one goes into a contentless FTS5 index (no second copy of the text).
+    # Appends are queued to one writer thread that commits them in batches;
+    # reads use a separate connection on the GUI thread.
+    def __init__(self, path=None):
+        self.path = path or os.getenv("MATHSOLVER_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = self._connect()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                started REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                session INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                sender TEXT NOT NULL,
+                html TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS messages_position ON messages (session, position);
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='');
+        """)
+        self.conn.commit()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def latest_session(self):
+        row = self.conn.execute("SELECT MAX(id) FROM sessions").fetchone()
+        return row[0] if row[0] is not None else self.new_session()
+
+    def new_session(self):
+        cursor = self.conn.execute("INSERT INTO sessions (started) VALUES (?)", (time.time(),))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def next_position(self, session):
+        row = self.conn.execute("SELECT MAX(position) FROM messages WHERE session = ?", (session,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def append(self, session, position, sender, html):
+        self.queue.put((session, position, sender, html, time.time()))
+
+    def load_before(self, session, position, count):
+        # The count messages just before position, oldest first, as (position, sender, html)
+        rows = self.conn.execute(
+            "SELECT position, sender, html FROM messages WHERE session = ? AND position < ? "
+            "ORDER BY position DESC LIMIT ?", (session, position, count)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def count_before(self, session, position):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE session = ? AND position < ?", (session, position)
+        ).fetchone()[0]
+
+    def iter_before(self, session, position):
+        # (sender, html) oldest first, on its own connection so a worker thread can walk it
+        conn = self._connect(check_same_thread=False)
+        try:
+            last = -1
+            while True:
+                rows = conn.execute(
+                    "SELECT position, sender, html FROM messages WHERE session = ? AND position > ? "
+                    "AND position < ? ORDER BY position LIMIT ?", (session, last, position, READ_PAGE)
+                ).fetchall()
+                if not rows:
+                    return
+                for last, sender, html in rows:
+                    yield sender, html
+        finally:
+            conn.close()
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        # Most recent first: (session, sender, html, created)
+        query = fts_query(text)
+        if query is None:
+            return []
+        return self.conn.execute(
+            "SELECT m.session, m.sender, m.html, m.created FROM messages_fts "
+            "JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY messages_fts.rowid DESC LIMIT ?", (query, limit)
+        ).fetchall()
+
+    def flush(self):
+        # Blocks until everything appended so far is committed
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + FLUSH_SECONDS
+                while batch[-1] is not None and time.monotonic() < deadline:
+                    try:
+                        batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                records = [record for record in batch if record is not None]
+                with conn:
+                    for session, position, sender, html, created in records:
+                        cursor = conn.execute(
+                            "INSERT OR IGNORE INTO messages (session, position, sender, html, created) "
+                            "VALUES (?, ?, ?, ?, ?)", (session, position, sender, html, created)
+                        )
+                        if cursor.rowcount and sender in INDEXED_SENDERS:
+                            conn.execute("INSERT INTO messages_fts (rowid, text) VALUES (?, ?)",
+                                         (cursor.lastrowid, to_plain(html)))
+                for _ in batch:
+                    self.queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+
+class SessionHistory:
+    # One session as ChatModel sees it: positions for new messages, and a
+    # cursor at the oldest message read back from the store so far.
+    def __init__(self, store, session=None):
+        self.store = store
+        self.session = session if session is not None else store.latest_session()
+        self.next_position = store.next_position(self.session)
+        self.loaded_from = self.next_position
+
+    def record(self, message):
+        # Messages that are already stored (or never will be) take no position
+        if message.stored:
+            return
+        message.session = self.session
+        message.position = self.next_position
+        self.next_position += 1
+        if not message.pending:
+            self.save(message)
+
+    def save(self, message):
+        # Under the session it was recorded in, which Clear Chat may since have replaced
+        message.stored = True
+        self.store.append(message.session, message.position, message.sender, message.html)
+
+    def has_older(self):
+        return self.loaded_from > 0
+
+    def load_older(self, count):
+        rows = self.store.load_before(self.session, self.loaded_from, count)
+        if not rows:
+            self.loaded_from = 0
+            return []
+        self.loaded_from = rows[0][0]
+        return [ChatMessage(sender, html, stored=True) for _, sender, html in rows]
+
+    def older(self):
+        # (count, iterator of (sender, html)) for the stored part not loaded yet
+        return (self.store.count_before(self.session, self.loaded_from),
+                self.store.iter_before(self.session, self.loaded_from))
+
+    def restart(self):
+        self.session = self.store.new_session()
+        self.next_position = 0
+        self.loaded_from = 0
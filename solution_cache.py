@@ -0,0 +1,230 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".mathsolver", "solutions.sqlite3")
+DEFAULT_IMAGE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".mathsolver", "images.sqlite3")
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_TTL = 30 * 24 * 3600
+HOT_ENTRIES = 256
+
+# Different ways of writing the same operator all map to one spelling
+OPERATOR_SPELLINGS = [
+    (re.compile(r"[×∗·⋅]"), "*"),
+    (re.compile(r"÷"), "/"),
+    (re.compile(r"[−–—]"), "-"),
+    (re.compile(r"\*\*"), "^"),
+    (re.compile(r"²"), "^2"),
+    (re.compile(r"³"), "^3"),
+    (re.compile(r"\bmultiplied by\b"), "*"),
+    (re.compile(r"\btimes\b"), "*"),
+    (re.compile(r"\bdivided by\b"), "/"),
+    (re.compile(r"\bplus\b"), "+"),
+    (re.compile(r"\bminus\b"), "-"),
+    (re.compile(r"\b(?:is equal to|equals)\b"), "="),
+]
+OPERATOR_SPACING = re.compile(r"\s*([-+*/^=()<>,])\s*")
+WHITESPACE = re.compile(r"\s+")
+# Closing punctuation, but not a factorial's "!" (10!, (n+1)!)
+TRAILING = re.compile(r"(?:[\s?.]|(?<![\d)])!)+$")
+
+
+def normalize_problem(problem):
+    text = problem.lower()
+    for pattern, replacement in OPERATOR_SPELLINGS:
+        text = pattern.sub(replacement, text)
+    text = OPERATOR_SPACING.sub(r"\1", text)
+    text = WHITESPACE.sub(" ", text).strip()
+    return TRAILING.sub("", text)
+
+
+class SingleFlight:
+    # Coalesces concurrent calls with the same key into one: the first caller
+    # runs fn, everyone else blocks until it finishes and shares the outcome.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            self.finish(key, call)
+
+    def begin(self, key):
+        # (call, leader) for callers that run several keys' work together: a
+        # leader must finish its call, anyone else waits on it
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        return call, leader
+
+    def wait(self, call):
+        call["done"].wait()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    def finish(self, key, call):
+        with self.lock:
+            del self.calls[key]
+        call["done"].set()
+
+
+class SolutionCache:
+    # SQLite-backed answer cache with size-based LRU eviction and a TTL.
+    # A small in-memory tier keeps repeat hits off the disk entirely; access
+    # times are buffered and written back with the next insert.
+    def __init__(self, path=None, model="", prompt_version=0,
+                 max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path or os.getenv("MATHSOLVER_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS solutions (
+                key TEXT PRIMARY KEY,
+                problem TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS solutions_accessed ON solutions (accessed)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS solutions_created ON solutions (created)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+        self.hot = OrderedDict()
+        self.touched = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, problem):
+        raw = f"{self.model}\0{self.prompt_version}\0{normalize_problem(problem)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            now = time.time()
+            entry = self.hot.get(key)
+            if entry is None:
+                entry = self.conn.execute(
+                    "SELECT answer, created FROM solutions WHERE key = ?", (key,)
+                ).fetchone()
+                if entry is not None:
+                    self._remember(key, entry)
+            else:
+                self.hot.move_to_end(key)
+            if entry is None or now - entry[1] > self.ttl:
+                # Expired rows are left for the next eviction sweep
+                self.hot.pop(key, None)
+                self.misses += 1
+                return None
+            self.touched[key] = now
+            self.hits += 1
+            return entry[0]
+
+    def contains(self, key):
+        # Like get, but neither counted as a hit or miss nor marked as used
+        with self.lock:
+            entry = self.hot.get(key)
+            if entry is None:
+                entry = self.conn.execute(
+                    "SELECT answer, created FROM solutions WHERE key = ?", (key,)
+                ).fetchone()
+            return entry is not None and time.time() - entry[1] <= self.ttl
+
+    def put(self, key, problem, answer):
+        with self.lock:
+            now = time.time()
+            size = len(problem.encode("utf-8")) + len(answer.encode("utf-8"))
+            old = self.conn.execute("SELECT size FROM solutions WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO solutions (key, problem, answer, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, problem, answer, size, now, now)
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self.touched.pop(key, None)
+            self._flush_touched()
+            self._evict(now)
+            self.conn.commit()
+            self._remember(key, (answer, now))
+
+    def discard(self, key):
+        with self.lock:
+            self.touched.pop(key, None)
+            self._delete(self.conn.execute("SELECT key, size FROM solutions WHERE key = ?", (key,)).fetchall())
+            self.conn.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self.lock:
+            self._flush_touched()
+            self.conn.commit()
+            self.conn.close()
+
+    def _remember(self, key, entry):
+        self.hot[key] = entry
+        self.hot.move_to_end(key)
+        if len(self.hot) > HOT_ENTRIES:
+            self.hot.popitem(last=False)
+
+    def _flush_touched(self):
+        if self.touched:
+            self.conn.executemany(
+                "UPDATE solutions SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self.touched.items()]
+            )
+            self.touched.clear()
+
+    def _evict(self, now):
+        expired = self.conn.execute(
+            "SELECT key, size FROM solutions WHERE created < ?", (now - self.ttl,)
+        ).fetchall()
+        self._delete(expired)
+        while self.total_bytes > self.max_bytes:
+            oldest = self.conn.execute(
+                "SELECT key, size FROM solutions ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            victims = []
+            excess = self.total_bytes - self.max_bytes
+            for key, size in oldest:
+                if excess <= 0:
+                    break
+                victims.append((key, size))
+                excess -= size
+            self._delete(victims)
+
+    def _delete(self, rows):
+        if not rows:
+            return
+        self.conn.executemany("DELETE FROM solutions WHERE key = ?", [(key,) for key, _ in rows])
+        for key, size in rows:
+            self.total_bytes -= size
+            self.hot.pop(key, None)
@@ -0,0 +1,188 @@
+import os
+import re
+import time
+from backends import get_backend
+from image_pipeline import PIPELINE_VERSION, ImageExtraction, content_hash, preprocess_image
+from metrics import metrics
+from solution_cache import DEFAULT_IMAGE_CACHE_PATH, SolutionCache
+
+# Bump whenever SOLVE_PROMPT changes so cached answers from the old prompt are not reused
+PROMPT_VERSION = 1
+NO_SOLUTION = "Sorry, I couldn't solve this."
+SOLVE_PROMPT = "Solve this math problem step-by-step. Clearly show final answer at the end without LaTeX or special formatting:\n{problem}"
+RECHECK_PROMPT = (
+    "A previous solution to this math problem gave the final answer {answer}, which does not check out. "
+    "Solve it again carefully step-by-step. Clearly show final answer at the end without LaTeX or special "
+    "formatting:\n{problem}"
+)
+EXTRACT_ALL_PROMPT = (
+    "List every math problem in this image exactly as written, one per line, "
+    "numbered 1., 2., 3. and so on. Output only the numbered problems."
+)
+BATCH_SOLVE_PROMPT = (
+    "Solve each of the following math problems step-by-step. Clearly show the final answer at the end "
+    "of each solution without LaTeX or special formatting. Begin each solution with a line of the form "
+    "'### Problem N' using the problem's number.\n\n{problems}"
+)
+
+# Batches are sized so the combined answer fits in one response
+MAX_OUTPUT_TOKENS = 8192
+MAX_INPUT_TOKENS = 32000
+TOKENS_PER_SOLUTION = 500
+
+NUMBERED_LINE = re.compile(r"^\s*(?:problem\s*)?\d+\s*[.):]\s*(.+)$", re.IGNORECASE)
+FINAL_ANSWER = re.compile(r"final answer[\s*:：]*(.+)", re.IGNORECASE)
+SOLUTION_HEADER = re.compile(r"^[ \t]*#{1,6}[ \t]*\**[ \t]*problem[ \t]+(\d+)\b.*$", re.IGNORECASE | re.MULTILINE)
+
+
+def solve_problem_text(problem):
+    # Blocking model round trip, meant to run on a worker thread
+    text = get_backend().generate(SOLVE_PROMPT.format(problem=problem))
+    return text.strip() if text else NO_SOLUTION
+
+
+def recheck_problem_text(problem, previous_answer):
+    # A fresh solve for an answer that failed verification
+    text = get_backend().generate(RECHECK_PROMPT.format(problem=problem, answer=previous_answer))
+    return text.strip() if text else NO_SOLUTION
+
+
+def stream_problem_text(problem):
+    # Yields the solution text chunk by chunk as the model produces it
+    yield from get_backend().stream(SOLVE_PROMPT.format(problem=problem))
+
+
+def stream_prompt_text(prompt):
+    # Like stream_problem_text for a prompt that is already built (follow-ups with context)
+    yield from get_backend().stream(prompt)
+
+
+def final_answer(text):
+    # What follows the last "Final Answer:" marker, else the last non-empty line
+    matches = FINAL_ANSWER.findall(text or "")
+    if matches:
+        return matches[-1].strip(" *")
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    return lines[-1].strip(" *") if lines else ""
+
+
+def get_text_from_image(image_path, cache=None):
+    return extract_image(image_path, cache).text
+
+
+def extract_image(image_path, cache=None, all_problems=False):
+    # Uploads a preprocessed copy of the image; identical files (by content hash)
+    # are answered from the cache without touching the network. With all_problems
+    # every problem in the image is listed, one per line, instead of just the first.
+    start = time.perf_counter()
+    with metrics.span("image.read"):
+        with open(image_path, "rb") as f:
+            raw = f.read()
+    return extract_image_data(raw, os.path.basename(image_path), cache, all_problems, start)
+
+
+def extract_image_data(raw, name, cache=None, all_problems=False, start=None):
+    # Same as extract_image for image bytes already in memory (uploads)
+    start = start or time.perf_counter()
+    key = cache.key_for(("all:" if all_problems else "") + content_hash(raw)) if cache else None
+    if cache:
+        cached = cache.get(key)
+        metrics.count("image_cache.hits" if cached is not None else "image_cache.misses")
+        if cached is not None:
+            return ImageExtraction(cached, len(raw), 0, (time.perf_counter() - start) * 1000, cached=True)
+    with metrics.span("image.preprocess"):
+        data, mime = preprocess_image(raw)
+    contents = [{"mime_type": mime, "data": data}]
+    if all_problems:
+        contents.insert(0, EXTRACT_ALL_PROMPT)
+    with metrics.span("image.model"):
+        extracted_text = get_backend().generate(contents)
+    text = None
+    if extracted_text:
+        extracted_text = extracted_text.strip()
+        if all_problems:
+            text = "\n".join(parse_problem_list(extracted_text)) or None
+        else:
+            text = first_problem_line(extracted_text)
+    if cache and text:
+        cache.put(key, name, text)
+    return ImageExtraction(text, len(raw), len(data), (time.perf_counter() - start) * 1000)
+
+
+def first_problem_line(text):
+    for line in text.split("\n"):
+        if any(char.isdigit() for char in line):
+            return line.strip()
+    return None
+
+
+def parse_problem_list(text):
+    problems = []
+    for line in text.split("\n"):
+        match = NUMBERED_LINE.match(line)
+        if match:
+            problems.append(match.group(1).strip())
+    if not problems:
+        # The model ignored the numbering; fall back to any line with a digit
+        problems = [line.strip() for line in text.split("\n") if any(char.isdigit() for char in line)]
+    return problems
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def pack_problems(problems, tokens_per_solution=TOKENS_PER_SOLUTION,
+                  max_output_tokens=MAX_OUTPUT_TOKENS, max_input_tokens=MAX_INPUT_TOKENS):
+    # Greedily packs (number, problem) pairs into as few requests as the
+    # output and input token budgets allow
+    batches, batch, input_tokens = [], [], estimate_tokens(BATCH_SOLVE_PROMPT)
+    for number, problem in problems:
+        cost = estimate_tokens(problem) + 2
+        if batch and ((len(batch) + 1) * tokens_per_solution > max_output_tokens
+                      or input_tokens + cost > max_input_tokens):
+            batches.append(batch)
+            batch, input_tokens = [], estimate_tokens(BATCH_SOLVE_PROMPT)
+        batch.append((number, problem))
+        input_tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def split_solutions(text):
+    # Maps problem number -> solution text using the '### Problem N' headers
+    headers = list(SOLUTION_HEADER.finditer(text))
+    sections = {}
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        sections[int(header.group(1))] = text[header.end():end].strip()
+    return sections
+
+
+def solve_batch(batch):
+    # One generate_content call for the whole batch; any problem whose section
+    # is missing from the combined answer is retried on its own
+    if len(batch) == 1:
+        number, problem = batch[0]
+        return {number: solve_problem_text(problem)}
+    listing = "\n".join(f"{number}. {problem}" for number, problem in batch)
+    text = get_backend().generate(BATCH_SOLVE_PROMPT.format(problems=listing))
+    sections = split_solutions(text) if text else {}
+    solutions = {}
+    for number, problem in batch:
+        solutions[number] = sections.get(number) or solve_problem_text(problem)
+    return solutions
+
+
+def open_solution_cache():
+    # Keyed by the backend's model so switching models never serves stale answers
+    return SolutionCache(model=get_backend().name, prompt_version=PROMPT_VERSION)
+
+
+def open_image_cache():
+    # Extracted text keyed by the hash of the raw image bytes
+    return SolutionCache(
+        os.getenv("MATHSOLVER_IMAGE_CACHE_PATH", DEFAULT_IMAGE_CACHE_PATH),
+        model=get_backend().name, prompt_version=f"image-{PIPELINE_VERSION}"
+    )
@@ -0,0 +1,138 @@
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer
+from metrics import metrics
+
+DEBOUNCE_MS = 350
+# Speculative solves that may go unused within WASTE_WINDOW seconds before
+# speculation pauses until older ones age out
+WASTE_BUDGET = 20
+WASTE_WINDOW = 3600
+# Input ending in one of these is still being typed
+INCOMPLETE_ENDINGS = tuple("+-*/^=(,")
+
+
+class Speculation:
+    def __init__(self, problem, key):
+        self.problem = problem
+        self.key = key
+        self.worker = None
+        self.start = time.perf_counter()
+        self.end = None
+        self.failed = False
+
+
+class Speculator(QObject):
+    # Starts solving what is in the input box before it is submitted. Edits
+    # are debounced; once the text has been still for DEBOUNCE_MS and only a
+    # model call could answer it, its stream starts as a background task under
+    # the same single-flight key the app submits with. Submitting the same
+    # problem then joins that stream (or finds the answer cached). At most one
+    # speculation runs; one for other text is cancelled and counted as wasted.
+    # accept(problem) can veto text that will not be solved on its own.
+    def __init__(self, tasks, core, parent=None, debounce_ms=DEBOUNCE_MS, budget=WASTE_BUDGET, accept=None):
+        super().__init__(parent)
+        self.tasks = tasks
+        self.core = core
+        self.budget = budget
+        self.accept = accept
+        self.enabled = False
+        self.text = ""
+        self.current = None
+        self.wasted = deque()
+        self.started = 0
+        self.hits = 0
+        self.saved = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self._fire)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.timer.stop()
+            self._drop()
+
+    def text_changed(self, text):
+        if self.enabled:
+            self.text = text
+            self.timer.start()
+
+    def claim(self, problem):
+        # Called as problem is submitted. If a speculation for it ran (its
+        # answer is cached or on its way) that is a hit, and the seconds of
+        # solving it already did are returned; otherwise None.
+        self.timer.stop()
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+        if speculation.key != self.core.key_for(problem) or speculation.failed:
+            self._waste(speculation)
+            return None
+        saved = (speculation.end or time.perf_counter()) - speculation.start
+        self.hits += 1
+        self.saved += saved
+        metrics.count("speculation.hits")
+        metrics.observe("speculation.saved", saved)
+        return saved
+
+    def hit_rate(self):
+        return self.hits / self.started if self.started else 0.0
+
+    def over_budget(self):
+        cutoff = time.monotonic() - WASTE_WINDOW
+        while self.wasted and self.wasted[0] < cutoff:
+            self.wasted.popleft()
+        return len(self.wasted) >= self.budget
+
+    def _fire(self):
+        problem = self.text.strip()
+        if not problem or problem.endswith(INCOMPLETE_ENDINGS):
+            return
+        if self.accept is not None and not self.accept(problem):
+            return
+        key = self.core.key_for(problem)
+        if self.current is not None and self.current.key == key:
+            return
+        # Already being solved for real, or answerable without the model
+        if key in self.tasks.flights or not self.core.needs_model(problem):
+            return
+        if self.over_budget():
+            metrics.count("speculation.skipped")
+            return
+        self._drop()
+        speculation = self.current = Speculation(problem, key)
+        self.started += 1
+        metrics.count("speculation.started")
+        # A chunk callback makes it a stream that a later submit can join and replay
+        speculation.worker = self.tasks.submit(
+            self.core.stream_model, problem,
+            key=key,
+            background=True,
+            on_chunk=lambda chunk: None,
+            on_result=lambda answer: self._solved(speculation, answer),
+            on_error=lambda error: self._solved(speculation, None),
+            on_finished=lambda: self._finished(speculation)
+        )
+
+    def _solved(self, speculation, answer):
+        # Nothing was cached if the model failed or gave no solution
+        speculation.failed = answer is None or not answer.solved
+
+    def _finished(self, speculation):
+        if speculation.end is None:
+            speculation.end = time.perf_counter()
+
+    def _drop(self):
+        speculation, self.current = self.current, None
+        if speculation is not None:
+            self._waste(speculation)
+
+    def _waste(self, speculation):
+        # A finished one has spent its call already; a running one stops streaming
+        if speculation.end is None:
+            self.tasks.cancel(speculation.worker)
+            metrics.count("speculation.cancelled")
+        self.wasted.append(time.monotonic())
+        metrics.count("speculation.wasted")
@@ -0,0 +1,127 @@
+# The whole window's look in one stylesheet, set once on the application so Qt
+# parses it a single time instead of once per widget. Widgets are picked out
+# by objectName (#header) or by a "role" property for groups of buttons.
+
+COMMON = """
+QFrame#header, QFrame#header QWidget {
+    background: #3C8CE7;
+    border-radius: 15px;
+}
+QFrame#header { padding: 15px; }
+QLabel#logo { font-size: 24px; }
+QLabel#title {
+    color: white;
+    font-size: 24px;
+    font-weight: bold;
+    margin-left: 10px;
+}
+QCheckBox#darkToggle {
+    color: white;
+    font-weight: bold;
+    padding: 8px;
+}
+
+QPushButton[role="header"] {
+    color: white;
+    padding: 8px 15px;
+    border-radius: 8px;
+    font-weight: bold;
+    min-width: 100px;
+}
+QPushButton#clearButton { background-color: #f44336; }
+QPushButton#clearButton:hover { background-color: #d32f2f; }
+QPushButton#searchButton { background-color: #009688; }
+QPushButton#searchButton:hover { background-color: #00796B; }
+QPushButton#exportButton { background-color: #2196F3; }
+QPushButton#exportButton:hover { background-color: #1976D2; }
+
+QPushButton[role="input"] {
+    color: white;
+    border-radius: 10px;
+    padding: 12px 20px;
+    font-weight: bold;
+    min-width: 80px;
+}
+QPushButton#solveButton { background-color: #4CAF50; }
+QPushButton#solveButton:hover { background-color: #388E3C; }
+QPushButton#uploadButton { background-color: #FF5722; }
+QPushButton#uploadButton:hover { background-color: #E64A19; }
+QPushButton#folderButton { background-color: #FF7043; }
+QPushButton#folderButton:hover { background-color: #F4511E; }
+QPushButton#cancelButton { background-color: #9E9E9E; }
+QPushButton#cancelButton:hover { background-color: #757575; }
+
+QFrame#footer, QFrame#footer QWidget {
+    background: #FF9800;
+    border-radius: 15px;
+}
+QFrame#footer { padding: 15px; }
+QLabel#developer {
+    color: white;
+    font-size: 14px;
+    font-weight: bold;
+}
+QLabel#version {
+    color: white;
+    font-size: 12px;
+}
+QPushButton[role="link"] {
+    background-color: transparent;
+    color: white;
+    border: 2px solid white;
+    border-radius: 8px;
+    padding: 8px 15px;
+    font-weight: bold;
+    min-width: 80px;
+}
+QPushButton[role="link"]:hover { background-color: rgba(255, 255, 255, 0.1); }
+QLabel#perfStats {
+    font-family: monospace;
+    font-size: 12px;
+}
+"""
+
+LIGHT = """
+QWidget { background: #F0F4F8; }
+QListView#chatArea {
+    background-color: white;
+    color: black;
+    border-radius: 15px;
+    padding: 15px;
+    font-size: 14px;
+    border: 2px solid #E0E0E0;
+}
+QLineEdit#problemInput {
+    border: 2px solid #E0E0E0;
+    border-radius: 10px;
+    padding: 12px;
+    font-size: 14px;
+    background-color: white;
+}
+QLineEdit#problemInput:focus { border: 2px solid #3C8CE7; }
+"""
+
+DARK = """
+QWidget { background-color: #121212; color: white; }
+QListView#chatArea {
+    background-color: #1E1E1E;
+    color: white;
+    border-radius: 15px;
+    padding: 15px;
+    font-size: 14px;
+    border: 2px solid #333333;
+}
+QLineEdit#problemInput {
+    border: 2px solid #333333;
+    border-radius: 10px;
+    padding: 12px;
+    font-size: 14px;
+    background-color: #1E1E1E;
+}
+QLineEdit#problemInput:focus { border: 2px solid #3C8CE7; }
+"""
+
+
+def stylesheet(dark=False):
+    # Theme rules first so the more specific widget rules below win
+    return (DARK if dark else LIGHT) + COMMON
@@ -0,0 +1,62 @@
+import pytest
+
+from conversation import Conversation
+
+
+@pytest.fixture
+def conversation():
+    conversation = Conversation(budget=400)
+    conversation.add("Solve 2x + 3 = 11", "**Step 1:** Subtract 3\n**Final Answer:** x = 4")
+    return conversation
+
+
+@pytest.mark.parametrize("problem", [
+    "now explain step 2",
+    "what if x = 5",
+    "why is that the answer",
+    "do the same for cos(x)",
+    "explain it",
+])
+def test_follow_ups(conversation, problem):
+    assert conversation.is_follow_up(problem)
+
+
+@pytest.mark.parametrize("problem", [
+    "solve this: 3x + 5 = 20",
+    "simplify 3/4 + 1/2",
+    "expand (x+1)^2",
+    "check 17 * 23 = 391",
+    "Is it true that 2^10 = 1024?",
+    "now 5 + 5",
+    "Integrate x^2 dx",
+])
+def test_self_contained_problems_are_not_follow_ups(conversation, problem):
+    assert not conversation.is_follow_up(problem)
+
+
+def test_nothing_is_a_follow_up_before_the_first_turn():
+    assert not Conversation().is_follow_up("now explain step 2")
+
+
+def test_prompt_stays_within_budget_as_turns_pile_up():
+    conversation = Conversation(budget=400)
+    for turn in range(100):
+        conversation.add(f"Integrate x^{turn} dx", f"**Step 1:** Use the power rule\n**Final Answer:** x^{turn + 1}/{turn + 1}")
+    prompt, tokens = conversation.prompt("now explain step 1")
+    assert tokens <= 400
+    assert "Integrate x^99 dx" in prompt
+    assert prompt.endswith("Follow-up: now explain step 1")
+
+
+def test_oversized_latest_turn_is_cut_short():
+    conversation = Conversation(budget=200)
+    conversation.add("Prove it", "word " * 2000)
+    prompt, tokens = conversation.prompt("why is that")
+    assert tokens <= 200
+    assert "…" in prompt
+
+
+def test_clear_forgets_everything(conversation):
+    conversation.clear()
+    assert len(conversation) == 0
+    assert not conversation.is_follow_up("now explain step 2")
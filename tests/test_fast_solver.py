@@ -0,0 +1,69 @@
+import pytest
+
+import fast_solver
+from fast_solver import try_solve
+
+
+def answer(problem):
+    solution = try_solve(problem, record=False)
+    return solution and solution.answer
+
+
+@pytest.mark.parametrize("problem, expected", [
+    ("what is 2 + 3 * 4?", "14"),
+    ("Calculate (1 + 2)^3", "27"),
+    ("1/3 + 1/6", "1/2 = 0.5"),
+    ("What is 15% of 80", "15% of 80 = 12"),
+    ("Solve 2x + 3 = 11.", "x = 4"),
+    ("x^2 - 5x + 6 = 0", "x = 2 or x = 3"),
+    ("x^2 = 2", "x = ±√2 (≈ -1.41421 or 1.41421)"),
+    ("x^2 + 1 = 0", "No real solutions"),
+])
+def test_solves_locally(problem, expected):
+    assert answer(problem) == expected
+
+
+@pytest.mark.parametrize("problem, expected", [
+    ("10 / 4", "5/2 = 2.5"),
+    ("3/4", "3/4 = 0.75"),
+    ("What is 7/8?", "7/8 = 0.875"),
+    ("10/5", "2"),
+])
+def test_literal_fractions_are_reduced(problem, expected):
+    solution = try_solve(problem, record=False)
+    assert solution.answer == expected
+    assert solution.steps
+
+
+@pytest.mark.parametrize("problem", [
+    # Factorials are not supported and must not be read as the number before the "!"
+    "3+5!",
+    "what is 10 - 3!",
+    "(2 + 1)!",
+    # Percentages of something with a variable
+    "what is 20% of x",
+    "50% of 2y",
+    "x% of 10",
+    # Outside the fast path
+    "5",
+    "sin(x) = 0",
+    "x^3 = 8",
+    "1/0",
+    "2^1000",
+    "x + y = 3",
+])
+def test_leaves_the_rest_to_the_model(problem):
+    assert answer(problem) is None
+
+
+@pytest.mark.parametrize("problem", ["((", "2 +", "= 3", "3 = = 4", "%", "of 5", "% of", "x^^2", "()"])
+def test_malformed_input_never_raises(problem):
+    assert try_solve(problem, record=False) is None
+
+
+def test_stats_are_only_recorded_on_request():
+    before = fast_solver.stats.attempts
+    try_solve("2 + 2", record=False)
+    assert fast_solver.stats.attempts == before
+    try_solve("2 + 2")
+    assert fast_solver.stats.attempts == before + 1
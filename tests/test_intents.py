@@ -0,0 +1,60 @@
+import pytest
+
+from core import SolverCore
+from intents import IntentMatcher
+
+INTENTS = [
+    {"patterns": ["hi", "hello"], "response": "greeting"},
+    {"patterns": ["thanks", "thank you"], "response": "thanks"},
+    {"patterns": ["help", "help me"], "response": "help"},
+    {"patterns": ["ok", "cool"], "response": "ack"},
+    {"patterns": ["solve this", "who are you", "what can you do"], "response": "about"},
+]
+
+
+@pytest.fixture
+def matcher():
+    return IntentMatcher(intents=INTENTS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("hi", "greeting"),
+    ("  Hello  ", "greeting"),
+    ("Thank   You!", "thanks"),
+    ("this is hard", None),
+    ("which one", None),
+])
+def test_matches_whole_words_only(matcher, text, expected):
+    assert matcher.match(text) == expected
+
+
+def test_longest_pattern_wins():
+    matcher = IntentMatcher(intents=[{"patterns": ["thank"], "response": "short"},
+                                     {"patterns": ["thank you"], "response": "long"}])
+    assert matcher.match("thank you") == "long"
+
+
+def test_split_takes_the_matched_phrase_out(matcher):
+    assert matcher.split("Thanks, now 2x = 4") == ("thanks", ", now 2x = 4")
+    assert matcher.split("what is 2x = 4") == (None, "what is 2x = 4")
+
+
+@pytest.mark.parametrize("problem", [
+    "help me solve 2x+3=11",
+    "ok so 3x+2=11",
+    "solve this: 2x + 3 = 11",
+    "cool, now 5+5",
+    "solve this 5+5",
+    "solve this: 12/4",
+    "who are you 5+5",
+    "thank you, 2+2?",
+    "what can you do with 7*8",
+])
+def test_problems_with_small_talk_are_still_solved(matcher, problem):
+    core = SolverCore(intents=matcher)
+    assert core.reply(problem) is None
+
+
+@pytest.mark.parametrize("text, source", [("hello", "intent"), ("thank you!", "intent"), ("who are you?", "intent"), ("solve it", "invalid")])
+def test_small_talk_and_non_problems_get_replies(matcher, text, source):
+    assert SolverCore(intents=matcher).reply(text).source == source
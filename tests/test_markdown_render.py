@@ -0,0 +1,43 @@
+import pytest
+
+from markdown_render import MarkdownRenderer, markdown_to_html
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("**Step 1:** x < 3 & y", "<b>Step 1:</b> x &lt; 3 &amp; y"),
+    ("# Title", "<b>Title</b>"),
+    ("- item *a*", "• item <i>a</i>"),
+    ("\\boxed{\\frac{1}{2}}", "<b>\\frac{1}{2}</b>"),
+    ("`f(x) = x**2`", "<code>f(x) = x**2</code>"),
+    ("first\nsecond", "first<br>second"),
+    # Markers that never close, or sit between operands, stay as written
+    ("**bold", "**bold"),
+    ("2 * 3 * 4", "2 * 3 * 4"),
+    ("x**2 + y**2", "x**2 + y**2"),
+    ("<script>", "&lt;script&gt;"),
+])
+def test_renders_markdown(text, expected):
+    assert markdown_to_html(text) == expected
+
+
+def test_code_blocks_are_escaped_and_keep_indentation():
+    assert markdown_to_html("```\nif a<b:\n  x\n```") == "<code>if a&lt;b:</code><br><code>&nbsp;&nbsp;x</code><br>"
+
+
+def test_leading_blank_lines_are_dropped():
+    assert markdown_to_html("\n\n  **Final Answer:** 4") == "<b>Final Answer:</b> 4"
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 40])
+def test_streamed_chunks_render_like_the_whole_text(size):
+    text = "### Part 1\n**Step 1:** Expand 3 * x\n- *positive*\n```\ncode < here\n```\n**Final Answer:** \\boxed{4}"
+    renderer = MarkdownRenderer()
+    html = "".join(renderer.feed(text[i:i + size]) for i in range(0, len(text), size)) + renderer.flush()
+    assert html == markdown_to_html(text)
+
+
+def test_feed_holds_back_the_unfinished_line():
+    renderer = MarkdownRenderer()
+    assert renderer.feed("**Ste") == ""
+    assert renderer.feed("p 1:** a\nb") == "<b>Step 1:</b> a<br>"
+    assert renderer.flush() == "b"
@@ -0,0 +1,48 @@
+import threading
+import time
+
+import solver
+from core import SolverCore
+
+
+def fake_batch(calls, release=None):
+    def solve_batch(batch):
+        calls.append([problem for _, problem in batch])
+        if release is not None:
+            release.wait(5)
+        return {number: f"**Final Answer:** {problem}" for number, problem in batch}
+    return solve_batch
+
+
+def test_a_repeated_problem_is_sent_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(solver, "solve_batch", fake_batch(calls))
+    answers = SolverCore().solve_all(["Factor x^2 + 5x + 6", "Factor y^2 - 1", "Factor  x^2 + 5x + 6"])
+    assert calls == [["Factor x^2 + 5x + 6", "Factor y^2 - 1"]]
+    assert [answer.source for answer in answers] == ["model"] * 3
+    assert answers[2].text == answers[0].text
+
+
+def test_concurrent_solves_share_a_problem_in_flight(monkeypatch):
+    calls = []
+    release = threading.Event()
+    monkeypatch.setattr(solver, "solve_batch", fake_batch(calls, release))
+    core = SolverCore()
+    results = {}
+
+    def solve(name, problems):
+        results[name] = core.solve_all(problems)
+
+    first = threading.Thread(target=solve, args=("first", ["Factor x^2 + 5x + 6"]))
+    first.start()
+    while not calls:
+        time.sleep(0.001)
+    second = threading.Thread(target=solve, args=("second", ["Factor x^2 + 5x + 6", "Factor y^2 - 1"]))
+    second.start()
+    while len(calls) < 2 and second.is_alive():
+        time.sleep(0.001)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert calls == [["Factor x^2 + 5x + 6"], ["Factor y^2 - 1"]]
+    assert results["second"][0].text == results["first"][0].text
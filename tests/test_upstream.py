@@ -0,0 +1,20 @@
+from backends import StubBackend
+from upstream import AdaptiveLimit, GuardedBackend
+
+
+def test_a_finished_stream_grows_the_limit():
+    limit = AdaptiveLimit(initial=4)
+    backend = GuardedBackend(StubBackend(), limit=limit)
+    assert "".join(backend.stream("Solve 2x + 3 = 11"))
+    assert limit.in_flight == 0
+    assert limit.limit > 4
+
+
+def test_a_closed_stream_leaves_the_limit_alone():
+    limit = AdaptiveLimit(initial=4)
+    backend = GuardedBackend(StubBackend(), limit=limit)
+    chunks = backend.stream("Solve 2x + 3 = 11")
+    next(chunks)
+    chunks.close()
+    assert limit.in_flight == 0
+    assert limit.limit == 4
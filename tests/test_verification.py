@@ -0,0 +1,61 @@
+import pytest
+
+import solver
+from core import SolverCore
+from solution_cache import SolutionCache
+from verification import check_answer
+
+
+def answer(text):
+    return f"**Step 1:** Work it out\n**Final Answer:** {text}"
+
+
+@pytest.mark.parametrize("problem, right, wrong, kind", [
+    ("What is sqrt(2) * sin(1)", "1.19", "1.25", "arithmetic"),
+    ("What is 1000 * 1500", "1,500,000", "1,400,000", "arithmetic"),
+    ("Solve x^2 - 5x + 6 = 0", "x = 2 or x = 3", "x = 2 or x = 4", "equation"),
+    ("Solve x^2 = 2", "x = ±1.414", "x = ±1.5", "equation"),
+    ("Solve 1000x = 1500000", "x = 1,500", "x = 1,400", "equation"),
+    ("Solve 2^x = 10", "x ≈ 3.32", "x ≈ 3.5", "equation"),
+    ("Solve sin(x) = 0.5", "x = π/6", "x = π/3", "equation"),
+    ("Solve cos(x) = 0", "x = 90°", "x = 45°", "equation"),
+    ("Find the derivative of x^3 * e^x", "3x^2 e^x + x^3 e^x", "3x^2 e^x", "derivative"),
+    ("What is the integral of 1/x dx", "ln|x| + C", "1/x^2 + C", "integral"),
+    ("Integrate sin(x) from 0 to pi", "2", "1", "integral"),
+])
+def test_right_answers_verify_and_wrong_ones_fail(problem, right, wrong, kind):
+    verified = check_answer(problem, answer(right))
+    assert (verified.status, verified.kind) == ("verified", kind)
+    assert check_answer(problem, answer(wrong)).status == "failed"
+
+
+def test_two_roots_separated_by_a_comma():
+    assert check_answer("Solve x^2 - 5x + 6 = 0", answer("x = 2, 3")).status == "verified"
+
+
+@pytest.mark.parametrize("problem, text", [
+    ("What is 10!", "3628800"),
+    ("Solve x + y = 3", "x = 3 - y"),
+    ("What is log(100)", "2"),
+    ("Solve x^3 = x", "x = 1"),
+    ("Solve x^3 - 6x^2 + 11x - 6 = 0", "x = 1"),
+    ("Solve e^x = x + 2", "x ≈ 1.146"),
+    ("Solve cos(x) = 0", "x = 90"),
+    ("Solve sin(x) = 0.5", "x = 30"),
+    ("A train covers 100 miles in 2 hours; how fast does it go", "50 mph"),
+])
+def test_unsupported_problems_are_left_unchecked(problem, text):
+    assert check_answer(problem, answer(text)).status == "unchecked"
+
+
+@pytest.mark.parametrize("recheck, cached", [
+    ("x = 2 or x = 3", "x = 2 or x = 3"),
+    ("x = 2 or x = 5", None),
+])
+def test_recheck_is_cached_only_once_verified(monkeypatch, recheck, cached):
+    problem = "Solve x^2 - 5x + 6 = 0"
+    core = SolverCore(SolutionCache(":memory:"))
+    core.remember(problem, answer("x = 2 or x = 4"))
+    monkeypatch.setattr(solver, "recheck_problem_text", lambda problem, previous: answer(recheck))
+    core.recheck(problem, answer("x = 2 or x = 4"))
+    assert core.cache.get(core.key_for(problem)) == (answer(cached) if cached else None)
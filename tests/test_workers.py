@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+from workers import TaskRunner
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def wait_until(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_identical_requests_share_one_call(app):
+    tasks = TaskRunner()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def solve(problem):
+        calls.append(problem)
+        release.wait(5)
+        return problem.upper()
+
+    tasks.submit(solve, "x", key="x", on_result=results.append)
+    tasks.submit(solve, "x", key="x", on_result=results.append)
+    release.set()
+    assert wait_until(app, lambda: len(results) == 2)
+    assert calls == ["x"]
+    assert results == ["X", "X"]
+
+
+def test_resubmitting_after_cancel_starts_a_new_call(app):
+    tasks = TaskRunner()
+    gates = [threading.Event(), threading.Event()]
+    calls = []
+    results = []
+
+    def solve(problem):
+        gate = gates[len(calls)]
+        calls.append(problem)
+        gate.wait(5)
+        return problem.upper()
+
+    first = tasks.submit(solve, "x", key="x", on_result=results.append)
+    assert wait_until(app, lambda: len(calls) == 1)
+    tasks.cancel(first)
+    second = tasks.submit(solve, "x", key="x", on_result=results.append)
+    assert second is not first
+    assert wait_until(app, lambda: len(calls) == 2)
+    # The cancelled call finishing first must not take the new flight's key with it
+    gates[0].set()
+    assert wait_until(app, lambda: first not in tasks.active)
+    assert tasks.submit(solve, "x", key="x", on_result=results.append) is second
+    gates[1].set()
+    assert wait_until(app, lambda: results == ["X", "X"])
+    assert tasks.flights == {}
+
+
+def test_cancelled_background_task_is_not_joined(app):
+    tasks = TaskRunner()
+    release = threading.Event()
+    results = []
+
+    def solve(problem):
+        release.wait(5)
+        return problem.upper()
+
+    speculative = tasks.submit(solve, "x", key="x", background=True)
+    tasks.cancel(speculative)
+    real = tasks.submit(solve, "x", key="x", on_result=results.append)
+    assert real is not speculative
+    release.set()
+    assert wait_until(app, lambda: results == ["X"])
@@ -0,0 +1,151 @@
+import os
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal
+from metrics import NULL_SPAN, metrics
+
+EXTRACT_SLOTS = 2
+SOLVE_SLOTS = 2
+# Extracted images allowed to wait for a solve slot before extraction pauses
+SOLVE_BACKLOG = 2
+MAX_QUEUED = 200
+STATE_ICONS = {"queued": "⏳", "extracting": "🔍", "extracted": "📄", "solving": "🧮",
+               "done": "✅", "failed": "⚠️", "cancelled": "✖️"}
+
+
+class UploadItem:
+    # state is one of STATE_ICONS
+    def __init__(self, path, all_problems):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.all_problems = all_problems
+        self.state = "queued"
+        self.extraction = None
+        self.problems = []
+        self.answers = []
+        self.error = None
+        self.worker = None
+        self.span = NULL_SPAN
+
+
+class UploadQueue(QObject):
+    # Images go through extraction and solving as a two-stage pipeline on the
+    # app's TaskRunner: while one image is being solved the next ones are
+    # already extracting. Each stage has its own slot count, extraction pauses
+    # once SOLVE_BACKLOG extracted images are waiting, and no more than
+    # MAX_QUEUED images wait to start.
+    changed = pyqtSignal()
+    # An item reached done or failed; cancelled items are not reported
+    item_done = pyqtSignal(object)
+
+    def __init__(self, tasks, core, parent=None, extract_slots=EXTRACT_SLOTS, solve_slots=SOLVE_SLOTS):
+        super().__init__(parent)
+        self.tasks = tasks
+        self.core = core
+        self.extract_slots = extract_slots
+        self.solve_slots = solve_slots
+        # Everything since the queue was last idle, for the progress listing
+        self.items = []
+        self.queued = deque()
+        self.extracted = deque()
+        self.extracting = 0
+        self.solving = 0
+
+    def add(self, paths, all_problems=False):
+        # Returns how many images were accepted; the rest did not fit in the queue
+        if self.idle():
+            self.items = []
+        accepted = [UploadItem(path, all_problems) for path in paths[:MAX_QUEUED - len(self.queued)]]
+        self.items.extend(accepted)
+        self.queued.extend(accepted)
+        self._pump()
+        self.changed.emit()
+        return len(accepted)
+
+    def idle(self):
+        return not (self.queued or self.extracted or self.extracting or self.solving)
+
+    def waiting_count(self):
+        # Images not currently running on a worker
+        return len(self.queued) + len(self.extracted)
+
+    def cancel(self):
+        for item in self.items:
+            if item.state in ("queued", "extracting", "extracted", "solving"):
+                item.state = "cancelled"
+                if item.worker is not None:
+                    self.tasks.cancel(item.worker)
+        self.queued.clear()
+        self.extracted.clear()
+        self.changed.emit()
+
+    def counts(self):
+        counts = dict.fromkeys(STATE_ICONS, 0)
+        for item in self.items:
+            counts[item.state] += 1
+        return counts
+
+    def _pump(self):
+        while self.extracted and self.solving < self.solve_slots:
+            self._solve(self.extracted.popleft())
+        while self.queued and self.extracting < self.extract_slots and len(self.extracted) < SOLVE_BACKLOG:
+            self._extract(self.queued.popleft())
+
+    def _extract(self, item):
+        item.state = "extracting"
+        item.span = metrics.span("upload.item")
+        self.extracting += 1
+        item.worker = self.tasks.submit(
+            self.core.extract, item.path, item.all_problems,
+            on_result=lambda extraction: self._extracted(item, extraction),
+            on_error=lambda error: self._failed(item, error),
+            on_finished=lambda: self._stage_finished(item, "extracting")
+        )
+
+    def _extracted(self, item, extraction):
+        if item.state != "extracting":
+            return
+        item.extraction = extraction
+        item.problems = extraction.problems if item.all_problems else [extraction.text] if extraction.text else []
+        if not item.problems:
+            self._failed(item, None)
+            return
+        item.state = "extracted"
+        self.extracted.append(item)
+
+    def _solve(self, item):
+        item.state = "solving"
+        self.solving += 1
+        item.worker = self.tasks.submit(
+            self.core.solve_all, item.problems,
+            on_result=lambda answers: self._solved(item, answers),
+            on_error=lambda error: self._failed(item, error),
+            on_finished=lambda: self._stage_finished(item, "solving")
+        )
+
+    def _solved(self, item, answers):
+        if item.state != "solving":
+            return
+        item.answers = answers
+        item.state = "done"
+        item.span.end()
+        self.item_done.emit(item)
+
+    def _failed(self, item, error):
+        # error is None when the image had no problem in it
+        if item.state in ("cancelled", "failed"):
+            return
+        item.state = "failed"
+        item.error = error
+        item.span.end(error=True)
+        self.item_done.emit(item)
+
+    def _stage_finished(self, item, stage):
+        # Runs after the stage's result or error, or alone if it was cancelled
+        if stage == "extracting":
+            self.extracting -= 1
+        else:
+            self.solving -= 1
+        if item.state == stage:
+            item.state = "cancelled"
+        self._pump()
+        self.changed.emit()
@@ -0,0 +1,281 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backends import Backend
+from metrics import metrics, percentile
+
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+DEFAULT_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+# A call this many times slower than the fastest seen means requests are queueing upstream
+LATENCY_TOLERANCE = 3.0
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+def error_status(error):
+    # BackendError carries .status; google.api_core exceptions carry the HTTP code as .code
+    status = getattr(error, "status", None)
+    if status is None:
+        code = getattr(error, "code", None)
+        status = code if isinstance(code, int) else None
+    return status
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return error_status(error) in RETRYABLE_STATUSES
+
+
+def backoff_delay(attempt, rng=random, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    # Full jitter: retries from many clients spread out instead of arriving together
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    # Allows `rate` calls per second on average with bursts of up to `burst`
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def try_acquire(self):
+        # acquire() without waiting: False when no token is left right now
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def drain(self):
+        # After a 429 nobody else gets to fire until the bucket refills
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveLimit:
+    # Additive increase / multiplicative decrease on the number of calls in
+    # flight: the limit grows by about one per limit-many successes, halves on
+    # throttling or server errors, and eases off when latency climbs. A success
+    # released without a latency (a stream, whose length depends on the
+    # answer) counts toward growth but is never judged slow.
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=1, maximum=MAX_CONCURRENCY,
+                 latency_tolerance=LATENCY_TOLERANCE):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.best_latency = None
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, failed=False):
+        with self.condition:
+            self.in_flight -= 1
+            if failed:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                if latency is not None and (self.best_latency is None or latency < self.best_latency):
+                    self.best_latency = latency
+                if latency is not None and latency > self.best_latency * self.latency_tolerance:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def abandon(self):
+        # A call given up by its caller says nothing about the upstream: the
+        # slot is freed without counting a success or a failure
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+class GuardedBackend(Backend):
+    # Wraps another backend so every solve and image call shares one rate
+    # limit and one adaptive concurrency limit, retries retryable errors with
+    # jittered exponential backoff, and (with hedge=True) sends a duplicate of
+    # any non-streaming call still running past the recent p95 latency.
+    def __init__(self, inner, rate=DEFAULT_RATE, burst=DEFAULT_BURST, retries=DEFAULT_RETRIES,
+                 hedge=False, limit=None, seed=None):
+        self.inner = inner
+        self.name = inner.name
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = limit or AdaptiveLimit()
+        self.retries = retries
+        self.hedge = hedge
+        self.random = random.Random(seed)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.hedge_pool = ThreadPoolExecutor(max_workers=2 * self.limit.maximum) if hedge else None
+        self.calls = 0
+        self.retried = 0
+        self.throttled = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def generate(self, contents):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._hedged(contents) if self.hedge else self._attempt(contents)
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+            self._sleep_before_retry(attempt)
+
+    def stream(self, contents):
+        # Only retried until the first chunk arrives; after that the caller
+        # already has partial output and the error is theirs to show
+        for attempt in range(self.retries + 1):
+            started = False
+            closed = False
+            start = self._begin()
+            error = None
+            try:
+                for chunk in self.inner.stream(contents):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The caller stopped reading (a cancelled solve)
+                closed = True
+                raise
+            except Exception as e:
+                error = e
+                if started or attempt == self.retries or not is_retryable(e):
+                    raise
+            finally:
+                if closed:
+                    self.limit.abandon()
+                else:
+                    self._end(start, error, streamed=True)
+            if error is None:
+                return
+            self._sleep_before_retry(attempt)
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+    def close(self):
+        if self.hedge_pool:
+            self.hedge_pool.shutdown(wait=False)
+        self.inner.close()
+
+    def hedge_after(self):
+        # Seconds after which a call counts as slow, or None until there is enough history
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(list(self.latencies), 95)
+
+    def _hedged(self, contents):
+        threshold = self.hedge_after()
+        if threshold is None:
+            return self._attempt(contents)
+        # The clock starts once the call is actually sent, not while it waits for a slot
+        sent = threading.Event()
+        primary = self.hedge_pool.submit(self._attempt, contents, sent)
+        sent.wait()
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        self.hedges += 1
+        metrics.count("upstream.hedges")
+        backup = self.hedge_pool.submit(self._attempt, contents)
+        pending = {primary, backup}
+        while True:
+            # The loser keeps running in the background; its answer is dropped
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winners = [future for future in (primary, backup) if future in done and future.exception() is None]
+            if winners:
+                if winners[0] is backup:
+                    self.hedge_wins += 1
+                return winners[0].result()
+            if not pending:
+                return primary.result()
+
+    def _attempt(self, contents, sent=None):
+        start = self._begin()
+        if sent:
+            sent.set()
+        error = None
+        try:
+            return self.inner.generate(contents)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._end(start, error)
+
+    def _begin(self):
+        self.limit.acquire()
+        self.bucket.acquire()
+        self.calls += 1
+        metrics.count("upstream.calls")
+        return time.monotonic()
+
+    def _end(self, start, error, streamed=False):
+        if error is None:
+            latency = time.monotonic() - start
+            if streamed:
+                # A whole stream is as long as its answer, so it says nothing
+                # about queueing and stays out of the limit's and the hedge's latencies
+                self.limit.release()
+                metrics.observe("upstream.stream", latency)
+                return
+            self.latencies.append(latency)
+            self.limit.release(latency)
+            metrics.observe("upstream.call", latency)
+            return
+        metrics.count("upstream.errors")
+        if error_status(error) == 429:
+            self.throttled += 1
+            metrics.count("upstream.throttled")
+            self.bucket.drain()
+        self.limit.release(failed=is_retryable(error))
+
+    def _sleep_before_retry(self, attempt):
+        self.retried += 1
+        metrics.count("upstream.retries")
+        time.sleep(backoff_delay(attempt, self.random))
+
+
+def guard(backend):
+    # Wraps a backend with the limits configured in the environment
+    return GuardedBackend(
+        backend,
+        rate=float(os.getenv("MATHSOLVER_RATE_LIMIT", DEFAULT_RATE)),
+        burst=int(os.getenv("MATHSOLVER_RATE_BURST", DEFAULT_BURST)),
+        retries=int(os.getenv("MATHSOLVER_RETRIES", DEFAULT_RETRIES)),
+        hedge=os.getenv("MATHSOLVER_HEDGE", "0") == "1",
+    )
@@ -0,0 +1,405 @@
+import math
+import re
+import time
+import numpy as np
+import fast_solver
+from fast_solver import PREFIX, SYMBOLS, TRAILING, Unsupported
+from solver import final_answer
+
+# Final answers are checked numerically, all sample points at once:
+# arithmetic against the problem's value, equations by substituting each
+# claimed root and making sure none is missing, derivatives against a central difference of the function and
+# antiderivatives by differentiating them back. Anything else is unchecked.
+
+# Away from 0 and the integers, where special cases hide; points outside a
+# function's domain come out as nan and are left out
+SAMPLES = np.concatenate([np.linspace(0.137, 3.05, 16), -np.linspace(0.371, 2.9, 8)])
+MIN_POINTS = 6
+STEP = 1e-5
+RTOL = 1e-4
+ATOL = 1e-6
+SIMPSON_INTERVALS = 2000
+# Equations: a polynomial's roots come from its coefficients up to this
+# degree, anything else is scanned for sign changes over this grid (off the
+# integers) and each sign change narrowed down by bisection
+MAX_DEGREE = 8
+SCAN = np.linspace(-100.0, 100.0, 20001) + 0.00137
+BISECTIONS = 40
+
+TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|([a-zA-Z]+)|(\*\*|[-+*/^()]))")
+NUMBER = re.compile(r"\d+\.(\d+)")
+EXTRA_SYMBOLS = str.maketrans({"√": "sqrt", "π": "pi", "⋅": "*", "≈": "="})
+ABS_BARS = re.compile(r"\|([^|]+)\|")
+THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+CONSTANT_TERM = re.compile(r"\s*\+\s*(?:C|c|K|constant)\s*$")
+DERIVATIVE = re.compile(
+    r"^(?:the\s+)?(?:(?:first\s+)?derivative\s+of|differentiate|d/d([a-z]))\s*(.+?)"
+    r"(?:\s+with\s+respect\s+to\s+([a-z]))?$", re.IGNORECASE
+)
+INTEGRAL = re.compile(
+    r"^(?:the\s+)?(?:integrate|(?:indefinite\s+|definite\s+)?integral\s+of|∫)\s*(.+?)"
+    r"(?:\s*d([a-z]))?(?:\s+from\s+(.+?)\s+to\s+(.+?))?$", re.IGNORECASE
+)
+ROOT_SEPARATOR = re.compile(r"\s*(?:,|;|\bor\b|\band\b)\s*", re.IGNORECASE)
+DEGREES = re.compile(r"°|\bdeg(?:rees?)?\b", re.IGNORECASE)
+RADIANS = re.compile(r"\bpi\b|\brad(?:ians?)?\b", re.IGNORECASE)
+ANGLE_UNITS = re.compile(r"\s*(?:°|\bdeg(?:rees?)?\b|\brad(?:ians?)?\b)", re.IGNORECASE)
+TRIG = {"sin", "cos", "tan", "sec", "csc", "cot"}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+FUNCTIONS = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "sec": lambda v: 1 / np.cos(v), "csc": lambda v: 1 / np.sin(v), "cot": lambda v: 1 / np.tan(v),
+    "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "exp": np.exp, "ln": np.log, "sqrt": np.sqrt, "abs": np.abs,
+}
+
+
+class Verification:
+    # status is verified, failed or unchecked; kind is the class of problem
+    # that was recognised (arithmetic, equation, derivative, integral)
+    def __init__(self, status, kind=None, detail="", ms=0.0):
+        self.status = status
+        self.kind = kind
+        self.detail = detail
+        self.ms = ms
+
+
+def check_answer(problem, answer_text):
+    start = time.perf_counter()
+    try:
+        with np.errstate(all="ignore"):
+            kind, ok, detail = check(problem, final_answer(answer_text))
+        status = "verified" if ok else "failed"
+    except (Unsupported, ZeroDivisionError, OverflowError, RecursionError, ValueError):
+        kind, status, detail = None, "unchecked", ""
+    return Verification(status, kind, detail, (time.perf_counter() - start) * 1000)
+
+
+def check(problem, answer):
+    text = TRAILING.sub("", PREFIX.sub("", clean(problem)))
+    derivative = DERIVATIVE.match(text)
+    if derivative:
+        return check_derivative(derivative.group(2), derivative.group(1) or derivative.group(3), answer)
+    integral = INTEGRAL.match(text)
+    if integral:
+        return check_integral(*integral.groups(), answer)
+    sides = text.rstrip("=").split("=")
+    if len(sides) == 2:
+        return check_equation(sides[0], sides[1], answer)
+    if len(sides) == 1:
+        return check_arithmetic(text, answer)
+    raise Unsupported(problem)
+
+
+# --- parsing -----------------------------------------------------------------
+
+def clean(text):
+    # Thousands separators go first, so "x = 1,500" is one root and not two
+    text = THOUSANDS.sub("", text.translate(SYMBOLS).translate(EXTRA_SYMBOLS).replace("$", "").replace("\\", ""))
+    return ABS_BARS.sub(r" abs(\1)", text).strip().rstrip(".")
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if not match:
+            raise Unsupported(text[pos:])
+        number, word, op = match.groups()
+        if number:
+            tokens.append(("num", number))
+        elif word:
+            word = word.lower()
+            if word in FUNCTIONS:
+                tokens.append(("func", word))
+            elif word in CONSTANTS:
+                tokens.append(("const", word))
+            elif len(word) == 1:
+                tokens.append(("var", word))
+            else:
+                # log (which base?) and anything else unknown
+                raise Unsupported(word)
+        else:
+            tokens.append(("op", "^" if op == "**" else op))
+        pos = match.end()
+    return tokens
+
+
+class Parser(fast_solver.Parser):
+    # The fast path's grammar plus functions (sin x, sqrt(x), sin^2(x)) and
+    # the constants e and pi
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def term(self):
+        node = self.unary()
+        while True:
+            kind, value = self.peek()
+            if kind == "op" and value in "*/":
+                self.take()
+                node = (value, node, self.unary())
+            elif kind in ("var", "func", "const") or (kind, value) == ("op", "("):
+                node = ("*", node, self.power())
+            else:
+                return node
+
+    def atom(self):
+        kind, value = self.peek()
+        if kind == "const":
+            self.take()
+            return ("const", CONSTANTS[value])
+        if kind != "func":
+            return super().atom()
+        self.take()
+        power = None
+        if self.peek() == ("op", "^"):
+            self.take()
+            power = self.atom()
+        node = ("call", value, self.atom() if self.peek() == ("op", "(") else self.power())
+        return ("^", node, power) if power else node
+
+
+def parse(text):
+    return Parser(text).parse()
+
+
+def free_variables(node, found=None):
+    # fast_solver.variables does not know about calls and constants
+    found = set() if found is None else found
+    if node[0] == "var":
+        found.add(node[1])
+    elif node[0] == "call":
+        free_variables(node[2], found)
+    elif node[0] not in ("num", "const"):
+        for child in node[1:]:
+            free_variables(child, found)
+    return found
+
+
+def calls(node, found=None):
+    found = set() if found is None else found
+    if node[0] == "call":
+        found.add(node[1])
+        calls(node[2], found)
+    elif node[0] not in ("num", "const", "var"):
+        for child in node[1:]:
+            calls(child, found)
+    return found
+
+
+def degree(node):
+    # Degree of a polynomial in the one variable, or None for anything else
+    kind = node[0]
+    if kind in ("num", "const"):
+        return 0
+    if kind == "var":
+        return 1
+    if kind == "neg":
+        return degree(node[1])
+    if kind == "call":
+        return None if free_variables(node) else 0
+    left, right = degree(node[1]), degree(node[2])
+    if left is None or right is None:
+        return None
+    if kind in "+-":
+        return max(left, right)
+    if kind == "*":
+        return left + right
+    if kind == "/":
+        return left if right == 0 else None
+    if right:
+        return None
+    if left == 0:
+        return 0
+    exponent = float(evaluate(node[2], {}))
+    return left * int(exponent) if exponent >= 0 and exponent.is_integer() else None
+
+
+def evaluate(node, env):
+    # env maps variable names to arrays of points; every operation is one numpy call
+    kind = node[0]
+    if kind == "num":
+        return float(node[1])
+    if kind == "const":
+        return node[1]
+    if kind == "var":
+        if node[1] not in env:
+            raise Unsupported(node[1])
+        return env[node[1]]
+    if kind == "neg":
+        return -evaluate(node[1], env)
+    if kind == "call":
+        return FUNCTIONS[node[1]](evaluate(node[2], env))
+    left = evaluate(node[1], env)
+    right = evaluate(node[2], env)
+    if kind == "+":
+        return np.add(left, right)
+    if kind == "-":
+        return np.subtract(left, right)
+    if kind == "*":
+        return np.multiply(left, right)
+    if kind == "/":
+        return np.divide(left, right)
+    return np.power(np.asarray(left, dtype=float), right)
+
+
+def on_points(node, env, shape):
+    return np.broadcast_to(np.asarray(evaluate(node, env), dtype=float), shape)
+
+
+def rounding(text):
+    # Half a unit in the last decimal place of an answer written as a
+    # decimal (x ≈ 1.414), else 0 for an exact one
+    places = [len(digits) for digits in NUMBER.findall(text)]
+    return 0.5 * 10.0 ** -max(places) * 1.01 if places else 0.0
+
+
+def answer_expression(answer):
+    # The right-hand side of "f'(x) = ..." or "x = ...", without "+ C"
+    return CONSTANT_TERM.sub("", clean(answer).split("=")[-1]).strip()
+
+
+def single_variable(node, var=None):
+    found = free_variables(node)
+    if var is None:
+        if len(found) != 1:
+            raise Unsupported("not one variable")
+        return found.pop()
+    if found - {var}:
+        raise Unsupported("more than one variable")
+    return var
+
+
+# --- checks --------------------------------------------------------------------
+
+def close(claimed, expected):
+    # (all close, points compared) over the points where both are defined
+    mask = np.isfinite(claimed) & np.isfinite(expected)
+    points = int(mask.sum())
+    if points < MIN_POINTS:
+        raise Unsupported("too few points in the domain")
+    return bool(np.allclose(claimed[mask], expected[mask], rtol=RTOL, atol=ATOL)), points
+
+
+def derivative_on_samples(node, var):
+    h = STEP * np.maximum(1.0, np.abs(SAMPLES))
+    forward = on_points(node, {var: SAMPLES + h}, SAMPLES.shape)
+    backward = on_points(node, {var: SAMPLES - h}, SAMPLES.shape)
+    return (forward - backward) / (2 * h)
+
+
+def check_derivative(function_text, var, answer):
+    function = parse(function_text)
+    var = single_variable(function, var)
+    claimed = parse(answer_expression(answer))
+    single_variable(claimed, var)
+    ok, points = close(on_points(claimed, {var: SAMPLES}, SAMPLES.shape), derivative_on_samples(function, var))
+    return "derivative", ok, f"at {points} points"
+
+
+def check_integral(integrand_text, var, lower, upper, answer):
+    integrand = parse(integrand_text)
+    var = single_variable(integrand, var)
+    if lower is None:
+        # An antiderivative checks out if it differentiates back to the integrand
+        claimed = parse(answer_expression(answer))
+        single_variable(claimed, var)
+        ok, points = close(derivative_on_samples(claimed, var), on_points(integrand, {var: SAMPLES}, SAMPLES.shape))
+        return "integral", ok, f"at {points} points"
+    a = float(evaluate(parse(clean(lower)), {}))
+    b = float(evaluate(parse(clean(upper)), {}))
+    xs = np.linspace(a, b, SIMPSON_INTERVALS + 1)
+    ys = on_points(integrand, {var: xs}, xs.shape)
+    if not np.all(np.isfinite(ys)):
+        raise Unsupported("integrand not finite on the interval")
+    value = (b - a) / (3 * SIMPSON_INTERVALS) * (ys[0] + ys[-1] + 4 * ys[1:-1:2].sum() + 2 * ys[2:-1:2].sum())
+    expression = answer_expression(answer)
+    claimed = float(evaluate(parse(expression), {}))
+    ok = abs(claimed - value) <= rounding(expression) + 1e-6 * max(1.0, abs(value))
+    return "integral", ok, "by Simpson's rule"
+
+
+def check_equation(left_text, right_text, answer):
+    left, right = parse(left_text), parse(right_text)
+    node = ("-", left, right)
+    var = single_variable(node)
+    answer = clean(answer)
+    # A bare number for an angle could be degrees or radians; trig equations
+    # also have infinitely many roots, so only the claimed ones are checked
+    periodic = bool(calls(node) & TRIG)
+    unit = 1.0
+    if periodic:
+        if DEGREES.search(answer):
+            unit = math.pi / 180
+        elif not RADIANS.search(answer):
+            raise Unsupported("angle units not given")
+    roots, tolerances = [], []
+    for part in ROOT_SEPARATOR.split(answer):
+        expression = ANGLE_UNITS.sub("", part.split("=")[-1]).strip()
+        if not expression:
+            continue
+        signs = (1, -1) if expression.startswith("±") else (1,)
+        root = parse(expression.lstrip("±"))
+        if free_variables(root):
+            raise Unsupported("root is not a number")
+        for sign in signs:
+            roots.append(sign * float(evaluate(root, {})) * unit)
+            tolerances.append(rounding(expression) * unit)
+    if not roots:
+        raise Unsupported("no roots")
+    roots, tolerances = np.array(roots), np.array(tolerances)
+    # Each root and the ends of its rounding interval, in one evaluation
+    points = np.stack([roots, roots - tolerances, roots + tolerances])
+    residual = on_points(node, {var: points}, points.shape)
+    scale = np.maximum(1.0, np.abs(on_points(left, {var: roots}, roots.shape)))
+    exact = np.abs(residual[0]) <= 1e-9 * scale
+    bracketed = (tolerances > 0) & (residual[1] * residual[2] <= 0)
+    ok = bool(np.all(np.isfinite(residual[0]) & (exact | bracketed)))
+    # Every claimed root holding up says nothing about the ones left out
+    if ok and not periodic and not covers_all_roots(node, var, roots, tolerances):
+        raise Unsupported("roots may be incomplete")
+    return "equation", ok, f"for {len(roots)} root{'s' if len(roots) != 1 else ''}"
+
+
+def covers_all_roots(node, var, roots, tolerances):
+    order = degree(node)
+    if order is not None:
+        if order > MAX_DEGREE:
+            return False
+        # degree + 1 points determine the polynomial exactly
+        xs = np.linspace(-1.0, 1.0, order + 1)
+        coefficients = np.polyfit(xs, on_points(node, {var: xs}, xs.shape), order) if order else [0.0]
+        coefficients = np.where(np.abs(coefficients) > 1e-9 * np.max(np.abs(coefficients)), coefficients, 0.0)
+        found = np.roots(coefficients)
+        real = found.real[np.abs(found.imag) <= RTOL * np.maximum(1.0, np.abs(found))]
+    else:
+        values = on_points(node, {var: SCAN}, SCAN.shape)
+        crossing = (values[:-1] * values[1:] <= 0) & np.isfinite(values[:-1] * values[1:])
+        low, high, at_low = SCAN[:-1][crossing], SCAN[1:][crossing], values[:-1][crossing]
+        for _ in range(BISECTIONS):
+            middle = (low + high) / 2
+            at_middle = on_points(node, {var: middle}, middle.shape)
+            below = at_low * at_middle <= 0
+            low, high = np.where(below, low, middle), np.where(below, middle, high)
+            at_low = np.where(below, at_low, at_middle)
+        real = (low + high) / 2
+        # A sign change across a pole grows as the bracket closes in on it
+        real = real[np.abs(on_points(node, {var: real}, real.shape)) <= ATOL]
+    margin = tolerances[:, None] + RTOL * np.maximum(1.0, np.abs(real))[None, :]
+    return bool(np.all(np.any(np.abs(roots[:, None] - real[None, :]) <= margin, axis=0)))
+
+
+def check_arithmetic(text, answer):
+    problem = parse(text)
+    if free_variables(problem):
+        raise Unsupported("not arithmetic")
+    value = float(evaluate(problem, {}))
+    expression = answer_expression(answer)
+    claimed = float(evaluate(parse(expression), {}))
+    ok = abs(claimed - value) <= rounding(expression) + 1e-9 * max(1.0, abs(value))
+    return "arithmetic", ok, "numerically"
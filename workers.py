@@ -0,0 +1,219 @@
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    result = pyqtSignal(object)
+    chunk = pyqtSignal(object)
+    error = pyqtSignal(object)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    # Runs fn(*args, **kwargs) on a pool thread and reports back through Qt signals,
+    # which are delivered on the GUI thread because the signals object lives there.
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.streaming = False
+        self.key = None
+        self.flight = None
+        self.signals = WorkerSignals()
+
+    def cancel(self):
+        # A request already on the wire can't be interrupted, so its result is dropped instead
+        self.cancelled = True
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return
+            if self.streaming:
+                result = self._run_stream()
+            else:
+                result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(e)
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+    def _run_stream(self):
+        # fn returns an iterator of chunks; each one is forwarded as it arrives
+        # and a cancelled stream stops pulling from it right away. The result is
+        # the generator's return value if it has one, else the joined text chunks.
+        parts = []
+        iterator = iter(self.fn(*self.args, **self.kwargs))
+        while True:
+            try:
+                piece = next(iterator)
+            except StopIteration as stop:
+                return stop.value if stop.value is not None else "".join(parts)
+            if self.cancelled:
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+                return None
+            if isinstance(piece, str):
+                parts.append(piece)
+            self.signals.chunk.emit(piece)
+
+
+class Flight:
+    # Fans one worker's signals out to every caller that asked for the same key.
+    # Chunks already delivered are replayed to late joiners so they see the whole stream.
+    def __init__(self, worker):
+        self.worker = worker
+        self.chunks = []
+        self.listeners = []
+        worker.signals.chunk.connect(self._chunk)
+        worker.signals.result.connect(self._result)
+        worker.signals.error.connect(self._error)
+        worker.signals.finished.connect(self._finished)
+
+    def attach(self, on_result=None, on_error=None, on_chunk=None, on_finished=None):
+        if on_chunk:
+            for piece in self.chunks:
+                on_chunk(piece)
+        self.listeners.append((on_result, on_error, on_chunk, on_finished))
+
+    def _chunk(self, piece):
+        self.chunks.append(piece)
+        for _, _, on_chunk, _ in self.listeners:
+            if on_chunk:
+                on_chunk(piece)
+
+    def _result(self, result):
+        for on_result, _, _, _ in self.listeners:
+            if on_result:
+                on_result(result)
+
+    def _error(self, error):
+        for _, on_error, _, _ in self.listeners:
+            if on_error:
+                on_error(error)
+
+    def _finished(self):
+        for _, _, _, on_finished in self.listeners:
+            if on_finished:
+                on_finished()
+
+
+class TaskRunner(QObject):
+    active_changed = pyqtSignal(int)
+
+    def __init__(self, max_workers=4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.active = set()
+        self.flights = {}
+
+    def submit(self, fn, *args, on_result=None, on_error=None, on_chunk=None, on_finished=None,
+               key=None, background=False, **kwargs):
+        # With a key, identical requests already in flight are joined instead of
+        # starting another upstream call (single-flight). on_finished runs after
+        # the result or error, or on its own once a cancelled task is dropped;
+        # it is wired up before the task starts so even instant tasks report it.
+        # Background tasks are left out of active_count() and cancel_all() until
+        # an ordinary submit joins them.
+        # A cancelled flight is never joined; its result will be dropped
+        if key is not None and key in self.flights and not self.flights[key].worker.cancelled:
+            flight = self.flights[key]
+            flight.attach(on_result, on_error, on_chunk, on_finished)
+            if not background:
+                self._track(flight.worker)
+            return flight.worker
+        worker = Worker(fn, *args, **kwargs)
+        worker.streaming = on_chunk is not None
+        # The worker holds its flight; PyQt only keeps weak references to plain-object slots
+        worker.flight = Flight(worker)
+        worker.flight.attach(on_result, on_error, on_chunk, on_finished)
+        worker.key = key
+        if key is not None:
+            self.flights[key] = worker.flight
+            worker.signals.finished.connect(lambda: self._land(worker))
+        worker.signals.finished.connect(lambda: self._finished(worker))
+        if not background:
+            self._track(worker)
+        self.pool.start(worker)
+        return worker
+
+    def cancel(self, worker):
+        worker.cancel()
+        # The same problem submitted again starts afresh instead of joining this one
+        self._land(worker)
+        # Not started yet: take it off the queue so it never runs
+        if self.pool.tryTake(worker):
+            worker.signals.finished.emit()
+
+    def cancel_all(self):
+        for worker in list(self.active):
+            self.cancel(worker)
+
+    def active_count(self):
+        return len(self.active)
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _land(self, worker):
+        # Forget the worker's flight, unless a newer one has taken its key
+        if worker.key is not None and self.flights.get(worker.key) is worker.flight:
+            del self.flights[worker.key]
+
+    def _track(self, worker):
+        if worker not in self.active:
+            self.active.add(worker)
+            self.active_changed.emit(len(self.active))
+
+    def _finished(self, worker):
+        if worker in self.active:
+            self.active.discard(worker)
+            self.active_changed.emit(len(self.active))
+
+
+class EventLoopLagMonitor(QObject):
+    # Measures how late a short repeating timer fires; any lateness is time the
+    # event loop spent blocked and unable to repaint or handle input.
+    # With window set only the latest samples are kept, for monitors left running.
+    def __init__(self, interval_ms=5, parent=None, window=None):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.window = window
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+        self.samples = []
+        self._last = None
+
+    def start(self):
+        self.samples = deque(maxlen=self.window) if self.window else []
+        self._last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = (now - self._last) * 1000 - self.interval_ms
+        self.samples.append(max(lag, 0.0))
+        self._last = now
+
+    def max_lag_ms(self):
+        return max(self.samples) if self.samples else 0.0
+
+    def percentile_ms(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]